@@ -0,0 +1,678 @@
+"""
+StegPass - Password Manager Application
+bmp.py - In-process port of the bmp-steg utility (see utility/bmp-steg/src/BMP.cpp)
+"""
+
+# ? Standard Imports
+import os
+import mmap
+import shutil
+import struct
+from contextlib import contextmanager
+import numpy as np
+
+# ? Project Imports
+from app.core.obfuscator import hash_to_key
+from app.core.fileio import atomic_replace, file_lock
+from app.core.message_block import build_message_block, decrypt_message, validate_header, get_message_length, has_magic_number, get_version, SP_HEADER_SIZE
+from app.core.container import build_container, find_record, read_records, read_every_record, is_container, get_container_size, decode_varint, \
+    SP_CONTAINER_PREFIX_SIZE, SP_CONTAINER_HEADER_MAX_SIZE
+
+# Size of the BITMAPFILEHEADER + BITMAPINFOHEADER on disk
+BMP_HEADER_SIZE = 54
+
+# The native utility places Gap1 at sizeof(FileHeader) + sizeof(InfoHeader), which is
+# 16 + 40 bytes because of struct alignment (not the 14 + 40 bytes used on disk).
+GAP1_OFFSET = 16 + 40
+
+# Gap sizes are unsigned int in the native utility
+UINT32_MASK = 0xFFFFFFFF
+
+# Chunk size of the streamed copy in run_hide_copy
+COPY_CHUNK_SIZE = 1 << 20
+
+# The regions a message was hidden in (same values returned by BMP::HideMessage)
+REGION_NONE    = 0
+REGION_PADDING = 1
+REGION_GAP1    = 2
+REGION_GAP2    = 3
+
+class BMPLayout:
+    """ The regions of a BMP file that can hold a hidden message, computed the same way as the native
+    GetPixelArray, GetGap1 and GetGap2.
+    """
+    def __init__(self, header, data_size : int):
+        if data_size < BMP_HEADER_SIZE:
+            raise ValueError("Invalid BMP file, file is too small")
+
+        bf_type, bf_size, _, _, bf_off_bits = struct.unpack_from('<2si2hi', header, 0)
+        _, width, height, _, bit_count, _, size_image = struct.unpack_from('<3i2h2i', header, 14)
+
+        # sanity checks
+        if bf_type != b'BM':
+            raise ValueError("Invalid BMP file, header does not match")
+
+        if bf_off_bits < BMP_HEADER_SIZE:
+            raise ValueError("Invalid BMP file, bfOffBits is too small")
+
+        if bf_off_bits > data_size:
+            raise ValueError("Invalid BMP file, bfOffBits out of bounds")
+
+        if width <= 0 or bit_count <= 0:
+            raise ValueError("Invalid BMP file, bad image dimensions")
+
+        self.data_size = data_size
+        self.bf_size = bf_size
+        self.bf_off_bits = bf_off_bits
+        self.width = width
+        self.height = height
+        self.bit_count = bit_count
+        self.size_image = size_image
+
+        # Pixel array, only rows that are fully inside the file are used
+        self.pixel_offset = bf_off_bits
+        self.row_size = (width * bit_count + 31) // 32 * 4
+        self.padding_size = self.row_size - width * bit_count // 8
+        self.num_rows = min(abs(height), (data_size - bf_off_bits) // self.row_size)
+
+        # Gap1: between the headers and the pixel array
+        self.gap1_offset = GAP1_OFFSET
+        self.gap1_size = min((bf_off_bits - GAP1_OFFSET) & UINT32_MASK, max(data_size - GAP1_OFFSET, 0))
+
+        # Gap2: after the pixel array
+        self.gap2_offset = bf_off_bits + size_image
+        self.gap2_size = min((bf_size - bf_off_bits - size_image) & UINT32_MASK, max(data_size - self.gap2_offset, 0))
+
+    @property
+    def padding_capacity(self) -> int:
+        """ The number of bytes available in the padding of the pixel array
+        """
+        if self.padding_size <= 0:
+            return 0
+        return self.num_rows * self.padding_size
+
+    @property
+    def gap1_overlaps_pixels(self) -> bool:
+        """ Whether Gap1 runs into the pixel array (bfOffBits is below GAP1_OFFSET, so the native size wraps)
+        """
+        return self.gap1_size > 0 and self.gap1_offset + self.gap1_size > self.pixel_offset
+
+    def capacity(self) -> dict:
+        """ The number of bytes that can be hidden in each region without growing the file
+
+        Returns:
+            dict: The 'padding', 'gap1' and 'gap2' bytes, their 'total' and whether 'gap1_overlaps_pixels'.
+            When Gap1 overlaps the pixel array, writing past the padding would overwrite the padding itself,
+            so only the padding is counted (or only Gap1 if there is no padding).
+        """
+        padding, gap1, gap2 = self.padding_capacity, self.gap1_size, self.gap2_size
+        if self.gap1_overlaps_pixels:
+            gap2 = 0
+            if padding > 0:
+                gap1 = 0
+
+        return {'padding': padding, 'gap1': gap1, 'gap2': gap2, 'total': padding + gap1 + gap2,
+                'gap1_overlaps_pixels': self.gap1_overlaps_pixels}
+
+    def stream_ranges(self, length : int) -> list[tuple[int, int, int]]:
+        """ Maps the first bytes of the hidden byte stream to their location in the file
+
+        Args:
+            length (int): The number of bytes of the stream
+
+        Returns:
+            list[tuple[int, int, int]]: The (file offset, size, region) of each contiguous range, in stream order
+        """
+        ranges = []
+        remaining = length
+
+        if remaining > 0 and self.padding_capacity > 0:
+            rows_needed = min(self.num_rows, -(-remaining // self.padding_size))
+            first_padding_byte = self.pixel_offset + self.row_size - self.padding_size
+            for row in range(rows_needed):
+                count = min(remaining, self.padding_size)
+                ranges.append((first_padding_byte + row * self.row_size, count, REGION_PADDING))
+                remaining -= count
+
+        for offset, size, region in ((self.gap1_offset, self.gap1_size, REGION_GAP1), (self.gap2_offset, self.gap2_size, REGION_GAP2)):
+            if remaining <= 0:
+                break
+
+            count = min(remaining, size)
+            if count > 0:
+                ranges.append((offset, count, region))
+            remaining -= count
+
+        return ranges
+
+    def stream_patches(self, stream : bytes) -> list[tuple[int, bytes]]:
+        """ Splits a byte stream into the writes that hide it in the file, without the file's contents
+
+        Args:
+            stream (bytes): The byte stream to hide
+
+        Returns:
+            list[tuple[int, bytes]]: The (file offset, bytes) of each write, in stream order (later writes win
+            where Gap1 overlaps the padding, like write_stream), or None if the file would have to grow
+        """
+        patches = []
+        position = 0
+        for offset, size, _ in self.stream_ranges(len(stream)):
+            patches.append((offset, stream[position:position + size]))
+            position += size
+
+        return patches if position == len(stream) else None
+
+class BMP:
+    """ Hides and extracts messages in a BMP byte buffer, using the same byte layout as the bmp-steg utility:
+    the padding of the pixel array first, then Gap1 and Gap2.
+    """
+    def __init__(self, data):
+        """
+        Args:
+            data (bytearray): The BMP file's bytes (a bytes object can be used for extraction only)
+        """
+        self.data = data
+        self.layout = BMPLayout(data, len(data))
+
+    @staticmethod
+    def from_file(filename : str) -> 'BMP':
+        """ Reads an entire BMP file into memory
+
+        Args:
+            filename (str): The path to the BMP file
+
+        Returns:
+            BMP: The BMP object
+        """
+        with open(filename, 'rb') as f:
+            return BMP(bytearray(f.read()))
+
+    @staticmethod
+    @contextmanager
+    def open_mapped(filename : str):
+        """ Memory-maps a BMP file read-only. Only the pages holding the headers, the padding of the rows
+        that are read, and the gaps are ever loaded, which keeps extraction cheap for very large files.
+
+        Args:
+            filename (str): The path to the BMP file
+
+        Yields:
+            BMP: The BMP object, only valid inside the with block (extraction only)
+        """
+        with open(filename, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                bmp = BMP(mapped)
+                try:
+                    yield bmp
+                finally:
+                    bmp.data = None
+
+    def save(self, filename : str, atomic : bool = True):
+        """ Saves the BMP buffer (with any hidden message) to a file
+
+        Args:
+            filename (str): The path to the new BMP file
+            atomic (bool): Write a temporary file, flush it and rename it over the original, so that a crash
+                leaves either the old or the new file (see atomic_replace)
+        """
+        if not atomic:
+            with open(filename, 'wb') as f:
+                f.write(self.data)
+            return
+
+        with atomic_replace(filename) as f:
+            f.write(self.data)
+
+    def hide_message(self, message : str, encryption_key : bytes) -> int:
+        """ Hides a message in the BMP buffer
+
+        Args:
+            message (str): The plaintext message to hide
+            encryption_key (bytes): The 32 byte encryption key
+
+        Returns:
+            int: The last region used to hide the message (REGION_PADDING, REGION_GAP1 or REGION_GAP2)
+        """
+        return self.write_stream(build_message_block(message, encryption_key))
+
+    def extract_message(self, encryption_key : bytes) -> str:
+        """ Extracts a message from the BMP buffer
+
+        Args:
+            encryption_key (bytes): The 32 byte encryption key
+
+        Returns:
+            str: The hidden message. If no message is found, returns an empty string.
+        """
+        header = self.read_stream(SP_HEADER_SIZE)
+        if not validate_header(header) or is_container(header) or get_message_length(header) == 0:
+            return ""
+
+        block = self.read_stream(SP_HEADER_SIZE + get_message_length(header))
+        message = decrypt_message(block, encryption_key)
+        if message is None:
+            return ""
+
+        return message
+
+    def hide_records(self, records : dict[str, dict], encryption_key : bytes) -> int:
+        """ Hides a container of records in the BMP buffer (see container.py)
+
+        Args:
+            records (dict[str, dict]): The records by key
+            encryption_key (bytes): The 32 byte encryption key
+
+        Returns:
+            int: The last region used to hide the container (REGION_PADDING, REGION_GAP1 or REGION_GAP2)
+        """
+        return self.write_stream(build_container(records, encryption_key))
+
+    def read_container(self) -> bytes:
+        """ Reads the container hidden in the BMP buffer, without decrypting it
+
+        Returns:
+            bytes: The container byte stream, or None if there is no complete container
+        """
+        size = get_container_size(self.read_stream(SP_CONTAINER_HEADER_MAX_SIZE))
+        if size == 0:
+            return None
+
+        container = self.read_stream(size)
+        if len(container) < size:
+            return None
+        return container
+
+    def inspect_payload(self) -> dict:
+        """ Reads the (unencrypted) header of the hidden message, no key is needed
+
+        Returns:
+            dict: 'magic' (bool) if an SP header is present, and its 'version' triple, message 'length', the
+            'regions' that hold the message and whether the image holds all of it ('complete'), all None if there
+            is no header. For a container, 'length' is the size of its body.
+        """
+        header = self.read_stream(SP_CONTAINER_HEADER_MAX_SIZE)
+        if not has_magic_number(header):
+            return {'magic': False, 'version': None, 'length': None, 'regions': None, 'complete': None}
+
+        if is_container(header):
+            length, _ = decode_varint(header, SP_CONTAINER_PREFIX_SIZE)
+            total = get_container_size(header)
+            length = length or 0
+        else:
+            length = get_message_length(header)
+            total = SP_HEADER_SIZE + length
+
+        ranges = self.layout.stream_ranges(total)
+        complete = total > 0 and sum(size for _, size, _ in ranges) == total
+        return {'magic': True, 'version': list(get_version(header)), 'length': length,
+                'regions': sorted({region for _, _, region in ranges}), 'complete': complete}
+
+    def read_stream(self, length : int) -> bytes:
+        """ Reads the first bytes of the hidden byte stream, touching only the rows of the pixel array that are needed
+
+        Args:
+            length (int): The number of bytes to read
+
+        Returns:
+            bytes: The bytes read, fewer than requested if the image ran out of space
+        """
+        layout = self.layout
+        array = np.frombuffer(self.data, dtype=np.uint8)
+        chunks = []
+        remaining = length
+
+        # read from pixel array first, if possible
+        if remaining > 0 and layout.padding_capacity > 0:
+            rows_needed = min(layout.num_rows, -(-remaining // layout.padding_size))
+            padding = self._padding_rows(array)[:rows_needed].reshape(-1)[:remaining]
+            chunks.append(padding.tobytes())
+            remaining -= len(padding)
+
+        # then Gap1 and Gap2 if the stream is not complete
+        for offset, size in ((layout.gap1_offset, layout.gap1_size), (layout.gap2_offset, layout.gap2_size)):
+            if remaining <= 0:
+                break
+
+            count = min(remaining, size)
+            chunks.append(array[offset:offset + count].tobytes())
+            remaining -= count
+
+        return b''.join(chunks)
+
+    def write_stream(self, stream : bytes) -> int:
+        """ Writes a byte stream into the padding of the pixel array, then Gap1 and Gap2
+
+        Args:
+            stream (bytes): The byte stream to hide
+
+        Returns:
+            int: The last region written to, REGION_NONE if the stream was empty
+        """
+        layout = self.layout
+        source = np.frombuffer(stream, dtype=np.uint8)
+
+        padding_count = min(len(source), layout.padding_capacity)
+        gap1_count = min(len(source) - padding_count, layout.gap1_size)
+        gap2_count = len(source) - padding_count - gap1_count
+
+        # If Gap2 is not big enough, the file has to grow (must happen before any views of the buffer exist)
+        if gap2_count > layout.gap2_size:
+            self._grow_gap2(gap2_count)
+            layout = self.layout
+
+        array = np.frombuffer(self.data, dtype=np.uint8)
+        region = REGION_NONE
+
+        if padding_count > 0:
+            padding = self._padding_rows(array)
+            full_rows, remainder = divmod(padding_count, layout.padding_size)
+            padding[:full_rows] = source[:full_rows * layout.padding_size].reshape(full_rows, layout.padding_size)
+            if remainder:
+                padding[full_rows, :remainder] = source[full_rows * layout.padding_size:padding_count]
+            region = REGION_PADDING
+
+        if gap1_count > 0:
+            array[layout.gap1_offset:layout.gap1_offset + gap1_count] = source[padding_count:padding_count + gap1_count]
+            region = REGION_GAP1
+
+        if gap2_count > 0:
+            array[layout.gap2_offset:layout.gap2_offset + gap2_count] = source[padding_count + gap1_count:]
+            region = REGION_GAP2
+
+        return region
+
+    def _padding_rows(self, array : np.ndarray) -> np.ndarray:
+        """ Gets a (num_rows, padding_size) strided view of the padding bytes of the pixel array, so that
+        hiding and extracting are a single slice assignment or read instead of a loop over every row.
+        The view is read-only if the buffer is.
+        """
+        layout = self.layout
+        first_padding_byte = layout.pixel_offset + layout.row_size - layout.padding_size
+
+        # num_rows only counts rows that are fully inside the buffer, so the view never reads past its end
+        return np.lib.stride_tricks.as_strided(array[first_padding_byte:], shape=(layout.num_rows, layout.padding_size),
+                                               strides=(layout.row_size, 1))
+
+    def _grow_gap2(self, size : int):
+        """ Resizes the buffer so Gap2 can hold the given number of bytes. Unlike the native utility, bfSize
+        is updated to the new file size so the message can be read back.
+        """
+        if not isinstance(self.data, bytearray):
+            raise ValueError("Not enough space in the BMP file to hide the message")
+
+        gap2_offset = self.layout.gap2_offset
+        if gap2_offset > len(self.data):
+            raise ValueError("Invalid BMP file, Gap2 out of bounds")
+
+        del self.data[gap2_offset:]
+        self.data.extend(bytes(size))
+        struct.pack_into('<i', self.data, 2, len(self.data))
+        self.layout = BMPLayout(self.data, len(self.data))
+
+def run_hide(image_path : str, message : str, user_hash : str) -> tuple[str, int]:
+    """ In-process equivalent of `bmp-steg -s <image_path> <message> -h <user_hash>`, only the bytes that hold
+    the message are written (see run_hide_copy)
+
+    Args:
+        image_path (str): The path to the BMP file
+        message (str): The message to hide
+        user_hash (str): The hex encoded encryption key
+
+    Returns:
+        tuple[str, int]: The output and the utility exit code
+    """
+    return run_hide_copy(image_path, image_path, message, user_hash)
+
+def run_hide_copy(src_path : str, dest_path : str, message : str, user_hash : str, in_place : bool = False) -> tuple[str, int]:
+    """ Hides a message in a copy of a BMP file in a single pass. The message block is laid out from the
+    headers alone and spliced into the copy as it streams from the source, instead of copying the file and
+    then reading and rewriting the copy. The copy is written next to the destination and renamed over it,
+    under the destination's lock (see fileio.py). A file that has to grow to fit the message is rewritten in full.
+
+    Args:
+        src_path (str): The path to the BMP file to copy
+        dest_path (str): The path to write the copy with the message to (may be src_path)
+        message (str): The message to hide
+        user_hash (str): The hex encoded encryption key
+        in_place (bool): If the source is the destination, only write the bytes that hold the message. This
+            is not crash-safe, a crash while patching can leave a partly written message
+
+    Returns:
+        tuple[str, int]: The output and the utility exit code
+    """
+    if not os.path.exists(src_path):
+        return f"BMP file does not exist: {src_path}", 3
+
+    try:
+        stream = build_message_block(message, hash_to_key(user_hash))
+        with file_lock(dest_path):
+            with open(src_path, 'rb') as f:
+                header = f.read(BMP_HEADER_SIZE)
+                data_size = os.fstat(f.fileno()).st_size
+
+            patches = BMPLayout(header, data_size).stream_patches(stream)
+            if not patches:
+                bmp = BMP.from_file(src_path)
+                if bmp.write_stream(stream) == REGION_NONE:
+                    return "Could not hide the message", -1
+                bmp.save(dest_path)
+            elif in_place and os.path.exists(dest_path) and os.path.samefile(src_path, dest_path):
+                patch_file(dest_path, patches)
+            else:
+                splice_copy(src_path, dest_path, patches)
+    except (OSError, ValueError) as e:
+        return str(e), -1
+
+    return "", 0
+
+def patch_file(path : str, patches : list[tuple[int, bytes]]):
+    """ Writes each (offset, bytes) patch into a file in place, the rest of the file is not touched
+
+    Args:
+        path (str): The path to the file
+        patches (list[tuple[int, bytes]]): The writes, applied in order
+    """
+    with open(path, 'r+b') as f:
+        for offset, data in patches:
+            f.seek(offset)
+            f.write(data)
+
+def splice_copy(src_path : str, dest_path : str, patches : list[tuple[int, bytes]]):
+    """ Copies a file through a single reused buffer, applying each (offset, bytes) patch to the chunk it falls in.
+    The copy replaces the destination atomically, so the source may be the destination.
+
+    Args:
+        src_path (str): The path to the file to copy
+        dest_path (str): The path of the copy
+        patches (list[tuple[int, bytes]]): The writes, applied in order
+    """
+    buffer = bytearray(COPY_CHUNK_SIZE)
+    view = memoryview(buffer)
+    position = 0
+
+    with open(src_path, 'rb') as src, atomic_replace(dest_path) as dest:
+        while True:
+            count = src.readinto(buffer)
+            if not count:
+                break
+
+            for offset, data in patches:
+                start, end = max(offset, position), min(offset + len(data), position + count)
+                if start < end:
+                    buffer[start - position:end - position] = data[start - offset:end - offset]
+
+            dest.write(view[:count])
+            position += count
+
+    shutil.copymode(src_path, dest_path)
+
+def run_rekey(image_path : str, old_user_hash : str, new_user_hash : str) -> tuple[str, int]:
+    """ Re-encrypts the message (or container) hidden in a BMP file with a new key, replacing the file atomically
+    under its lock
+
+    Args:
+        image_path (str): The path to the BMP file
+        old_user_hash (str): The hex encoded key the message is encrypted with
+        new_user_hash (str): The hex encoded key to encrypt it with
+
+    Returns:
+        tuple[str, int]: The output and the utility exit code (4 if the message, or any record of a container, could
+        not be recovered with the old key; the file is left untouched)
+    """
+    if not os.path.exists(image_path):
+        return f"BMP file does not exist: {image_path}", 3
+
+    try:
+        with file_lock(image_path):
+            bmp = BMP.from_file(image_path)
+            container = bmp.read_container()
+            if container is not None:
+                records = read_every_record(container, hash_to_key(old_user_hash))
+                if records is None:
+                    return "", 4
+
+                # record sizes don't depend on the key, so the container is rewritten in the same bytes
+                bmp.hide_records(records, hash_to_key(new_user_hash))
+            else:
+                message = bmp.extract_message(hash_to_key(old_user_hash))
+                if not message:
+                    return "", 4
+
+                # same length, so the message is rewritten in exactly the same bytes
+                bmp.hide_message(message, hash_to_key(new_user_hash))
+            bmp.save(image_path)
+    except (OSError, ValueError) as e:
+        return str(e), -1
+
+    return "", 0
+
+def run_hide_records(image_path : str, records : dict[str, dict], user_hash : str) -> tuple[str, int]:
+    """ Hides a container of records in a BMP file, replacing any message hidden in it. Library only: the app
+    stores single passwords, containers are read (run_extract_record) and rekeyed (run_rekey).
+
+    Args:
+        image_path (str): The path to the BMP file
+        records (dict[str, dict]): The records by key
+        user_hash (str): The hex encoded encryption key
+
+    Returns:
+        tuple[str, int]: The output and the utility exit code
+    """
+    if not os.path.exists(image_path):
+        return f"BMP file does not exist: {image_path}", 3
+
+    try:
+        with file_lock(image_path):
+            bmp = BMP.from_file(image_path)
+            if bmp.hide_records(records, hash_to_key(user_hash)) == REGION_NONE:
+                return "Could not hide the records", -1
+            bmp.save(image_path)
+    except (OSError, ValueError) as e:
+        return str(e), -1
+
+    return "", 0
+
+def run_extract_record(image_path : str, record_key : str, user_hash : str) -> tuple[dict, int]:
+    """ Looks up a single record of the container hidden in a BMP file, only that record is decrypted
+
+    Args:
+        image_path (str): The path to the BMP file
+        record_key (str): The key of the record, or None to decrypt every record
+        user_hash (str): The hex encoded encryption key
+
+    Returns:
+        tuple[dict, int]: The fields of the record (the records by key if record_key is None) and the utility
+        exit code (4 if there is no such record, or the key is wrong). On errors the output is the error message.
+    """
+    if not os.path.exists(image_path):
+        return f"BMP file does not exist: {image_path}", 3
+
+    try:
+        with BMP.open_mapped(image_path) as bmp:
+            container = bmp.read_container()
+    except (OSError, ValueError) as e:
+        return str(e), -1
+
+    if container is None:
+        return None, 4
+
+    encryption_key = hash_to_key(user_hash)
+    if record_key is None:
+        records = read_records(container, encryption_key)
+        return (records, 0) if records else (None, 4)
+
+    fields = find_record(container, record_key, encryption_key)
+    if fields is None:
+        return None, 4
+
+    return fields, 0
+
+def run_capacity(image_path : str) -> dict:
+    """ Reports how many bytes a BMP file can hold without growing, from its headers and size only
+    (see BMPLayout.capacity)
+
+    Args:
+        image_path (str): The path to the BMP file
+
+    Returns:
+        dict: The bytes available per region and in total
+
+    Raises:
+        OSError: If the file could not be read
+        ValueError: If the file is not a valid BMP file
+    """
+    with open(image_path, 'rb') as f:
+        header = f.read(BMP_HEADER_SIZE)
+        data_size = os.fstat(f.fileno()).st_size
+
+    if len(header) < BMP_HEADER_SIZE:
+        raise ValueError("Invalid BMP file, file is too small")
+
+    return BMPLayout(header, data_size).capacity()
+
+def run_inspect(image_path : str) -> dict:
+    """ Reads the header of the hidden message in a BMP file (see BMP.inspect_payload), touching only the
+    pages that hold it
+
+    Args:
+        image_path (str): The path to the BMP file
+
+    Returns:
+        dict: The payload description
+
+    Raises:
+        OSError: If the file could not be read
+        ValueError: If the file is not a valid BMP file
+    """
+    with BMP.open_mapped(image_path) as bmp:
+        return bmp.inspect_payload()
+
+def run_extract(image_path : str, user_hash : str, use_mmap : bool = True) -> tuple[str, int]:
+    """ In-process equivalent of `bmp-steg -g <image_path> -h <user_hash>`
+
+    Args:
+        image_path (str): The path to the BMP file
+        user_hash (str): The hex encoded encryption key
+        use_mmap (bool): Memory-map the file and only touch the bytes that hold the message, instead of
+            reading the whole file like the utility does
+
+    Returns:
+        tuple[str, int]: The recovered message (as the utility would print it) and the utility exit code
+    """
+    if not os.path.exists(image_path):
+        return f"BMP file does not exist: {image_path}", 3
+
+    try:
+        if use_mmap:
+            with BMP.open_mapped(image_path) as bmp:
+                message = bmp.extract_message(hash_to_key(user_hash))
+        else:
+            message = BMP.from_file(image_path).extract_message(hash_to_key(user_hash))
+    except (OSError, ValueError) as e:
+        return str(e), -1
+
+    if not message:
+        return "", 4
+
+    return message, 0
@@ -0,0 +1,259 @@
+"""
+StegPass - Password Manager Application
+container.py - Multi-record container format (many credentials in one hidden byte stream)
+"""
+
+# ? Standard Imports
+import hmac
+import json
+import hashlib
+
+# ? Project Imports
+from app.core.obfuscator import crypt
+from app.core.message_block import SP_MAGIC_NUMBER
+
+#*************************************************************************
+#
+#  A container byte stream matches this format:
+#
+#  |        -- SP CONTAINER HEADER --          |     -- BODY --     |
+#  | Magic Number | SP Version | Body Length    | Record Table | Data |
+#  | 2 bytes      | 3 bytes    | varint         |              |      |
+#
+#  Record Table:  | Record Count | Record ID | Offset | Length | ...
+#                 | varint       | 8 bytes   | varint | varint |
+#
+#  Varints are unsigned LEB128 (7 bits per byte, least significant
+#  first), at most 5 bytes and 2^32 - 1.
+#
+#  Data: each record's JSON, encrypted with its own key, at its offset
+#  (relative to the start of the data).
+#
+#  Record IDs and record keys are derived from the encryption key, so
+#  a record can be found and decrypted without decrypting the others,
+#  and the record names are not visible without the encryption key.
+#
+#*************************************************************************
+
+# The version of the container format (registered in sp_version_history, see MessageBlock.cpp)
+SP_CONTAINER_VERSION = (0, 1, 0)
+
+# Magic number and version
+SP_CONTAINER_PREFIX_SIZE = 5
+
+# Largest encoded size of a varint, and the largest value (5 bytes could hold 35 bits, values are kept to 32)
+VARINT_MAX_SIZE = 5
+VARINT_MAX_VALUE = (1 << 32) - 1
+
+# Largest container header (prefix and body length)
+SP_CONTAINER_HEADER_MAX_SIZE = SP_CONTAINER_PREFIX_SIZE + VARINT_MAX_SIZE
+
+RECORD_ID_SIZE = 8
+
+def encode_varint(value : int) -> bytes:
+    """ Encodes an unsigned integer, 7 bits per byte, least significant first (LEB128)
+    """
+    if value < 0 or value > VARINT_MAX_VALUE:
+        raise ValueError("Varint out of range")
+
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+def decode_varint(data : bytes, offset : int) -> tuple[int, int]:
+    """ Decodes an unsigned varint
+
+    Args:
+        data (bytes): The bytes to decode from
+        offset (int): Where the varint starts
+
+    Returns:
+        tuple[int, int]: The value and the offset after the varint, or (None, offset) if it is incomplete, too
+        long or larger than VARINT_MAX_VALUE
+    """
+    value = 0
+    for i in range(VARINT_MAX_SIZE):
+        if offset + i >= len(data):
+            break
+        value |= (data[offset + i] & 0x7F) << (7 * i)
+        if not data[offset + i] & 0x80:
+            if value > VARINT_MAX_VALUE:
+                break
+            return value, offset + i + 1
+    return None, offset
+
+def is_container(block : bytes) -> bool:
+    """ Checks if the byte stream starts with a container header (of any length)
+    """
+    return (len(block) >= SP_CONTAINER_PREFIX_SIZE and block[0] == ((SP_MAGIC_NUMBER >> 8) & 0xFF)
+            and block[1] == (SP_MAGIC_NUMBER & 0xFF) and tuple(block[2:5]) == SP_CONTAINER_VERSION)
+
+def get_container_size(block : bytes) -> int:
+    """ Gets the size of the whole container from its first bytes
+
+    Args:
+        block (bytes): At least the first SP_CONTAINER_HEADER_MAX_SIZE bytes of the stream (fewer if the stream is shorter)
+
+    Returns:
+        int: The size of the header and body, or 0 if the header is not a valid container header
+    """
+    if not is_container(block):
+        return 0
+
+    body_length, body_offset = decode_varint(block, SP_CONTAINER_PREFIX_SIZE)
+    if body_length is None:
+        return 0
+    return body_offset + body_length
+
+def record_id(record_key : str, encryption_key : bytes) -> bytes:
+    """ The ID stored in the record table for a record key
+    """
+    return hmac.new(encryption_key, b'sp-record-id' + record_key.encode('utf-8'), hashlib.sha256).digest()[:RECORD_ID_SIZE]
+
+def record_encryption_key(record_id : bytes, encryption_key : bytes) -> bytes:
+    """ The 32 byte key a record's data is encrypted with
+    """
+    return hmac.new(encryption_key, b'sp-record-key' + record_id, hashlib.sha256).digest()
+
+def build_container(records : dict[str, dict], encryption_key : bytes) -> bytes:
+    """ Builds a container byte stream
+
+    Args:
+        records (dict[str, dict]): The records by key, each a JSON serializable dict of fields
+            (for example service, username, password and notes)
+        encryption_key (bytes): The 32 byte encryption key
+
+    Returns:
+        bytes: The container byte stream, ready to be hidden
+    """
+    table = bytearray(encode_varint(len(records)))
+    data = bytearray()
+
+    for key, fields in records.items():
+        rid = record_id(key, encryption_key)
+        payload = json.dumps({'key': key, 'fields': fields}).encode('utf-8')
+
+        table += rid + encode_varint(len(data)) + encode_varint(len(payload))
+        data += crypt(payload, record_encryption_key(rid, encryption_key))
+
+    body = bytes(table + data)
+    header = bytes([(SP_MAGIC_NUMBER >> 8) & 0xFF, SP_MAGIC_NUMBER & 0xFF, *SP_CONTAINER_VERSION])
+    return header + encode_varint(len(body)) + body
+
+def parse_record_table(container : bytes) -> tuple[list[tuple[bytes, int, int]], int]:
+    """ Reads the record table of a container (nothing is decrypted)
+
+    Args:
+        container (bytes): The container byte stream
+
+    Returns:
+        tuple[list[tuple[bytes, int, int]], int]: The (record id, offset, length) entries, and where the data starts
+        in the stream. ([], 0) if the container is incomplete or corrupt.
+    """
+    size = get_container_size(container)
+    if size == 0 or len(container) < size:
+        return [], 0
+
+    _, position = decode_varint(container, SP_CONTAINER_PREFIX_SIZE)
+    count, position = decode_varint(container, position)
+    if count is None:
+        return [], 0
+
+    table = []
+    for _ in range(count):
+        rid = bytes(container[position:position + RECORD_ID_SIZE])
+        offset, position = decode_varint(container, position + RECORD_ID_SIZE)
+        length, position = decode_varint(container, position)
+        if offset is None or length is None or len(rid) != RECORD_ID_SIZE:
+            return [], 0
+        table.append((rid, offset, length))
+
+    # every record must be inside the container
+    if any(position + offset + length > size for _, offset, length in table):
+        return [], 0
+
+    return table, position
+
+def decrypt_record(container : bytes, entry : tuple[bytes, int, int], data_offset : int, encryption_key : bytes) -> tuple[str, dict]:
+    """ Decrypts a single record of a container
+
+    Returns:
+        tuple[str, dict]: The record key and fields, or None if the record could not be decrypted
+    """
+    rid, offset, length = entry
+    encrypted = container[data_offset + offset:data_offset + offset + length]
+    try:
+        record = json.loads(crypt(encrypted, record_encryption_key(rid, encryption_key)).decode('utf-8'))
+        key, fields = record['key'], record['fields']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    # guards against a record whose ID collides with another key
+    if record_id(key, encryption_key) != rid:
+        return None
+    return key, fields
+
+def find_record(container : bytes, record_key : str, encryption_key : bytes) -> dict:
+    """ Looks up a single record by key, decrypting only that record
+
+    Args:
+        container (bytes): The container byte stream
+        record_key (str): The key of the record
+        encryption_key (bytes): The 32 byte encryption key
+
+    Returns:
+        dict: The fields of the record, or None if there is no such record (or the encryption key is wrong)
+    """
+    table, data_offset = parse_record_table(container)
+    rid = record_id(record_key, encryption_key)
+
+    for entry in table:
+        if entry[0] == rid:
+            record = decrypt_record(container, entry, data_offset, encryption_key)
+            if record is not None and record[0] == record_key:
+                return record[1]
+    return None
+
+def read_records(container : bytes, encryption_key : bytes) -> dict[str, dict]:
+    """ Decrypts every record of a container
+
+    Args:
+        container (bytes): The container byte stream
+        encryption_key (bytes): The 32 byte encryption key
+
+    Returns:
+        dict[str, dict]: The records by key, records that can't be decrypted with the key are left out
+    """
+    table, data_offset = parse_record_table(container)
+    records = {}
+    for entry in table:
+        record = decrypt_record(container, entry, data_offset, encryption_key)
+        if record is not None:
+            records[record[0]] = record[1]
+    return records
+
+def read_every_record(container : bytes, encryption_key : bytes) -> dict[str, dict]:
+    """ Decrypts every record of a container, for rewriting it (see run_rekey)
+
+    Args:
+        container (bytes): The container byte stream
+        encryption_key (bytes): The 32 byte encryption key
+
+    Returns:
+        dict[str, dict]: The records by key, or None if the container is empty or corrupt, or any record can't be
+        decrypted with the key (rewriting the container would lose it)
+    """
+    table, data_offset = parse_record_table(container)
+    records = {}
+    for entry in table:
+        record = decrypt_record(container, entry, data_offset, encryption_key)
+        if record is None or record[0] in records:
+            return None
+        records[record[0]] = record[1]
+    return records or None
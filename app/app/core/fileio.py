@@ -0,0 +1,134 @@
+"""
+StegPass - Password Manager Application
+fileio.py - Crash-safe file replacement and the advisory lock shared with the utilities (see sp::WriteFileAtomic
+and sp::FileLock in core/Utils.cpp)
+"""
+
+# ? Standard Imports
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+if os.name == 'nt':
+    import ctypes
+    import msvcrt
+    from ctypes import wintypes
+
+    LOCKFILE_EXCLUSIVE_LOCK = 0x2
+    LOCKFILE_SHARED_LOCK    = 0x0
+    FILE_ATTRIBUTE_HIDDEN   = 0x2
+
+    class _OVERLAPPED(ctypes.Structure):
+        _fields_ = [('Internal', ctypes.c_void_p), ('InternalHigh', ctypes.c_void_p),
+                    ('Offset', wintypes.DWORD), ('OffsetHigh', wintypes.DWORD), ('hEvent', wintypes.HANDLE)]
+
+    def _lock(fd : int, shared : bool = False):
+        # the same byte range as sp::FileLock, so the app and the utilities exclude each other
+        flags = LOCKFILE_SHARED_LOCK if shared else LOCKFILE_EXCLUSIVE_LOCK
+        if not ctypes.windll.kernel32.LockFileEx(wintypes.HANDLE(msvcrt.get_osfhandle(fd)), flags,
+                                                 0, 1, 0, ctypes.byref(_OVERLAPPED())):
+            raise ctypes.WinError()
+
+    def _unlock(fd : int):
+        ctypes.windll.kernel32.UnlockFileEx(wintypes.HANDLE(msvcrt.get_osfhandle(fd)), 0, 1, 0, ctypes.byref(_OVERLAPPED()))
+
+    def _open_lock_file(path : str) -> int:
+        created = not os.path.exists(path)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if created:
+            # hidden, like the lock files sp::FileLock creates (the dot only hides them on POSIX)
+            ctypes.windll.kernel32.SetFileAttributesW(path, FILE_ATTRIBUTE_HIDDEN)
+        return fd
+else:
+    import fcntl
+
+    def _lock(fd : int, shared : bool = False):
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+    def _unlock(fd : int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _open_lock_file(path : str) -> int:
+        return os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+LOCK_SUFFIX = '.lock'
+
+def lock_path(path : str) -> str:
+    """ Gets the path of the lock file of a file (.name.lock next to it)
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, f'.{name}{LOCK_SUFFIX}')
+
+def is_lock_file(path : str) -> bool:
+    """ Checks if a path is the lock file of another file (see lock_path), folder listings skip them
+    """
+    name = os.path.basename(path)
+    return name.startswith('.') and name.endswith(LOCK_SUFFIX)
+
+@contextmanager
+def file_lock(path : str, shared : bool = False):
+    """ Holds an exclusive advisory lock on a file for the with block. The lock is on a lock file next to it,
+    so it is not lost when the file is replaced. Waits (in the OS, without polling) for the current holder,
+    another thread, process or utility, to release it.
+
+    Args:
+        path (str): The path of the file to lock
+        shared (bool): Take a shared lock instead, held by many at once but excluding an exclusive holder
+
+    Raises:
+        OSError: If the lock file could not be opened or locked
+    """
+    fd = _open_lock_file(lock_path(path))
+    try:
+        _lock(fd, shared)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_replace(path : str, fsync : bool = True):
+    """ Opens a temporary file next to a file for writing and renames it over the file at the end of the with
+    block, so a crash leaves either the old or the new file. If the block raises, the file is left untouched.
+
+    Args:
+        path (str): The path of the file to replace (or create)
+        fsync (bool): Flush the new file (and the rename) to disk
+
+    Yields:
+        file: The temporary file, opened in binary write mode
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path), suffix='.tmp', dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if fsync:
+        fsync_folder(folder)
+
+def fsync_folder(folder : str):
+    """ Flushes a rename in a folder to disk (only possible, and needed, on POSIX)
+    """
+    if os.name == 'nt':
+        return
+
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,148 @@
+"""
+StegPass - Password Manager Application
+message_block.py - Python port of sp::MessageBlock (SP header + encrypted message)
+"""
+
+# ? Project Imports
+from app.core.obfuscator import crypt
+
+#*************************************************************************
+#
+#  The message byte stream should always match this format:
+#
+#  |      -- SP MESSAGE BLOCK HEADER --         |    -- DATA --     |
+#  | Magic Number | SP Version | Message Length | Encrypted Message |
+#  | 2 bytes      | 3 bytes    | 1 byte         | n bytes           |
+#
+#*************************************************************************
+
+# The magic number for the SP message block
+SP_MAGIC_NUMBER = 0x5350
+
+# The size of the SP header in bytes
+SP_HEADER_SIZE = 6
+
+# The index of the message length in the byte stream
+SP_MESSAGE_LENGTH_INDEX = 5
+
+# The version written by this implementation (see core/Export.hpp)
+SP_VERSION = (0, 0, 2)
+
+# Every version that can still be read (see sp_version_history in MessageBlock.cpp)
+SP_VERSION_HISTORY = {
+    (0, 0, 2),
+    (0, 1, 0), # multi-record container, see container.py
+}
+
+def build_message_block(message : str, encryption_key : bytes) -> bytes:
+    """ Builds the contiguous byte stream for a message, header included
+
+    Args:
+        message (str): The plaintext message to store
+        encryption_key (bytes): The 32 byte encryption key
+
+    Returns:
+        bytes: The message block byte stream
+    """
+    # include the null terminator in the message length
+    message_bytes = message.encode('utf-8') + b'\0'
+    if b'\0' in message_bytes[:-1]:
+        raise ValueError("Message cannot contain null characters.")
+    if len(message_bytes) > 0xFF:
+        raise ValueError("Message is too long to fit in a message block.")
+
+    header = bytes([
+        (SP_MAGIC_NUMBER >> 8) & 0xFF,
+        SP_MAGIC_NUMBER & 0xFF,
+        *SP_VERSION,
+        len(message_bytes),
+    ])
+
+    return header + crypt(message_bytes, encryption_key)
+
+def get_block_size(message : str) -> int:
+    """ Gets the number of bytes a message takes up once hidden, header included
+
+    Args:
+        message (str): The plaintext message
+
+    Returns:
+        int: The size of the message block
+    """
+    return SP_HEADER_SIZE + len(message.encode('utf-8')) + 1
+
+def has_magic_number(block : bytes) -> bool:
+    """ Checks if the byte stream starts with the SP magic number, whatever its version
+
+    Args:
+        block (bytes): The byte stream to check
+
+    Returns:
+        bool: True if a complete header starting with the magic number is present, False otherwise
+    """
+    if len(block) < SP_HEADER_SIZE:
+        return False
+
+    return block[0] == ((SP_MAGIC_NUMBER >> 8) & 0xFF) and block[1] == (SP_MAGIC_NUMBER & 0xFF)
+
+def get_version(block : bytes) -> tuple[int, int, int]:
+    """ Gets the SP version that wrote the byte stream
+
+    Args:
+        block (bytes): The byte stream, starting with the header
+
+    Returns:
+        tuple[int, int, int]: The version triple, or None if the header is incomplete
+    """
+    if len(block) < SP_HEADER_SIZE:
+        return None
+    return tuple(block[2:5])
+
+def validate_header(block : bytes) -> bool:
+    """ Checks if the byte stream starts with a valid SP header
+
+    Args:
+        block (bytes): The byte stream to validate (at least SP_HEADER_SIZE bytes)
+
+    Returns:
+        bool: True if the magic number and version are valid, False otherwise
+    """
+    return has_magic_number(block) and get_version(block) in SP_VERSION_HISTORY
+
+def get_message_length(block : bytes) -> int:
+    """ Gets the length of the encrypted message (null terminator included)
+
+    Args:
+        block (bytes): The byte stream, starting with the header
+
+    Returns:
+        int: The message length, or 0 if the header is incomplete
+    """
+    if len(block) < SP_HEADER_SIZE:
+        return 0
+    return block[SP_MESSAGE_LENGTH_INDEX]
+
+def decrypt_message(block : bytes, encryption_key : bytes) -> str:
+    """ Decrypts a complete message block (header and message)
+
+    Args:
+        block (bytes): The byte stream, header included
+        encryption_key (bytes): The 32 byte encryption key
+
+    Returns:
+        str: The decrypted message, or None if the header or message is invalid
+    """
+    if not validate_header(block):
+        return None
+
+    message_length = get_message_length(block)
+    if message_length == 0 or len(block) < SP_HEADER_SIZE + message_length:
+        return None
+
+    decoded = crypt(block[SP_HEADER_SIZE:SP_HEADER_SIZE + message_length], encryption_key)
+
+    # ensure the message is null-terminated and contains no other null bytes
+    if decoded[-1] != 0 or 0 in decoded[:-1]:
+        return None
+
+    return decoded[:-1].decode('utf-8', errors='replace')
@@ -0,0 +1,99 @@
+"""
+StegPass - Password Manager Application
+obfuscator.py - Python port of sp::Obfuscator (Blum Blum Shub keystream + XOR)
+"""
+
+# ? Standard Imports
+from functools import lru_cache
+import numpy as np
+
+# The BBS modulus, must match M in utility/core/src/Obfuscator.cpp
+BBS_MODULUS = 0xE2089EA5
+
+# The four 64-bit BBS states are seeded from the 32-byte key
+BBS_LANES = 4
+
+# Key streams are generated (and cached) in multiples of this many bytes
+KEY_STREAM_BLOCK = 256
+
+def hash_to_key(user_hash : str) -> bytes:
+    """ Converts a hex encoded SHA-256 hash to the 32 byte key used by the utilities (see sp::StringToHash)
+
+    Args:
+        user_hash (str): The 64 character hex string
+
+    Returns:
+        bytes: The 32 byte encryption key
+    """
+    key = bytes.fromhex(user_hash)
+    if len(key) != 32:
+        raise ValueError("Encryption key must be 32 bytes.")
+    return key
+
+def bbs(seed : bytes, length : int) -> bytes:
+    """ Generates a pseudo-random byte stream using the Blum Blum Shub algorithm
+
+    Args:
+        seed (bytes): The 32 byte seed (encryption key)
+        length (int): The number of bytes to generate
+
+    Returns:
+        bytes: The generated key stream
+    """
+    return bbs_many([seed], length)[0].tobytes()
+
+def bbs_many(seeds : list[bytes], length : int) -> np.ndarray:
+    """ Generates the BBS key streams of many seeds at once. Each step squares the four lanes of every seed
+    as a single uint64 vector operation, so the cost per step does not grow with the number of seeds.
+
+    Args:
+        seeds (list[bytes]): The 32 byte seeds (encryption keys)
+        length (int): The number of bytes to generate for each seed
+
+    Returns:
+        np.ndarray: A (len(seeds), length) uint8 array of key streams
+    """
+    # the native code reinterprets the key as four little-endian uint64 values
+    state = np.frombuffer(b''.join(seeds), dtype='<u8').reshape(len(seeds), BBS_LANES).astype(np.uint64)
+    modulus = np.uint64(BBS_MODULUS)
+
+    # byte i of a key stream comes from lane i % 4, so step s produces bytes 4s to 4s+3
+    steps = -(-length // BBS_LANES)
+    key_streams = np.empty((steps, len(seeds), BBS_LANES), dtype=np.uint8)
+    for step in range(steps):
+        # uint64 multiplication wraps before the modulo is applied, like the native code
+        np.multiply(state, state, out=state)
+        np.remainder(state, modulus, out=state)
+        key_streams[step] = state # keeps the low byte
+
+    return key_streams.transpose(1, 0, 2).reshape(len(seeds), steps * BBS_LANES)[:, :length]
+
+@lru_cache(maxsize=8)
+def key_stream(encryption_key : bytes, length : int) -> np.ndarray:
+    """ Gets the (read-only) key stream of a key. Recent key streams are cached, so encrypting and decrypting many
+    messages with the same key (bulk verification or re-encryption) only generates it once.
+
+    Args:
+        encryption_key (bytes): The 32 byte encryption key
+        length (int): The number of bytes needed
+
+    Returns:
+        np.ndarray: The key stream, at least length bytes
+    """
+    stream = bbs_many([encryption_key], length)[0]
+    stream.flags.writeable = False
+    return stream
+
+def crypt(data : bytes, encryption_key : bytes) -> bytes:
+    """ Encrypts or decrypts a byte array by XOR-ing it with the BBS key stream
+
+    Args:
+        data (bytes): The data to encrypt or decrypt
+        encryption_key (bytes): The 32 byte encryption key
+
+    Returns:
+        bytes: The encrypted/decrypted data
+    """
+    # messages are at most 255 bytes, one cached key stream covers all of them
+    stream = key_stream(bytes(encryption_key), max(KEY_STREAM_BLOCK, -(-len(data) // KEY_STREAM_BLOCK) * KEY_STREAM_BLOCK))
+    return np.bitwise_xor(np.frombuffer(data, dtype=np.uint8), stream[:len(data)]).tobytes()
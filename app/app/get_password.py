@@ -5,18 +5,20 @@ get_password.py - handles password retrieval from an image file
 
 # ? Standard Imports
 import os
-import pyperclip
-import time
-from win10toast import ToastNotifier
 import ctypes
-from tkinter import filedialog
+import glob
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # ? Project Imports
-from app.utils.utils import is_valid_sha256_hash, run_subprocess, fork_to_login, get_path_to_icon, show_error_message
+from app.utils.utils import is_valid_sha256_hash, show_error_message
 from app.utils.utility_fetcher import TargetType, UtilityFetcher
-from app.utils.config import SP_BUILD_TYPE
+from app.utils.config import SP_BUILD_TYPE, SP_BACKEND_TYPE
 from app.utils.user_manager import UserManager
-from app.utils.singleton import TSSingleton
+from app.utils.clipboard_manager import ClipboardManager, CLIPBOARD_CLEAR_DELAY
+from app.utils.utility_client import UtilityClient
+from app.utils.key_agent import AgentClient
+from app.utils.tracing import traced
+from app.core.fileio import is_lock_file
 
 def open_password_form(on_start, on_end):
     """ Opens a file dialog to select an image file and retrieves a password from it
@@ -25,6 +27,9 @@ def open_password_form(on_start, on_end):
         on_start (func): The function to call when the password retrieval process starts
         on_end (func): The function to call when the password retrieval process ends
     """
+    # Tk is only loaded by the modes that open windows
+    from tkinter import filedialog
+    
     on_start()
     
     user_manager = UserManager()
@@ -35,7 +40,7 @@ def open_password_form(on_start, on_end):
         password_folder = ""
     
     # Create a file dialog to select an image file
-    image_path = filedialog.askopenfilename(defaultextension=".bmp", filetypes=[("BMP files", "*.bmp")], initialdir=password_folder)
+    image_path = filedialog.askopenfilename(filetypes=TargetType.FileTypes(), initialdir=password_folder)
     
     if not image_path:
         on_end()
@@ -54,12 +59,15 @@ def open_password_form(on_start, on_end):
     else:
         show_error_message(f'Encountered unexpected utility error: {output}\nExit code: {exit_code}')
 
-def get_password(image_path, username = None) -> tuple[int, str]:
+@traced('get_password')
+def get_password(image_path, username = None, use_mmap = True) -> tuple[int, str]:
     """ Retrieves a password from an image file
     
     Args:
         image_path (str): The path to the image file
-        username (str): The username of the user, if not provided, use fork to login to choose a user
+        username (str): The username of the user, if not provided, log in to choose a user
+        use_mmap (bool): With the python backend, memory-map the image and only read the bytes holding the
+            password instead of the whole file
         
     Returns:
         tuple[int, str]: A tuple containing the exit code and the password (none when exit code is not 0).
@@ -76,6 +84,151 @@ def get_password(image_path, username = None) -> tuple[int, str]:
         7:  Bad config
         8:  Canceled Login
     """
+    exit_code, image_path = resolve_image_path(image_path)
+    if exit_code != 0:
+        return exit_code, image_path
+    
+    exit_code, user_hash = resolve_user_hash(username)
+    if exit_code != 0:
+        return exit_code, user_hash
+    
+    return extract_password(image_path, user_hash, use_mmap)
+
+def get_password_headless(image_path, username, key_fd = 0, use_mmap = True) -> tuple[int, str]:
+    """ Retrieves a password without any window, clipboard or notification. The master password is read
+    from a file descriptor, or the key agent decrypts the password, instead of the login window, so this can
+    run without a display.
+    
+    Args:
+        image_path (str): The path to the image file
+        username (str): The username of the user
+        key_fd (int): The file descriptor to read the master password from (one line, stdin by default),
+            None to have the key agent retrieve the password
+        use_mmap (bool): With the python backend, memory-map the image (see get_password)
+        
+    Returns:
+        tuple[int, str]: The exit code (see get_password, 8 if the master password is wrong) and the password,
+        or an error message.
+    """
+    exit_code, image_path = resolve_image_path(image_path)
+    if exit_code != 0:
+        return exit_code, image_path
+    
+    if key_fd is None:
+        result = AgentClient().extract(username, image_path)
+        if result is None:
+            return 8, "Could not recover password: The user is not unlocked in the key agent."
+        return result
+    
+    try:
+        master_password = read_master_password(key_fd)
+    except (OSError, ValueError) as e:
+        return 2, f"Error: Could not read the master password: {e}"
+    
+    user_hash = UserManager().unlock(username, master_password)
+    if user_hash is None:
+        return 8, "Could not recover password: Failed to login."
+    
+    return extract_password(image_path, user_hash, use_mmap)
+
+def read_master_password(key_fd) -> str:
+    """ Reads a master password from a file descriptor, up to the first newline (the descriptor is left open)
+    
+    Args:
+        key_fd (int): The file descriptor to read from
+        
+    Returns:
+        str: The master password
+        
+    Raises:
+        ValueError: If nothing was read, or it is not valid UTF-8
+    """
+    return read_master_passwords(key_fd, 1)[0]
+
+def read_master_passwords(key_fd, count) -> list:
+    """ Reads master passwords from a file descriptor, one per line (the descriptor is left open)
+    
+    Args:
+        key_fd (int): The file descriptor to read from
+        count (int): The number of passwords to read
+        
+    Returns:
+        list[str]: The master passwords
+        
+    Raises:
+        ValueError: If a line is empty or missing, or it is not valid UTF-8
+    """
+    # a single reader, a second one would miss what the first buffered
+    with os.fdopen(key_fd, 'rb', closefd=False) as key_file:
+        lines = [key_file.readline() for _ in range(count)]
+    
+    master_passwords = [line.decode('utf-8').rstrip('\r\n') for line in lines]
+    if not all(master_passwords):
+        raise ValueError("No master password given.")
+    return master_passwords
+
+def get_password_many(image_paths, username = None, use_mmap = True, max_workers = None):
+    """ Retrieves the passwords from many image files, resolving the user hash only once and
+    extracting on a pool of worker threads.
+    
+    Args:
+        image_paths (list[str]): The paths to the image files
+        username (str): The username of the user, if not provided, log in to choose a user
+        use_mmap (bool): With the python backend, memory-map the images (see get_password)
+        max_workers (int): The size of the worker pool, None to use the ThreadPoolExecutor default
+        
+    Yields:
+        tuple[str, int, str]: The image path, the exit code and the password (or error), in the order they complete.
+        The exit codes are the same as get_password.
+    """
+    exit_code, user_hash = resolve_user_hash(username)
+    if exit_code != 0:
+        for image_path in image_paths:
+            yield image_path, exit_code, user_hash
+        return
+    
+    def retrieve(image_path):
+        exit_code, resolved_path = resolve_image_path(image_path)
+        if exit_code != 0:
+            return exit_code, resolved_path
+        return extract_password(resolved_path, user_hash, use_mmap)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(retrieve, image_path) : image_path for image_path in image_paths}
+        
+        for future in as_completed(futures):
+            try:
+                exit_code, output = future.result()
+            except Exception as e:
+                exit_code, output = -1, f'Encountered unexpected utility error: {e}'
+            yield futures[future], exit_code, output
+
+def collect_image_paths(pattern) -> list[str]:
+    """ Collects the image files for a batch retrieval
+    
+    Args:
+        pattern (str): A directory (every supported image directly inside it) or a glob pattern
+        
+    Returns:
+        list[str]: The paths to the supported image files, sorted
+    """
+    if os.path.isdir(pattern):
+        candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+    else:
+        candidates = glob.glob(pattern)
+    
+    return sorted(path for path in candidates if not is_lock_file(path) and os.path.isfile(path) and
+                  TargetType.GetTargetType(path) != TargetType.NOT_FOUND)
+
+def resolve_image_path(image_path) -> tuple[int, str]:
+    """ Resolves a (possibly relative) image path and checks that it exists
+    
+    Args:
+        image_path (str): The path to the image file
+        
+    Returns:
+        tuple[int, str]: The exit code (see get_password) and the resolved path, or an error message.
+    """
     # check if image path is relative or absolute
     if not os.path.isabs(image_path):
         build = os.environ.get('SP_BUILD')
@@ -88,13 +241,24 @@ def get_password(image_path, username = None) -> tuple[int, str]:
         
         # on release build, the image path is relative where the app is executed (don't need to change it)
         
-    # Validate the image path and user hash
+    # Validate the image path
     if not os.path.exists(image_path):
         return 3, f"Error: The file '{image_path}' does not exist."
     
+    return 0, image_path
+
+def resolve_user_hash(username = None) -> tuple[int, str]:
+    """ Gets the user hash used as the encryption key, logging in if needed
     
+    Args:
+        username (str): The username of the user, if not provided, log in to choose a user
+        
+    Returns:
+        tuple[int, str]: The exit code (see get_password) and the user hash, or an error message.
+    """
     if username is None:
-        user_hash = fork_to_login()
+        from app.login import login # loads Tk, only needed when no user is given
+        user_hash = login()
     else:
         user_hash = UserManager().get_user_pass_hash(username)
         
@@ -104,53 +268,57 @@ def get_password(image_path, username = None) -> tuple[int, str]:
     if not is_valid_sha256_hash(user_hash):
         return 6, "Error: The user hash is not a valid SHA-256 hash."
     
+    return 0, user_hash
+
+@traced('extract_password')
+def extract_password(image_path, user_hash, use_mmap = True) -> tuple[int, str]:
+    """ Extracts a password from an existing image file with an already validated user hash
+    
+    Args:
+        image_path (str): The resolved path to the image file
+        user_hash (str): The user hash used as the encryption key
+        use_mmap (bool): With the python backend, memory-map the image (see get_password)
+        
+    Returns:
+        tuple[int, str]: The exit code (see get_password) and the password, or an error message.
+    """
     target_type = TargetType.GetTargetType(image_path)
     if target_type == TargetType.NOT_FOUND:
         return 5, "Error: Unsupported target type."
     
-    get_command = [UtilityFetcher.fetch_path(target_type), '-g', image_path, '-h', user_hash]
-    if get_command[0] is None:
-        return 7, "Error: Could not find the utility for the target type."
-    
-    stdout, exit_code = run_subprocess(get_command)
+    if UtilityFetcher.fetch_backend() == SP_BACKEND_TYPE.PYTHON:
+        target_format = TargetType.Get(target_type)
+        if target_format is None or target_format.codec is None:
+            return 7, "Error: Could not find the codec for the target type."
+        
+        stdout, exit_code = target_format.extract(image_path, user_hash, use_mmap)
+    else:
+        path_to_utility = UtilityFetcher.fetch_path(target_type)
+        if path_to_utility is None:
+            return 7, "Error: Could not find the utility for the target type."
+        
+        stdout, exit_code = UtilityClient().extract(path_to_utility, image_path, user_hash)
     
     if exit_code == -1:
         return -1, f'Encountered unexpected utility error: {stdout}'
     
     return exit_code, stdout
 
-# ToastNotifier singleton class
-class ToastNotifierSingleton(ToastNotifier, metaclass=TSSingleton):
-    pass
-
 def notify_user(password : str):
-    """ Notifies the user of the password, copies it to the clipboard, and clears the clipboard after 30 seconds
+    """ Notifies the user of the password, copies it to the clipboard, and schedules the clipboard to be cleared
+    after 30 seconds. Returns immediately (see ClipboardManager).
 
     Args:
         password (str): The password to notify the user of
     """
+    clipboard_manager = ClipboardManager()
     
     # use secure-copy utility to copy the password to the clipboard
-    stdout, exit = run_subprocess(f'{UtilityFetcher.fetch_path(TargetType.SECURE_COPY)} "{password}"')
-    if exit != 0:
+    if not clipboard_manager.copy(password, CLIPBOARD_CLEAR_DELAY):
         show_error_message(f"An error occurred while copying the password to the clipboard.")
         return
     
-    # we must make this a singleton to avoid multiple toasts in quick succession
-    notifier = ToastNotifierSingleton()
-    
-    notifier.show_toast(
-        "Password Copied to Clipboard",
-        "It will be cleared in 30 seconds.",
-        duration = 7,
-        icon_path = get_path_to_icon(),
-        threaded=True
-    )
-    
-    # wait 30 seconds before clearing the clipboard
-    time.sleep(30)
-    if password == pyperclip.paste():
-        pyperclip.copy(f" ")
+    clipboard_manager.notify("Password Copied to Clipboard", f"It will be cleared in {CLIPBOARD_CLEAR_DELAY} seconds.")
 
 if __name__ == '__main__':
     raise Exception("get_password.py is not meant to be run directly.")
\ No newline at end of file
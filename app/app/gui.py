@@ -18,6 +18,10 @@ from app.utils.utils import get_path_to_icon
 from app.widgets.theme import THEME
 from app.widgets.menu_bar import MenuBar, PopupMenu
 from app.utils.user_manager import UserManager
+from app.utils.utility_fetcher import TargetType, UtilityFetcher
+from app.utils.utility_client import UtilityClient
+from app.utils.config import SP_BACKEND_TYPE
+from app.utils.clipboard_manager import ClipboardManager
 
 class ManageUserWindow(tk.Frame):
     def __init__(self, master, **kwargs):
@@ -122,8 +126,21 @@ def GuiApp():
     
     # Show the initial page
     show_add_user_page()
+    
+    # Start the backend utility worker now, so the first store/retrieval does not wait for it
+    if UtilityFetcher.fetch_backend() == SP_BACKEND_TYPE.NATIVE:
+        path_to_utility = UtilityFetcher.fetch_path(TargetType.BMP)
+        if path_to_utility:
+            UtilityClient().prestart(path_to_utility)
+    
+    # Start the clipboard scheduler (and its toast notifier) before the first retrieval
+    clipboard_manager = ClipboardManager()
+    clipboard_manager.start_notifier()
 
     app.run()
     
+    # a password copied just before closing is still cleared on time
+    clipboard_manager.wait()
+    
 if __name__ == '__main__':
     raise Exception("This file is not meant to be run on its own. Please run app/main.py instead.")
\ No newline at end of file
@@ -6,6 +6,7 @@ login.py - GUI to handle user logins
 # ? Standard Imports
 import os
 import sys
+import threading
 import tkinter as tk
 from tkinter import ttk
 from tkinterdnd2 import TkinterDnD
@@ -14,8 +15,12 @@ from tkinterdnd2 import TkinterDnD
 from app.widgets.base_gui import BaseGui
 from app.widgets.theme import THEME
 from app.utils.user_manager import UserManager
-from app.utils.utils import sha256_hash, show_error_message, get_path_to_icon
+from app.utils.utils import show_error_message, get_path_to_icon, fork_to_login, convert_to_lowercase
+from app.utils.session_cache import SessionCache
+from app.utils.key_agent import AgentClient
+from app.utils.tracing import traced
 
+@traced('LogInApp')
 def LogInApp(default_user : str = None) -> str:
     """ Launches the login application
     
@@ -25,7 +30,67 @@ def LogInApp(default_user : str = None) -> str:
     Returns:
         str: The hash of the master password. None if the user cancels the login process.
     """
+    _, password_hash = LogInWindow(default_user)
+    return password_hash
+
+def login(default_user : str = None) -> str:
+    """ Prompts the user to log in, in this process: as a window of the running application if there is one,
+    otherwise as its own application. The password hash is cached for the session (see SessionCache).
+
+    Args:
+        default_user (str): The user to log in as. None if no default user is provided.
+
+    Returns:
+        str: The hash of the master password. None if the user cancels the login process.
+    """
+    master = BaseGui.running_root
+    
+    if threading.current_thread() is threading.main_thread():
+        username, password_hash = LogInWindow(default_user, master)
+    
+    elif master is not None:
+        # Tk must only be used from the thread running the main loop, so hand the window over to it
+        result = (None, None)
+        done = threading.Event()
+        
+        def show_login_window():
+            nonlocal result
+            try:
+                result = LogInWindow(default_user, master)
+            finally:
+                done.set()
+        
+        master.after(0, show_login_window)
+        while not done.wait(0.1):
+            if BaseGui.running_root is not master:
+                break # application was closed
+        username, password_hash = result
+    
+    else:
+        # no way to show a window from this thread
+        username, password_hash = default_user, fork_to_login(default_user)
+    
+    if username is not None and password_hash is not None:
+        SessionCache().put(convert_to_lowercase(username), password_hash)
+        
+        # other StegPass processes get the key from the agent instead of logging in again
+        AgentClient().add(convert_to_lowercase(username), password_hash)
+    
+    return password_hash
+
+def LogInWindow(default_user : str = None, master = None) -> tuple[str, str]:
+    """ Shows the login window and waits for the user to log in
+    
+    Args:
+        default_user (str): The user to log in as. None if no default user is provided.
+        master (tk.Tk): The running application to open the window in. None to run as its own application.
+
+    Returns:
+        tuple[str, str]: The user that logged in and the hash of the master password. (None, None) if the user
+        cancels the login process.
+    """
     app = BaseGui(
+        master = master,
         size = (450, 275),
         resizable = (False, False),
         icon = get_path_to_icon(),
@@ -38,13 +103,15 @@ def LogInApp(default_user : str = None) -> str:
     
     # No password hash yet
     password_hash = None
+    logged_in_user = None
     
     # Create and configure the select user combobox
     if default_user is None:
         if user_manager.count_users() == 0:
             # NOTE: This is a bug. The user should not be forked to login if there are no users.
             show_error_message("No users found. Please create a user first.")
-            return None
+            close_window(app)
+            return None, None
         
         # if no default user, use combo box to select user from list
         users = user_manager.get_users()
@@ -53,7 +120,8 @@ def LogInApp(default_user : str = None) -> str:
     else:
         if not user_manager.check_user_exists(default_user):
             show_error_message(f"The default user '{default_user}' was not found.")
-            return None
+            close_window(app)
+            return None, None
         
         # still use the combobox but disable and show the default user
         user_combobox = ttk.Combobox(content, values=[default_user], font=(THEME.FONT, 10), takefocus=False, width=25, foreground="grey", state='disabled')
@@ -115,12 +183,14 @@ def LogInApp(default_user : str = None) -> str:
             bad_login_label.config(text="** Enter a password to login **")
             return
         
-        if not UserManager().check_password(selected_user, password):
+        user_hash = UserManager().unlock(selected_user, password)
+        if user_hash is None:
             bad_login_label.config(text="** Incorrect Password **")
             return
 
-        nonlocal password_hash
-        password_hash = sha256_hash(password)
+        nonlocal password_hash, logged_in_user
+        password_hash = user_hash
+        logged_in_user = selected_user
         app.quit()
         
     # Button to submit (login)
@@ -133,7 +203,16 @@ def LogInApp(default_user : str = None) -> str:
     password_entry.bind("<Return>", lambda e: attempt_login())
     
     app.run()
-    return password_hash
+    close_window(app)
+    return logged_in_user, password_hash
+
+def close_window(app : BaseGui):
+    """ Destroys a window if it is still open
+    """
+    try:
+        app.root.destroy()
+    except tk.TclError:
+        pass # already closed
 
 if __name__ == '__main__':
     raise Exception("This file is not meant to be run on its own. Please run app/main.py instead.")
\ No newline at end of file
@@ -15,6 +15,9 @@ from app.widgets.drag_n_drop import DragDropWidget
 from app.widgets.theme import THEME
 from app.utils.user_manager import UserManager
 from app.utils.password_creator import PasswordCreator
+from app.utils.capacity import capacity
+from app.utils.utility_fetcher import TargetType
+from app.core.message_block import get_block_size
 
 class AddPasswordWindow(tk.Frame):
     def __init__(self, master, **kwargs):
@@ -35,6 +38,7 @@ class AddPasswordWindow(tk.Frame):
         self.path_label = tk.Label(right_column, text="Image Source: No image loaded", pady=10, font=(THEME.FONT, 10), bg=THEME.BG, fg=THEME.TEXT_COLOR, wraplength=max_column_width-20)
         self.path_label.pack(side="top", pady=(THEME.WINDOW_PADDING, 0), anchor='nw')
         self.original_path_to_image = None
+        self.image_capacity = None # bytes the image can hide without growing (see capacity)
         
         # Display the drag and drop widget at the top, taking up 50% of the height and 50% of the width, x-centered
         self.drag_drop_widget = DragDropWidget(right_column)
@@ -112,6 +116,9 @@ class AddPasswordWindow(tk.Frame):
         if self.original_path_to_image is None:
             return "* Please select an image"
         
+        if TargetType.GetTargetType(self.original_path_to_image) == TargetType.NOT_FOUND:
+            return "* The image format is not supported"
+        
         if self.password_entry.get() == "Enter Password" and self.password_entry.cget("fg") == "grey":
             return "* Please enter a password"
         
@@ -130,6 +137,10 @@ class AddPasswordWindow(tk.Frame):
         if '\0' in password:
             return "* Password cannot contain null characters"    
         
+        # the image would have to grow to hold the password
+        if self.image_capacity is not None and get_block_size(password) > self.image_capacity['total']:
+            return f"* Password is too long for this image ({self.image_capacity['total']} bytes available)"
+        
         return ""
             
     def _get_image_name(self):
@@ -159,11 +170,21 @@ class AddPasswordWindow(tk.Frame):
         if len(file_path) == 0:
             self.path_label.config(text="Image Source: No image loaded")
             self.original_path_to_image = None
+            self.image_capacity = None
             return
         
+        # only the headers are read, so this is cheap enough for the UI thread
+        try:
+            self.image_capacity = capacity(file_path)
+        except (OSError, ValueError):
+            self.image_capacity = None
+        
         # Truncate the file path if necessary
         truncated_path = self._truncate_path(file_path)
-        self.path_label.config(text=f"Path: {truncated_path}")
+        if self.image_capacity is not None:
+            self.path_label.config(text=f"Path: {truncated_path} ({self.image_capacity['total']} bytes free)")
+        else:
+            self.path_label.config(text=f"Path: {truncated_path}")
         self.original_path_to_image = file_path
         
     def reset_image(self):
@@ -297,7 +318,12 @@ class AddPasswordWindow(tk.Frame):
         # open file dialog if save to password folder is not checked
         if not save_to_password_folder:
             image_name = self._get_image_name()
-            path_to_save = filedialog.asksaveasfilename(defaultextension=".bmp", filetypes=[("BMP files", "*.bmp")], initialfile=image_name)
+            
+            # the copy is saved in the format of the original
+            target_format = TargetType.Get(TargetType.GetTargetType(self.original_path_to_image))
+            path_to_save = filedialog.asksaveasfilename(defaultextension=target_format.extensions[0],
+                                                        filetypes=[(f"{target_format.name} files", ' '.join('*' + extension for extension in target_format.extensions))],
+                                                        initialfile=image_name)
         else:
             path_to_save = user_manager.get_password_folder_path(username)
             
@@ -0,0 +1,114 @@
+"""
+StegPass - Password Manager Application
+capacity.py - Reports how many bytes an image can hide without growing, from its headers only
+"""
+
+# ? Standard Imports
+from concurrent.futures import ThreadPoolExecutor
+
+# ? Project Imports
+from app.utils.utility_fetcher import TargetType
+from app.core.message_block import get_block_size
+
+def capacity(image_path : str) -> dict:
+    """ Gets the bytes available in each region of an image, reading only its headers
+
+    Args:
+        image_path (str): The path to the image file
+
+    Returns:
+        dict: The bytes available per region ('padding', 'gap1', 'gap2') and their 'total' (see
+        BMPLayout.capacity), or None if the target type is not supported
+
+    Raises:
+        OSError: If the file could not be read
+        ValueError: If the file is not a valid image
+    """
+    target_format = TargetType.Get(TargetType.GetTargetType(image_path))
+    if target_format is None or target_format.codec is None:
+        return None
+
+    return target_format.capacity(image_path)
+
+def fits(image_path : str, message : str) -> bool:
+    """ Checks if a message can be hidden in an image without growing the file
+
+    Args:
+        image_path (str): The path to the image file
+        message (str): The plaintext message
+
+    Returns:
+        bool: True if the message fits, False otherwise (or if the image can't be read)
+    """
+    try:
+        available = capacity(image_path)
+    except (OSError, ValueError):
+        return False
+
+    return available is not None and available['total'] >= get_block_size(message)
+
+def check_store(image_path : str, message : str) -> str:
+    """ Checks that hiding a message can't corrupt an image. A message that doesn't fit grows the file, except
+    when Gap1 overlaps the pixel array (bfOffBits below the Gap1 offset): the rest of the message would then
+    overwrite its own start, and the password could not be read back.
+
+    Args:
+        image_path (str): The path to the image file
+        message (str): The plaintext message
+
+    Returns:
+        str: An error message, or an empty string if the message can be stored (or the target type has no codec)
+
+    Raises:
+        OSError: If the file could not be read
+        ValueError: If the file is not a valid image
+    """
+    available = capacity(image_path)
+    if available is None or not available['gap1_overlaps_pixels'] or get_block_size(message) <= available['total']:
+        return ""
+
+    return f"The password is too long for this image ({available['total']} bytes available)."
+
+def capacity_many(image_paths : list[str], max_workers : int = 4):
+    """ Gets the capacity of many images, reading their headers on a thread pool (in chunks, a header read
+    is too cheap to be worth a task of its own)
+
+    Args:
+        image_paths (list[str]): The paths to the image files
+        max_workers (int): Threads to read headers with
+
+    Yields:
+        tuple[str, dict, str]: The image path, its capacity (None on errors) and an error message, in input order
+    """
+    def read(chunk):
+        results = []
+        for image_path in chunk:
+            try:
+                available = capacity(image_path)
+                results.append((image_path, available, "" if available is not None else "Unsupported target type"))
+            except (OSError, ValueError) as e:
+                results.append((image_path, None, str(e)))
+        return results
+
+    chunk_size = max(1, -(-len(image_paths) // (max_workers * 4)))
+    chunks = [image_paths[i:i + chunk_size] for i in range(0, len(image_paths), chunk_size)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for results in executor.map(read, chunks):
+            yield from results
+
+def select_images(image_paths : list[str], size : int, max_workers : int = 4) -> list[tuple[str, dict]]:
+    """ Picks the images that can hide a payload of the given size without growing
+
+    Args:
+        image_paths (list[str]): The candidate image paths
+        size (int): The payload size in bytes (see get_block_size)
+        max_workers (int): Threads to read headers with
+
+    Returns:
+        list[tuple[str, dict]]: The images that fit and their capacity, tightest fit first
+    """
+    selected = [(path, available) for path, available, _ in capacity_many(image_paths, max_workers)
+                if available is not None and available['total'] >= size]
+    selected.sort(key=lambda item: item[1]['total'])
+    return selected
@@ -0,0 +1,103 @@
+"""
+StegPass - Password Manager Application
+clipboard_manager.py - Copies passwords to the clipboard and clears them after a delay, without blocking the caller
+"""
+
+# ? Standard Imports
+import time
+import threading
+
+# ? Project Imports
+from app.utils.utils import run_subprocess, get_path_to_icon
+from app.utils.utility_fetcher import TargetType, UtilityFetcher
+from app.utils.singleton import TSSingleton
+
+# Seconds a password stays on the clipboard
+CLIPBOARD_CLEAR_DELAY = 30
+
+class ClipboardManager(metaclass=TSSingleton):
+    """ Owns the clipboard-clear deadline. A single scheduler thread clears the clipboard when the deadline
+    passes, and copying a new password supersedes the pending clear instead of starting another timer.
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = None     # the password to clear from the clipboard
+        self.deadline = None    # when to clear it (time.monotonic)
+
+        # importing win10toast is slow: the GUI creates the notifier at startup (see start_notifier),
+        # the command line modes on their first toast, most of them never show one
+        self.notifier = None
+
+        self.scheduler = threading.Thread(target=self._run_scheduler, name='clipboard-scheduler', daemon=True)
+        self.scheduler.start()
+
+    def copy(self, password : str, clear_after : float = CLIPBOARD_CLEAR_DELAY) -> bool:
+        """ Copies a password to the clipboard (hidden from clipboard monitors) and schedules it to be cleared.
+        Returns immediately.
+
+        Args:
+            password (str): The password to copy
+            clear_after (float): Seconds before the clipboard is cleared
+
+        Returns:
+            bool: True if the password was copied, False otherwise
+        """
+        try:
+            _, exit_code = run_subprocess([UtilityFetcher.fetch_path(TargetType.SECURE_COPY), password])
+        except Exception:
+            return False
+
+        if exit_code != 0:
+            return False
+
+        with self.condition:
+            self.pending = password
+            self.deadline = time.monotonic() + clear_after
+            self.condition.notify_all()
+
+        return True
+
+    def start_notifier(self):
+        """ Creates the toast notifier now, so the first notification does not wait for it
+        """
+        with self.condition:
+            if self.notifier is None:
+                from win10toast import ToastNotifier
+                self.notifier = ToastNotifier()
+
+    def notify(self, title : str, message : str):
+        """ Shows a toast notification, without waiting for it
+        """
+        self.start_notifier()
+        self.notifier.show_toast(title, message, duration=7, icon_path=get_path_to_icon(), threaded=True)
+
+    def wait(self):
+        """ Blocks until there is no pending clear (the scheduler thread does not outlive the process)
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.pending is None)
+
+    def _run_scheduler(self):
+        """ Sleeps until the current deadline, then clears the clipboard if it still holds the password
+        """
+        # imported on the scheduler thread, so copying a password never waits for it
+        import pyperclip
+
+        with self.condition:
+            while True:
+                if self.pending is None:
+                    self.condition.wait()
+                    continue
+
+                remaining = self.deadline - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining) # woken early if a new password is copied
+                    continue
+
+                # leave the clipboard alone if the user copied something else since
+                if pyperclip.paste() == self.pending:
+                    pyperclip.copy(" ")
+
+                self.pending = None
+                self.deadline = None
+                self.condition.notify_all()
@@ -20,6 +20,43 @@ class SP_BUILD_TYPE:
         """
         return build_type == SP_BUILD_TYPE.RELEASE or build_type == SP_BUILD_TYPE.DEBUG
 
+class SP_BACKEND_TYPE:
+    """ Enumerates the steganography backends that can be used
+    """
+    NATIVE = 'native' # Spawn the backend utility executables
+    PYTHON = 'python' # Use the in-process codecs (app.core)
+    
+    @staticmethod
+    def IsValid(backend_type : str) -> bool:
+        """ Checks if the given backend type is valid
+        
+        Args:
+            backend_type (str): The backend type to check
+        
+        Returns:
+            bool: True if the backend type is valid, False otherwise
+        """
+        return backend_type == SP_BACKEND_TYPE.NATIVE or backend_type == SP_BACKEND_TYPE.PYTHON
+
+class SP_USER_STORE_TYPE:
+    """ Enumerates the storage backends that can hold the user data
+    """
+    JSON = 'json'     # A single JSON file, rewritten on every change
+    LOG = 'log'       # An append-only log, compacted periodically
+    SQLITE = 'sqlite' # A SQLite database
+    
+    @staticmethod
+    def IsValid(store_type : str) -> bool:
+        """ Checks if the given user store type is valid
+        
+        Args:
+            store_type (str): The user store type to check
+        
+        Returns:
+            bool: True if the user store type is valid, False otherwise
+        """
+        return store_type in (SP_USER_STORE_TYPE.JSON, SP_USER_STORE_TYPE.LOG, SP_USER_STORE_TYPE.SQLITE)
+
 def setup_config():
     """ Sets up the environment variables needed for the application from the config file.
     """
@@ -41,4 +78,33 @@ def setup_config():
     os.environ['SP_BUILD'] = config.get('app', 'build')
     
     if os.environ['SP_BUILD'] != SP_BUILD_TYPE.RELEASE and os.environ['SP_BUILD'] != SP_BUILD_TYPE.DEBUG:
-        raise Exception(f"Invalid build type in config file: {os.environ['SP_BUILD']}")
\ No newline at end of file
+        raise Exception(f"Invalid build type in config file: {os.environ['SP_BUILD']}")
+    
+    os.environ['SP_BACKEND'] = config.get('app', 'backend', fallback=SP_BACKEND_TYPE.NATIVE)
+    if not SP_BACKEND_TYPE.IsValid(os.environ['SP_BACKEND']):
+        raise Exception(f"Invalid backend type in config file: {os.environ['SP_BACKEND']}")
+    
+    # how long a login is remembered for, in seconds (0 to always log in)
+    os.environ['SP_SESSION_TTL'] = config.get('session', 'ttl', fallback='900')
+    if not os.environ['SP_SESSION_TTL'].isdigit():
+        raise Exception(f"Invalid session ttl in config file: {os.environ['SP_SESSION_TTL']}")
+    
+    # the key agent (see key_agent.py): its socket (empty for the default) and how long it keeps keys, in seconds
+    os.environ['SP_AGENT_SOCKET'] = config.get('agent', 'socket', fallback='')
+    os.environ['SP_AGENT_TTL'] = config.get('agent', 'ttl', fallback='3600')
+    if not os.environ['SP_AGENT_TTL'].isdigit():
+        raise Exception(f"Invalid agent ttl in config file: {os.environ['SP_AGENT_TTL']}")
+    
+    # the time deriving a new master password verifier should take on this host, in milliseconds (see kdf.py)
+    os.environ['SP_KDF_TARGET_MS'] = config.get('users', 'kdf_target_ms', fallback='250')
+    if not os.environ['SP_KDF_TARGET_MS'].isdigit():
+        raise Exception(f"Invalid kdf target in config file: {os.environ['SP_KDF_TARGET_MS']}")
+    
+    os.environ['SP_USER_STORE'] = config.get('users', 'store', fallback=SP_USER_STORE_TYPE.JSON)
+    if not SP_USER_STORE_TYPE.IsValid(os.environ['SP_USER_STORE']):
+        raise Exception(f"Invalid user store type in config file: {os.environ['SP_USER_STORE']}")
+    
+    # the jobs the ingest service (see ingest.py) runs at once
+    os.environ['SP_INGEST_WORKERS'] = config.get('ingest', 'workers', fallback='4')
+    if not os.environ['SP_INGEST_WORKERS'].isdigit() or int(os.environ['SP_INGEST_WORKERS']) == 0:
+        raise Exception(f"Invalid ingest workers in config file: {os.environ['SP_INGEST_WORKERS']}")
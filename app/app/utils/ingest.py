@@ -0,0 +1,413 @@
+"""
+StegPass - Password Manager Application
+ingest.py - Watches a spool folder and stores the passwords of the jobs dropped into it
+"""
+
+# ? Standard Imports
+import os
+import sys
+import json
+import time
+import shutil
+import select
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ? Project Imports
+from app.utils.password_creator import PasswordCreator
+from app.utils.user_manager import UserManager
+from app.utils.utility_fetcher import TargetType
+from app.utils.utils import convert_to_lowercase
+from app.utils.tracing import span
+
+#*************************************************************************
+#
+#  A job is an image and a sidecar named after it, <image>.json:
+#
+#      {"user": "alice", "password": "...", "name": "github.bmp", "replace": false}
+#
+#  'name' (the file name in the user's password folder) defaults to the
+#  image's, and an existing file is only overwritten if 'replace' is true.
+#  The image must be complete before the sidecar appears: write it first,
+#  then write the sidecar to a temporary name and rename it into the spool.
+#
+#  Stored jobs are removed from the spool (the image now lives in the
+#  password folder), failed jobs are moved to <spool>/failed. Jobs read
+#  from stdin (see ingest_stream) also give the 'image' path, which is
+#  left where it is.
+#
+#  The users must be unlocked in the key agent (main.py --agent-unlock).
+#
+#*************************************************************************
+
+# Used if SP_INGEST_WORKERS is not set (see setup_config)
+DEFAULT_INGEST_WORKERS = 4
+
+# Jobs queued per worker before the watcher stops picking up new ones
+INGEST_QUEUE_PER_WORKER = 2
+
+# Seconds between scans of the spool when inotify is not available
+INGEST_POLL_INTERVAL = 1.0
+
+# Seconds between full scans with inotify, in case events were lost
+INGEST_RESCAN_INTERVAL = 30.0
+
+SIDECAR_SUFFIX = '.json'
+FAILED_FOLDER = 'failed'
+
+# Images being stored by a job, and how many jobs store each, so a job that must not replace an image does not
+# race one that is creating it
+_storing = {}
+_storing_lock = threading.Lock()
+
+class IngestError(Exception):
+    """ A job that can't be run, with the exit code it is reported with (see store_password_with_hash)
+    """
+    def __init__(self, exit_code : int, message : str):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+class InotifyWatcher:
+    """ Waits for files to be written or moved into a folder (Linux only)
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO    = 0x00000080
+    IN_Q_OVERFLOW  = 0x00004000
+    IN_NONBLOCK    = 0o4000
+    IN_CLOEXEC     = 0o2000000
+
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, folder : str):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Could not watch {folder}")
+
+    def wait(self, timeout : float) -> list[str]:
+        """ Waits for events
+
+        Args:
+            timeout (float): The most seconds to wait
+
+        Returns:
+            list[str]: The names of the files written, or None if events were lost (the folder should be scanned)
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            names.append(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+class IngestService:
+    """ Runs the jobs dropped into a spool folder on a bounded pool of worker threads. The spool is watched with
+    inotify where available, otherwise it is scanned every INGEST_POLL_INTERVAL seconds. When every worker is busy
+    and the queue is full, the watcher waits for a slot, so a burst of jobs stays in the spool (and the inotify
+    queue) instead of in memory.
+    """
+    def __init__(self, spool : str, workers : int = None, report = None):
+        """
+        Args:
+            spool (str): The folder to watch
+            workers (int): The number of jobs run at once, SP_INGEST_WORKERS by default
+            report (func): Called with the outcome of each job (see run_job), from the worker threads
+        """
+        self.spool = os.path.abspath(spool)
+        self.workers = workers or int(os.environ.get('SP_INGEST_WORKERS', DEFAULT_INGEST_WORKERS))
+        self.report = report or print_outcome
+        self.slots = threading.BoundedSemaphore(self.workers * (1 + INGEST_QUEUE_PER_WORKER))
+        self.stop_event = threading.Event()
+
+        # sidecars queued or running, so a rescan doesn't pick them up twice
+        self.pending = set()
+        self.pending_lock = threading.Lock()
+
+    def stop(self):
+        """ Stops watching (the jobs already queued still run)
+        """
+        self.stop_event.set()
+
+    def serve_forever(self):
+        """ Watches the spool until stop() is called
+
+        Raises:
+            OSError: If the spool folder does not exist
+        """
+        if not os.path.isdir(self.spool):
+            raise OSError(f"The spool folder does not exist: {self.spool}")
+
+        try:
+            watcher = InotifyWatcher(self.spool) if sys.platform.startswith('linux') else None
+        except (OSError, AttributeError):
+            watcher = None
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ingest') as executor:
+            try:
+                self._watch(executor, watcher)
+            finally:
+                if watcher is not None:
+                    watcher.close()
+
+    def _watch(self, executor : ThreadPoolExecutor, watcher : InotifyWatcher):
+        # watch before the first scan, so nothing dropped in between is missed
+        self._submit_all(executor, self.scan(settle=watcher is None))
+        last_scan = time.monotonic()
+
+        while not self.stop_event.is_set():
+            if watcher is None:
+                self.stop_event.wait(INGEST_POLL_INTERVAL)
+                names = None
+            else:
+                names = watcher.wait(INGEST_POLL_INTERVAL)
+                if time.monotonic() - last_scan >= INGEST_RESCAN_INTERVAL:
+                    names = None
+
+            if names is None:
+                sidecars = self.scan(settle=watcher is None)
+                last_scan = time.monotonic()
+            else:
+                sidecars = [os.path.join(self.spool, sidecar_name(name)) for name in names]
+            self._submit_all(executor, sidecars)
+
+    def scan(self, settle : bool = False) -> list[str]:
+        """ Lists the sidecars in the spool
+
+        Args:
+            settle (bool): Skip the jobs written too recently to be sure they are complete (when polling)
+
+        Returns:
+            list[str]: The paths of the sidecars, oldest first
+        """
+        now = time.time()
+        found = []
+        with os.scandir(self.spool) as it:
+            for dir_entry in it:
+                if not dir_entry.name.endswith(SIDECAR_SUFFIX) or dir_entry.name.startswith('.'):
+                    continue
+                try:
+                    mtime = dir_entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if settle and now - mtime < INGEST_POLL_INTERVAL:
+                    continue
+                found.append((mtime, dir_entry.path))
+        return [path for _, path in sorted(found)]
+
+    def _submit_all(self, executor : ThreadPoolExecutor, sidecars : list[str]):
+        for sidecar in sidecars:
+            if self.stop_event.is_set():
+                return
+            if os.path.basename(sidecar).startswith('.'):
+                continue # temporary files
+            if not os.path.isfile(sidecar) or not os.path.isfile(sidecar[:-len(SIDECAR_SUFFIX)]):
+                continue # the image is not there yet, its own event picks the job up
+
+            with self.pending_lock:
+                if sidecar in self.pending:
+                    continue
+                self.pending.add(sidecar)
+
+            self.slots.acquire() # backpressure, wait for a worker to free a slot
+            future = executor.submit(self._run, sidecar)
+            future.add_done_callback(lambda _: self.slots.release())
+
+    def _run(self, sidecar : str):
+        try:
+            outcome = run_job(sidecar)
+            if outcome['exit_code'] == 0:
+                for path in (sidecar, sidecar[:-len(SIDECAR_SUFFIX)]):
+                    os.remove(path)
+            else:
+                move_to_failed(sidecar)
+        except Exception as e:
+            outcome = {'job': os.path.basename(sidecar), 'exit_code': -1, 'error': str(e)}
+        finally:
+            with self.pending_lock:
+                self.pending.discard(sidecar)
+
+        self.report(outcome)
+
+def sidecar_name(name : str) -> str:
+    """ Gets the name of the sidecar of a file in the spool (a sidecar is its own)
+    """
+    return name if name.endswith(SIDECAR_SUFFIX) else name + SIDECAR_SUFFIX
+
+def read_job(sidecar : str) -> dict:
+    """ Reads and validates a job's sidecar
+
+    Args:
+        sidecar (str): The path to the sidecar
+
+    Returns:
+        dict: The job, with the 'user', the 'password', the 'name' of the stored image and 'replace'
+
+    Raises:
+        IngestError: If the sidecar can't be read or is not a valid job
+    """
+    try:
+        with open(sidecar, 'r', encoding='utf-8') as f:
+            job = json.load(f)
+    except (OSError, ValueError) as e:
+        raise IngestError(2, f"Invalid job: {e}")
+
+    return check_job(job, os.path.basename(sidecar)[:-len(SIDECAR_SUFFIX)])
+
+def check_job(job, default_name : str) -> dict:
+    """ Validates a job and fills in its defaults (see read_job)
+    """
+    if not isinstance(job, dict):
+        raise IngestError(2, "Invalid job: Not a JSON object.")
+
+    for field in ('user', 'password'):
+        if not isinstance(job.get(field), str) or not job[field]:
+            raise IngestError(2, f"Invalid job: '{field}' is missing.")
+
+    name = job.get('name') or default_name
+    if not isinstance(name, str) or os.path.basename(name) != name or name in ('.', '..'):
+        raise IngestError(2, f"Invalid job: '{name}' is not a file name.")
+
+    return {'user': job['user'], 'password': job['password'], 'name': name, 'replace': job.get('replace') is True}
+
+def run_job(sidecar : str, image_path : str = None, job : dict = None) -> dict:
+    """ Stores the password of a job in the user's password folder
+
+    Args:
+        sidecar (str): The path to the job's sidecar
+        image_path (str): The path to the image, next to the sidecar by default
+        job (dict): The job if it was already read (see check_job)
+
+    Returns:
+        dict: The outcome: the 'job' name, the 'user', the 'path' of the stored image, the 'exit_code'
+        (see store_password_with_hash, 2 for an invalid job, 6 for a password the image can't hold, 8 for a
+        user that is not unlocked and 9 while the user's master password is changing), an 'error' message and the 'ms' it took. The password is never included.
+    """
+    start = time.perf_counter()
+    image_path = image_path or sidecar[:-len(SIDECAR_SUFFIX)]
+    outcome = {'job': os.path.basename(image_path), 'user': None, 'path': None, 'exit_code': 0, 'error': ""}
+
+    with span('ingest.job') as timing:
+        try:
+            job = job or read_job(sidecar)
+            outcome['user'] = job['user']
+
+            user_manager = UserManager()
+            if not user_manager.check_user_exists(convert_to_lowercase(job['user'])):
+                raise IngestError(2, f"Invalid job: The user '{job['user']}' does not exist.")
+
+            dest = os.path.join(user_manager.get_password_folder_path(job['user']), job['name'])
+            if TargetType.GetTargetType(dest) != TargetType.GetTargetType(image_path):
+                raise IngestError(2, f"Invalid job: '{job['name']}' is not the type of the image.")
+
+            with _storing_lock:
+                if (os.path.exists(dest) or dest in _storing) and not job['replace']:
+                    raise IngestError(2, f"Invalid job: '{job['name']}' already exists.")
+                _storing[dest] = _storing.get(dest, 0) + 1
+
+            try:
+                exit_code, output = PasswordCreator().store_password_headless(job['user'], job['password'], image_path, dest)
+            finally:
+                with _storing_lock:
+                    _storing[dest] -= 1
+                    if _storing[dest] == 0:
+                        del _storing[dest]
+
+            if exit_code != 0:
+                raise IngestError(exit_code, output)
+            outcome['path'] = output
+        except IngestError as e:
+            outcome.update(exit_code=e.exit_code, error=str(e))
+
+        timing.set(exit_code=outcome['exit_code'])
+
+    outcome['ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return outcome
+
+def move_to_failed(sidecar : str):
+    """ Moves a failed job (its image and sidecar) to the failed folder of the spool, so it is not run again.
+    Move them back into the spool to retry.
+    """
+    failed_folder = os.path.join(os.path.dirname(sidecar), FAILED_FOLDER)
+    os.makedirs(failed_folder, mode=0o700, exist_ok=True)
+
+    for path in (sidecar[:-len(SIDECAR_SUFFIX)], sidecar):
+        if os.path.exists(path):
+            shutil.move(path, os.path.join(failed_folder, os.path.basename(path)))
+
+def ingest_stream(stream, workers : int = None, report = None) -> int:
+    """ Runs the jobs read from a stream, one JSON object per line with the 'image' path and the sidecar fields.
+    The images are left where they are.
+
+    Args:
+        stream: The text stream to read (stdin)
+        workers (int): The number of jobs run at once, SP_INGEST_WORKERS by default
+        report (func): Called with the outcome of each job (see run_job)
+
+    Returns:
+        int: The number of jobs that failed
+    """
+    workers = workers or int(os.environ.get('SP_INGEST_WORKERS', DEFAULT_INGEST_WORKERS))
+    report = report or print_outcome
+    slots = threading.BoundedSemaphore(workers * (1 + INGEST_QUEUE_PER_WORKER))
+    failed = 0
+    failed_lock = threading.Lock()
+
+    def run(line_number : int, line : str):
+        nonlocal failed
+        try:
+            job = json.loads(line)
+            image_path = job.get('image') if isinstance(job, dict) else None
+            if not isinstance(image_path, str) or not image_path:
+                raise IngestError(2, "Invalid job: 'image' is missing.")
+            outcome = run_job(None, image_path, check_job(job, os.path.basename(image_path)))
+        except (ValueError, IngestError) as e:
+            outcome = {'job': f'<stdin>:{line_number}', 'exit_code': getattr(e, 'exit_code', 2), 'error': str(e)}
+        except Exception as e:
+            outcome = {'job': f'<stdin>:{line_number}', 'exit_code': -1, 'error': str(e)}
+
+        if outcome['exit_code'] != 0:
+            with failed_lock:
+                failed += 1
+        report(outcome)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest') as executor:
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            slots.acquire()
+            executor.submit(run, line_number, line).add_done_callback(lambda _: slots.release())
+
+    return failed
+
+_print_lock = threading.Lock()
+
+def print_outcome(outcome : dict):
+    """ Prints the outcome of a job as a JSON line
+    """
+    with _print_lock:
+        print(json.dumps(outcome), flush=True)
@@ -0,0 +1,155 @@
+"""
+StegPass - Password Manager Application
+kdf.py - Derives the master password verifiers kept in the user store and the key the images are encrypted with
+(salted scrypt, cost calibrated on the host)
+"""
+
+# ? Standard Imports
+import os
+import hmac
+import time
+import hashlib
+
+# ? Project Imports
+from app.utils.utils import sha256_hash
+from app.utils.tracing import traced
+
+# Version of the verifier records written by make_verifier. Version 1 records only verify the password, the images
+# of their users are still encrypted with sha256(master). Version 2 records also derive the image key.
+KDF_VERSION = 2
+KDF_NAME = 'scrypt'
+
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_SIZE = 16
+VERIFIER_SIZE = 32
+KEY_SIZE = 32
+
+# Bounds of the calibrated cost, as log2 of the scrypt N parameter (2**17 uses 128 MiB)
+SCRYPT_MIN_LOG_N = 14
+SCRYPT_MAX_LOG_N = 17
+
+# Used if SP_KDF_TARGET_MS is not set (see setup_config)
+DEFAULT_KDF_TARGET_MS = 250
+
+# Pepper of the legacy verifiers, sha256(master + pepper) as a hex string
+LEGACY_PEPPER = "chizom"
+
+# Calibrated log2 N of this process, measured once
+_calibrated_log_n = None
+
+def scrypt(master_password : str, salt : bytes, log_n : int, r : int = SCRYPT_R, p : int = SCRYPT_P,
+           dklen : int = VERIFIER_SIZE) -> bytes:
+    """ Runs scrypt with enough memory allowed for the given cost
+    """
+    n = 1 << log_n
+    return hashlib.scrypt(master_password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * n, dklen=dklen)
+
+def calibrate(target_ms : float = None) -> int:
+    """ Finds the largest scrypt cost that derives a verifier within the target latency on this host. The
+    time of the smallest cost is measured once and scaled, scrypt time being linear in N.
+
+    Args:
+        target_ms (float): The target latency in milliseconds, SP_KDF_TARGET_MS by default
+
+    Returns:
+        int: log2 of the scrypt N parameter, between SCRYPT_MIN_LOG_N and SCRYPT_MAX_LOG_N
+    """
+    global _calibrated_log_n
+    if target_ms is None and _calibrated_log_n is not None:
+        return _calibrated_log_n
+
+    target = float(target_ms if target_ms is not None else os.environ.get('SP_KDF_TARGET_MS', DEFAULT_KDF_TARGET_MS))
+
+    start = time.perf_counter()
+    scrypt('calibration', bytes(SALT_SIZE), SCRYPT_MIN_LOG_N)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    log_n = SCRYPT_MIN_LOG_N
+    while log_n < SCRYPT_MAX_LOG_N and elapsed_ms * 2 <= target:
+        elapsed_ms *= 2
+        log_n += 1
+
+    if target_ms is None:
+        _calibrated_log_n = log_n
+    return log_n
+
+@traced('kdf.make_verifier')
+def make_verifier(master_password : str, log_n : int = None) -> dict:
+    """ Derives the verifier of a new master password, with a new salt. A single scrypt call gives the verifier
+    (kept) and the image key (never stored, see unlock).
+
+    Args:
+        master_password (str): The master password
+        log_n (int): log2 of the scrypt N parameter, calibrated by default
+
+    Returns:
+        dict: The verifier record to keep in the user store
+    """
+    log_n = calibrate() if log_n is None else log_n
+    salt = os.urandom(SALT_SIZE)
+    derived = scrypt(master_password, salt, log_n, dklen=VERIFIER_SIZE + KEY_SIZE)
+    return {'kdf': KDF_NAME, 'version': KDF_VERSION, 'salt': salt.hex(), 'log_n': log_n, 'r': SCRYPT_R, 'p': SCRYPT_P,
+            'hash': derived[:VERIFIER_SIZE].hex()}
+
+@traced('kdf.unlock')
+def unlock(verifier, master_password : str) -> str:
+    """ Checks a master password against a verifier record, or a legacy verifier (a hex string), and derives the
+    key the user's images are encrypted with
+
+    Args:
+        verifier (dict | str): The verifier from the user store
+        master_password (str): The password to check
+
+    Returns:
+        str: The image key as a hex string, sha256(master) for legacy and version 1 verifiers. None if the password
+        is wrong (or the verifier is not understood)
+    """
+    if isinstance(verifier, str):
+        if not hmac.compare_digest(verifier, sha256_hash(master_password + LEGACY_PEPPER)):
+            return None
+        return sha256_hash(master_password)
+
+    if not isinstance(verifier, dict) or verifier.get('kdf') != KDF_NAME or verifier.get('version') not in (1, KDF_VERSION):
+        return None
+
+    try:
+        dklen = VERIFIER_SIZE if verifier['version'] == 1 else VERIFIER_SIZE + KEY_SIZE
+        derived = scrypt(master_password, bytes.fromhex(verifier['salt']), verifier['log_n'], verifier['r'], verifier['p'],
+                         dklen=dklen)
+        if not hmac.compare_digest(derived[:VERIFIER_SIZE], bytes.fromhex(verifier['hash'])):
+            return None
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    if verifier['version'] == 1:
+        return sha256_hash(master_password)
+    return derived[VERIFIER_SIZE:].hex()
+
+def check_verifier(verifier, master_password : str) -> bool:
+    """ Checks a master password against a verifier record, or a legacy verifier (see unlock)
+
+    Returns:
+        bool: True if the password is correct, False otherwise (or if the verifier is not understood)
+    """
+    return unlock(verifier, master_password) is not None
+
+def needs_upgrade(verifier) -> bool:
+    """ Whether a user should be moved to a new verifier (and key, see rekey_user) the next time its password is
+    known: a legacy verifier, an older version, or a cost below the minimum
+    """
+    if not isinstance(verifier, dict):
+        return True
+    return verifier.get('version') != KDF_VERSION or verifier.get('log_n', 0) < SCRYPT_MIN_LOG_N
+
+def derive_user_hash(master_password : str, verifier) -> str:
+    """ Derives the key the password images of a user are encrypted with (see unlock)
+
+    Raises:
+        ValueError: If the password does not match the verifier
+    """
+    user_hash = unlock(verifier, master_password)
+    if user_hash is None:
+        raise ValueError("Incorrect master password.")
+    return user_hash
@@ -0,0 +1,278 @@
+"""
+StegPass - Password Manager Application
+key_agent.py - Local agent process that keeps unlocked users' keys in memory and serves them over a Unix socket
+"""
+
+# ? Standard Imports
+import os
+import json
+import socket
+import struct
+import getpass
+import tempfile
+import threading
+import socketserver
+
+# ? Project Imports
+from app.utils.utils import is_valid_sha256_hash, convert_to_lowercase
+from app.utils.session_cache import SessionCache
+
+# Used if SP_AGENT_TTL is not set (see setup_config)
+DEFAULT_AGENT_TTL = 3600
+
+# Seconds a client waits for the agent before falling back to logging in
+AGENT_CLIENT_TIMEOUT = 5.0
+
+#*************************************************************************
+#
+#  Protocol: one JSON object per line in each direction. Every request
+#  has an 'op', every response has 'ok' (and 'error' if it is False).
+#
+#  ping                       -> {}
+#  unlock  user master [ttl]  -> {}               (the agent derives the key)
+#  add     user hash [ttl]    -> {}
+#  get     user               -> {hash}
+#  extract user path          -> {exit_code, output}  (decrypts in the agent)
+#  lock    [user]             -> {}               (every user if none is given)
+#  list                       -> {users: {user: seconds left}}
+#  stop                       -> {}
+#
+#*************************************************************************
+
+def agent_supported() -> bool:
+    """ Whether this platform has Unix domain sockets
+    """
+    return hasattr(socket, 'AF_UNIX')
+
+def agent_socket_path() -> str:
+    """ Gets the path of the agent socket, SP_AGENT_SOCKET if set, otherwise a private folder in the temp directory
+    """
+    path = os.environ.get('SP_AGENT_SOCKET')
+    if path:
+        return path
+
+    user_id = os.getuid() if hasattr(os, 'getuid') else getpass.getuser()
+    return os.path.join(tempfile.gettempdir(), f'stegpass-{user_id}', 'agent.sock')
+
+class AgentRequestHandler(socketserver.StreamRequestHandler):
+    """ Serves the requests of one client connection
+    """
+    def handle(self):
+        if not self.server.agent.check_peer(self.request):
+            return
+
+        for line in self.rfile:
+            request = {}
+            try:
+                request = json.loads(line)
+                response = self.server.agent.handle_request(request)
+            except (ValueError, TypeError, KeyError, AttributeError) as e:
+                response = {'ok': False, 'error': f"Bad request: {e}"}
+
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+            if request.get('op') == 'stop' and response['ok']:
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+class KeyAgent:
+    """ Holds the keys of unlocked users in memory (a SessionCache of this process, so they expire and are
+    zeroized the same way) and hands them to other StegPass processes of the same OS user over a Unix socket.
+    """
+    def __init__(self, socket_path : str = None, ttl : float = None):
+        """
+        Args:
+            socket_path (str): Where to listen, see agent_socket_path by default
+            ttl (float): Seconds a key is kept after it is unlocked, SP_AGENT_TTL by default
+        """
+        self.socket_path = socket_path or agent_socket_path()
+        self.ttl = float(ttl if ttl is not None else os.environ.get('SP_AGENT_TTL', DEFAULT_AGENT_TTL))
+        self.cache = SessionCache()
+        self.server = None
+
+    def serve_forever(self):
+        """ Listens on the socket until a stop request is received
+
+        Raises:
+            OSError: If the socket can't be created, or another agent is already listening on it
+        """
+        if not agent_supported():
+            raise OSError("The key agent needs Unix domain sockets, which this platform does not have.")
+
+        folder = os.path.dirname(self.socket_path)
+        os.makedirs(folder, mode=0o700, exist_ok=True)
+
+        # a socket left behind by an agent that crashed is replaced, a live one is not
+        if os.path.exists(self.socket_path):
+            if AgentClient(self.socket_path).request('ping') is not None:
+                raise OSError(f"An agent is already running: {self.socket_path}")
+            os.remove(self.socket_path)
+
+        old_umask = os.umask(0o177) # the socket is only accessible to this user
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, AgentRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+        self.server.daemon_threads = True
+        self.server.agent = self
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.cache.clear()
+            try:
+                os.remove(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    def check_peer(self, connection : socket.socket) -> bool:
+        """ Only serves processes of the same OS user (where the platform can tell, otherwise the socket
+        permissions are relied on)
+        """
+        if not hasattr(socket, 'SO_PEERCRED'):
+            return True
+
+        _, uid, _ = struct.unpack('3i', connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i')))
+        return uid == os.getuid()
+
+    def handle_request(self, request : dict) -> dict:
+        """ Runs a single request (see the protocol above)
+
+        Args:
+            request (dict): The decoded request
+
+        Returns:
+            dict: The response
+        """
+        op = request['op']
+        username = convert_to_lowercase(request['user']) if 'user' in request else None
+        ttl = float(request.get('ttl', self.ttl))
+
+        if op == 'ping':
+            return {'ok': True}
+
+        if op == 'unlock':
+            # imported here, the agent only needs the user store for this request. It is read again every
+            # time, the master password may have been changed by another process since the last unlock
+            from app.utils.user_manager import UserManager
+            user_manager = UserManager()
+            user_manager.reload()
+            user_hash = user_manager.unlock(username, request['master'])
+            if user_hash is None:
+                return {'ok': False, 'error': "Incorrect username or master password."}
+            self.cache.put(username, user_hash, ttl)
+            return {'ok': True}
+
+        if op == 'add':
+            if not is_valid_sha256_hash(request['hash']):
+                return {'ok': False, 'error': "Not a valid SHA-256 hash."}
+            self.cache.put(username, request['hash'], ttl)
+            return {'ok': True}
+
+        if op == 'get':
+            user_hash = self.cache.get(username)
+            if user_hash is None:
+                return {'ok': False, 'error': "User is locked."}
+            return {'ok': True, 'hash': user_hash}
+
+        if op == 'extract':
+            user_hash = self.cache.get(username)
+            if user_hash is None:
+                return {'ok': False, 'error': "User is locked."}
+
+            from app.get_password import resolve_image_path, extract_password
+            exit_code, output = resolve_image_path(request['path'])
+            if exit_code == 0:
+                exit_code, output = extract_password(output, user_hash)
+            return {'ok': True, 'exit_code': exit_code, 'output': output}
+
+        if op == 'lock':
+            if username is None:
+                self.cache.clear()
+            else:
+                self.cache.evict(username)
+            return {'ok': True}
+
+        if op == 'list':
+            return {'ok': True, 'users': self.cache.users()}
+
+        if op == 'stop':
+            return {'ok': True}
+
+        return {'ok': False, 'error': f"Unknown operation: {op}"}
+
+class AgentClient:
+    """ Talks to a running key agent. Every method returns None if no agent is running (or it can't be
+    reached), so callers fall back to logging in.
+    """
+    def __init__(self, socket_path : str = None, timeout : float = AGENT_CLIENT_TIMEOUT):
+        self.socket_path = socket_path or agent_socket_path()
+        self.timeout = timeout
+
+    def request(self, op : str, **fields) -> dict:
+        """ Sends one request on a new connection
+
+        Args:
+            op (str): The operation (see the protocol above)
+            fields: The other fields of the request
+
+        Returns:
+            dict: The response, or None if the agent could not be reached
+        """
+        if not agent_supported() or not os.path.exists(self.socket_path):
+            return None
+
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.settimeout(self.timeout)
+                connection.connect(self.socket_path)
+                connection.sendall(json.dumps({'op': op, **fields}).encode('utf-8') + b'\n')
+                with connection.makefile('rb') as reader:
+                    line = reader.readline()
+            return json.loads(line) if line else None
+        except (OSError, ValueError):
+            return None
+
+    def get_hash(self, username : str) -> str:
+        """ Gets the key of an unlocked user, None if the user is locked or there is no agent
+        """
+        response = self.request('get', user=username)
+        if response is None or not response['ok']:
+            return None
+        return response['hash']
+
+    def add(self, username : str, user_hash : str, ttl : float = None) -> bool:
+        """ Hands the key of a user that just logged in to the agent
+        """
+        fields = {'user': username, 'hash': user_hash}
+        if ttl is not None:
+            fields['ttl'] = ttl
+        response = self.request('add', **fields)
+        return response is not None and response['ok']
+
+    def unlock(self, username : str, master_password : str, ttl : float = None) -> dict:
+        """ Unlocks a user with the master password (the agent derives and keeps the key)
+        """
+        fields = {'user': username, 'master': master_password}
+        if ttl is not None:
+            fields['ttl'] = ttl
+        return self.request('unlock', **fields)
+
+    def extract(self, username : str, image_path : str) -> tuple[int, str]:
+        """ Has the agent retrieve a password with the key it holds, the key never leaves the agent
+
+        Returns:
+            tuple[int, str]: The exit code (see get_password) and the password or an error message, or None
+            if the user is locked or there is no agent
+        """
+        response = self.request('extract', user=username, path=os.path.abspath(image_path))
+        if response is None or not response['ok']:
+            return None
+        return response['exit_code'], response['output']
+
+    def lock(self, username : str = None) -> dict:
+        """ Forgets the key of a user, or of every user
+        """
+        return self.request('lock', user=username) if username is not None else self.request('lock')
@@ -5,12 +5,17 @@ import configparser
 from shlex import quote
 
 # Project Imports
-from app.utils.utils import fork_to_login, copy_file, show_error_message, run_subprocess
+from app.utils.utils import replace_file, show_error_message
 from app.utils.utility_fetcher import TargetType, UtilityFetcher
 from app.utils.user_manager import UserManager
+from app.utils.config import SP_BACKEND_TYPE
+from app.utils.utility_client import UtilityClient
+from app.utils.tracing import traced
+from app.utils.rekey import RekeyInProgressError, store_guard
 
 class PasswordCreator:
     
+    @traced('PasswordCreator.store_password')
     def store_password(self, username, new_password, src, dest) -> bool:
         """ Stores a password in an image file
         
@@ -23,52 +28,133 @@ class PasswordCreator:
         Returns:
             bool: True if the password was stored successfully, false otherwise
         """
-        user_hash = UserManager().get_user_pass_hash(username)
-        if user_hash is None:
+        try:
+            with store_guard(username):
+                user_hash = UserManager().get_user_pass_hash(username)
+                if user_hash is None:
+                    return False
+                
+                exit_code, output = self.store_password_with_hash(new_password, src, dest, user_hash)
+        except RekeyInProgressError as e:
+            exit_code, output = 9, f"Could not store password: {e}"
+        
+        if exit_code != 0:
+            show_error_message(output)
             return False
         
+        return True
+    
+    def store_password_headless(self, username, new_password, src, dest) -> tuple[int, str]:
+        """ Stores a password without any window: the user's key must be in the session cache or the key agent
+        
+        Args:
+            username (str): The username of the user
+            new_password (str): The password to store
+            src (str): The path to the source image file
+            dest (str): The path to the destination image file, or the folder to store it in
+        
+        Returns:
+            tuple[int, str]: The exit code (see store_password_with_hash, 8 if the user is not unlocked and 9 if
+            a master password change is in progress) and the path of the stored image, or an error message.
+        """
+        try:
+            with store_guard(username):
+                user_hash = UserManager().get_user_pass_hash(username, interactive=False)
+                if user_hash is None:
+                    return 8, "Could not store password: The user is not unlocked in the key agent."
+                
+                return self.store_password_with_hash(new_password, src, dest, user_hash)
+        except RekeyInProgressError as e:
+            return 9, f"Could not store password: {e}"
+    
+    def store_password_with_hash(self, new_password, src, dest, user_hash) -> tuple[int, str]:
+        """ Stores a password in an image file with an already resolved user hash
+        
+        Args:
+            new_password (str): The password to store
+            src (str): The path to the source image file
+            dest (str): The path to the destination image file, or the folder to store it in
+            user_hash (str): The hash used as the encryption key
+        
+        Returns:
+            tuple[int, str]: The exit code and the path of the stored image, or an error message.
+            
+            EXIT CODES:
+            -1: Unknown/Unexpected utility error
+            0:  Success
+            3:  The source image does not exist
+            5:  Unsupported target type
+            6:  The password does not fit in the image, and the image can't grow to hold it
+            7:  Could not find the utility or codec
+        """
+        if not os.path.isfile(src):
+            return 3, f"Encountered an error while copying the file: The file '{src}' does not exist."
+        
         # Step 1: Get the target type and check if it is supported
         file_type = TargetType.GetTargetType(src)
         if file_type == TargetType.NOT_FOUND:
-            show_error_message('Encountered an error while copying the file: File type not supported.')
-            return False
+            return 5, 'Encountered an error while copying the file: File type not supported.'
+        
+        # the backends would report success, but the password could not be read back
+        from app.utils.capacity import check_store # loads the codec (and NumPy), only needed when storing
+        try:
+            error = check_store(src, new_password)
+        except (OSError, ValueError) as e:
+            return -1, f"An error occurred while reading the image: {e}"
+        if error:
+            return 6, f"Encountered an error while storing the password: {error}"
             
         if os.path.isdir(dest):
-            image_name = os.path.basename(src)
-            dest = os.path.join(dest, image_name)
-        else:
-            image_name = os.path.basename(dest)
+            dest = os.path.join(dest, os.path.basename(src))
             
+        # The in-process codec copies the image and hides the password in a single pass
+        if UtilityFetcher.fetch_backend() == SP_BACKEND_TYPE.PYTHON:
+            return self._store_password_in_process(file_type, new_password, src, dest, user_hash)
+        
+        path_to_utility = UtilityFetcher.fetch_path(file_type)
+        if not path_to_utility:
+            return 7, 'Encountered an error while storing the password: Utility not found.'
+        
         # Step 2: Copy original image to destination
         if not os.path.exists(dest) or not os.path.samefile(src, dest):
-            copy_file(src, os.path.dirname(dest))
+            try:
+                replace_file(src, dest)
+            except OSError as e:
+                return -1, f"An error occurred while copying the file: {e}"
 
         # Step 3: Call backend utility to store the password in the image
-        path_to_utility = UtilityFetcher.fetch_path(file_type)
-        if not path_to_utility:
-            show_error_message('Encountered an error while storing the password: Utility not found.')
-            return False
-        
-        # ensure that the password is properly quoted to escape special characters
-        new_password = new_password.replace('"', '\\"')
-    
+        # the client escapes the password itself if it has to fall back to the command line
         try:
-            command = [path_to_utility, '-s', dest, new_password, '-h', user_hash]
-            stdout, exit_code = run_subprocess(command)
+            stdout, exit_code = UtilityClient().hide(path_to_utility, dest, new_password, user_hash)
         except Exception as e:
-            show_error_message(f"An error occurred while storing the password: {e}")
-            return False
+            return -1, f"An error occurred while storing the password: {e}"
         
         if exit_code != 0:
-            print(command)
-            show_error_message(f"A utility error occurred while storing the password:\noutput:{stdout}\nExit Code:{exit_code}")
-            return False
+            return -1, f"A utility error occurred while storing the password:\noutput:{stdout}\nExit Code:{exit_code}"
         
-        return True
+        return 0, dest
+    
+    def _store_password_in_process(self, file_type, new_password, src, dest, user_hash) -> tuple[int, str]:
+        """ Stores a password in a copy of an image file using the in-process codec instead of the backend utility.
+        The source is streamed to the destination once with the password spliced in (see run_hide_copy).
         
-            
-            
-            
+        Args:
+            file_type (int): The target type of the image file
+            new_password (str): The password to store (unescaped)
+            src (str): The path to the source image file
+            dest (str): The path to the destination image file
+            user_hash (str): The hash used as the encryption key
+        
+        Returns:
+            tuple[int, str]: The exit code (see store_password_with_hash) and the path of the stored image, or an
+            error message.
+        """
+        target_format = TargetType.Get(file_type)
+        if target_format is None or target_format.codec is None:
+            return 7, 'Encountered an error while storing the password: Codec not found.'
         
+        stdout, exit_code = target_format.hide(src, dest, new_password, user_hash)
+        if exit_code != 0:
+            return -1, f"A codec error occurred while storing the password:\noutput:{stdout}\nExit Code:{exit_code}"
         
-        
\ No newline at end of file
+        return 0, dest
@@ -0,0 +1,222 @@
+"""
+StegPass - Password Manager Application
+rekey.py - Changes a user's master password, re-encrypting every password image with the new key
+"""
+
+# ? Standard Imports
+import os
+import json
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# ? Project Imports
+from app.utils.utils import convert_to_lowercase
+from app.utils.utility_fetcher import TargetType
+from app.utils.user_manager import UserManager
+from app.utils.kdf import make_verifier, check_verifier, derive_user_hash
+from app.utils.session_cache import SessionCache
+from app.core.fileio import file_lock
+
+# Name of the journal, kept in the user's password folder while a change is in progress
+REKEY_JOURNAL_NAME = '.stegpass_rekey.journal'
+
+# Outcome of each image
+REKEY_DONE    = 'rekeyed' # encrypted with the new key
+REKEY_SKIPPED = 'skipped' # not encrypted with the user's old key, left untouched
+REKEY_FAILED  = 'failed'  # could not be re-encrypted, still uses the old key
+
+class RekeyInProgressError(Exception):
+    """ A password can't be stored while the user's master password is being changed (see store_guard)
+    """
+
+def rekey_image(image_path : str, old_user_hash : str, new_user_hash : str) -> tuple[str, str]:
+    """ Re-encrypts a single image (runs in a worker process)
+
+    Args:
+        image_path (str): The path to the image
+        old_user_hash (str): The current encryption key
+        new_user_hash (str): The new encryption key
+
+    Returns:
+        tuple[str, str]: The outcome (REKEY_DONE, REKEY_SKIPPED or REKEY_FAILED) and an error message
+    """
+    target_format = TargetType.Get(TargetType.GetTargetType(image_path))
+    if target_format is None or target_format.codec is None:
+        return REKEY_SKIPPED, "Unsupported target type"
+
+    output, exit_code = target_format.rekey(image_path, old_user_hash, new_user_hash)
+    if exit_code == 0:
+        return REKEY_DONE, ""
+
+    if exit_code == 4:
+        # rewritten by an interrupted run after its journal entry was lost
+        if target_format.extract(image_path, new_user_hash)[1] == 0 or target_format.extract_record(image_path, None, new_user_hash)[1] == 0:
+            return REKEY_DONE, ""
+        # a container with some records the old key can't decrypt is not rewritten, those records would be lost
+        if target_format.extract_record(image_path, None, old_user_hash)[1] == 0:
+            return REKEY_FAILED, "Some records could not be decrypted with the old master password"
+        return REKEY_SKIPPED, "Not encrypted with the old master password"
+
+    return REKEY_FAILED, output
+
+def rekey_user(username : str, old_master_password : str, new_master_password : str, progress = None, max_workers : int = None) -> dict:
+    """ Changes a user's master password. Every image in the user's password folder is re-encrypted with the new
+    key on a process pool, each one replaced atomically. The master password only changes once every image
+    has been re-encrypted.
+
+    A journal records each finished image, so after a crash (or failures) calling this again with the same
+    passwords resumes where it stopped. Until then, images already re-encrypted need the new password, and
+    storing passwords for the user is refused (see store_guard). Images that appear in the folder anyway are
+    picked up by a last scan, under the lock, just before the password is switched.
+
+    Called with the same old and new password, it moves a user with a legacy (or outdated) verifier to a new
+    one, and its images to the key of that verifier (see UserManager.unlock).
+
+    Args:
+        username (str): The username of the user
+        old_master_password (str): The current master password
+        new_master_password (str): The new master password
+        progress (func): Called as progress(done, total, image_path, outcome) after each image, on the calling thread
+        max_workers (int): Worker processes to use
+
+    Returns:
+        dict: 'complete' (bool) if the master password was changed, the number of images 'rekeyed' and 'skipped',
+        and the 'failed' images as (image_path, error) pairs
+
+    Raises:
+        ValueError: If the old password is wrong, or a change to a different password is in progress
+    """
+    username = convert_to_lowercase(username)
+    user_manager = UserManager()
+    folder = user_manager.get_password_folder_path(username)
+    journal_path = os.path.join(folder, REKEY_JOURNAL_NAME)
+
+    # once the journal exists stores are refused, the ones already running finish before it is created
+    with file_lock(journal_path):
+        header, finished, journal_size = read_journal(journal_path)
+
+        if header is not None and not (check_verifier(header['old_verifier'], old_master_password) and
+                                       check_verifier(header['new_verifier'], new_master_password)):
+            raise ValueError("A change to a different master password is already in progress.")
+
+        # a previous run may have crashed after switching the master password, but before removing the journal
+        current_verifier = user_manager.user_store.get(username)
+        if not check_verifier(current_verifier, old_master_password) and \
+           not (header is not None and check_verifier(current_verifier, new_master_password)):
+            raise ValueError("Incorrect master password.")
+
+        journal = open(journal_path, 'a')
+        journal.truncate(journal_size) # drop a torn last line
+        if header is None:
+            # the images are encrypted with the key of the current verifier, and will be with the key of the new one
+            header = {'username': username, 'old_verifier': current_verifier, 'new_verifier': make_verifier(new_master_password)}
+            write_journal_line(journal, header)
+
+    old_user_hash = derive_user_hash(old_master_password, header['old_verifier'])
+    new_user_hash = derive_user_hash(new_master_password, header['new_verifier'])
+    index = user_manager.get_vault_index(username)
+
+    result = {'complete': False, 'rekeyed': sum(1 for outcome in finished.values() if outcome == REKEY_DONE),
+              'skipped': sum(1 for outcome in finished.values() if outcome == REKEY_SKIPPED), 'failed': []}
+    counts = {'done': len(finished), 'total': len(finished)}
+
+    def record(image_path, outcome, error):
+        if outcome == REKEY_FAILED:
+            result['failed'].append((image_path, error))
+        else:
+            result[outcome] += 1
+            finished[os.path.relpath(image_path, folder)] = outcome
+            write_journal_line(journal, {'file': os.path.relpath(image_path, folder), 'outcome': outcome})
+
+        counts['done'] += 1
+        if progress is not None:
+            progress(counts['done'], counts['total'], image_path, outcome)
+
+    def pending():
+        index.refresh()
+        image_paths = [path for path in index.list_images(valid_only=True) if os.path.relpath(path, folder) not in finished]
+        counts['total'] += len(image_paths)
+        return image_paths
+
+    with journal:
+        image_paths = pending()
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(rekey_image, path, old_user_hash, new_user_hash): path for path in image_paths}
+            for future in as_completed(futures):
+                try:
+                    outcome, error = future.result()
+                except Exception as e:
+                    outcome, error = REKEY_FAILED, str(e)
+                record(futures[future], outcome, error)
+
+        if result['failed']:
+            return result
+
+        with file_lock(journal_path):
+            # images copied into the folder while the pool ran (stores were refused)
+            for image_path in pending():
+                record(image_path, *rekey_image(image_path, old_user_hash, new_user_hash))
+            if result['failed']:
+                return result
+
+            user_manager.change_master_password(username, new_master_password, header['new_verifier'])
+            SessionCache().put(username, new_user_hash)
+            journal.close()
+            os.remove(journal_path)
+
+    index.refresh()
+    result['complete'] = True
+    return result
+
+@contextmanager
+def store_guard(username : str):
+    """ Held while storing a password for a user, so rekey_user can't miss the new image or switch the master
+    password under it. Many stores hold it at once, rekey_user waits for them (and they for it).
+
+    Args:
+        username (str): The username of the user
+
+    Raises:
+        RekeyInProgressError: If a master password change is in progress for the user, the image would be
+        stored with a key that is about to be replaced
+    """
+    journal_path = os.path.join(UserManager().get_password_folder_path(username), REKEY_JOURNAL_NAME)
+    with file_lock(journal_path, shared=True):
+        if os.path.exists(journal_path):
+            raise RekeyInProgressError("A master password change is in progress for this user. Finish it before storing passwords.")
+        yield
+
+def read_journal(journal_path : str) -> tuple[dict, dict, int]:
+    """ Reads the journal of an interrupted master password change
+
+    Args:
+        journal_path (str): The path to the journal
+
+    Returns:
+        tuple[dict, dict, int]: The journal header (None if there is no journal), the outcome of each finished
+        image by path relative to the password folder, and the size of the complete records in bytes
+    """
+    header, finished, size = None, {}, 0
+    try:
+        with open(journal_path, 'rb') as journal:
+            for line in journal:
+                # a torn line at the end was never acknowledged, that image is simply done again
+                if not line.endswith(b'\n'):
+                    break
+                record = json.loads(line)
+                if header is None:
+                    header = record
+                else:
+                    finished[record['file']] = record['outcome']
+                size += len(line)
+    except FileNotFoundError:
+        pass
+
+    return header, finished, size
+
+def write_journal_line(journal, record : dict):
+    """ Appends a record to the journal and flushes it to disk
+    """
+    journal.write(json.dumps(record) + '\n')
+    journal.flush()
+    os.fsync(journal.fileno())
@@ -0,0 +1,139 @@
+"""
+StegPass - Password Manager Application
+session_cache.py - In-process cache of logged in users' password hashes, with expiry and zeroization
+"""
+
+# ? Standard Imports
+import os
+import time
+import atexit
+import threading
+
+# ? Project Imports
+from app.utils.singleton import TSSingleton
+
+# Used if SP_SESSION_TTL is not set (see setup_config)
+DEFAULT_SESSION_TTL = 900
+
+class SessionEntry:
+    """ A cached password hash and when it expires
+    """
+    def __init__(self, user_hash : str, ttl : float):
+        self.secret = bytearray(user_hash.encode('ascii'))
+        self.expires_at = time.monotonic() + ttl
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def zeroize(self):
+        """ Overwrites the cached secret in place
+        """
+        for i in range(len(self.secret)):
+            self.secret[i] = 0
+
+class SessionCache(metaclass=TSSingleton):
+    """ Keeps the password hash of each logged in user in memory for SP_SESSION_TTL seconds, so that users
+    don't have to log in for every operation. The hashes are never written to the environment (and so are
+    not inherited by child processes), and are zeroized when they expire, are evicted, or at exit.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.ttl = float(os.environ.get('SP_SESSION_TTL', DEFAULT_SESSION_TTL))
+
+        # a single timer that zeroizes the entry that expires next
+        self.timer = None
+        atexit.register(self.clear)
+
+    def get(self, username : str) -> str:
+        """ Gets the cached password hash of a user
+
+        Args:
+            username (str): The username of the user
+
+        Returns:
+            str: The password hash, or None if the user is not logged in or the session expired
+        """
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is None:
+                return None
+
+            if entry.expired():
+                self._evict(username)
+                return None
+
+            return entry.secret.decode('ascii')
+
+    def put(self, username : str, user_hash : str, ttl : float = None):
+        """ Caches the password hash of a user that just logged in, replacing any existing session
+
+        Args:
+            username (str): The username of the user
+            user_hash (str): The password hash of the user
+            ttl (float): Seconds to keep it for, SP_SESSION_TTL by default
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        with self.lock:
+            self._evict(username)
+            self.entries[username] = SessionEntry(user_hash, ttl)
+            self._schedule()
+
+    def evict(self, username : str):
+        """ Ends the session of a user
+
+        Args:
+            username (str): The username of the user
+        """
+        with self.lock:
+            self._evict(username)
+            self._schedule()
+
+    def users(self) -> dict[str, float]:
+        """ Lists the users with a session
+
+        Returns:
+            dict[str, float]: The seconds left before each session expires, by username
+        """
+        now = time.monotonic()
+        with self.lock:
+            return {username: entry.expires_at - now for username, entry in self.entries.items() if not entry.expired()}
+
+    def clear(self):
+        """ Ends all sessions
+        """
+        with self.lock:
+            for username in list(self.entries):
+                self._evict(username)
+            self._schedule()
+
+    def _evict(self, username : str):
+        entry = self.entries.pop(username, None)
+        if entry is not None:
+            entry.zeroize()
+
+    def _expire(self):
+        """ Called by the timer, zeroizes every expired session
+        """
+        with self.lock:
+            for username in [username for username, entry in self.entries.items() if entry.expired()]:
+                self._evict(username)
+            self._schedule()
+
+    def _schedule(self):
+        """ (Re)starts the timer for the next session to expire (lock must be held)
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        if not self.entries:
+            return
+
+        delay = min(entry.expires_at for entry in self.entries.values()) - time.monotonic()
+        self.timer = threading.Timer(max(delay, 0), self._expire)
+        self.timer.daemon = True
+        self.timer.start()
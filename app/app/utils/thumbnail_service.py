@@ -0,0 +1,148 @@
+"""
+StegPass - Password Manager Application
+thumbnail_service.py - Decodes and scales image previews off the UI thread, with an LRU cache of the results
+"""
+
+# ? Standard Imports
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageTk
+
+# ? Project Imports
+from app.utils.singleton import TSSingleton
+from app.utils.tracing import span
+
+# Number of thumbnails kept in memory
+THUMBNAIL_CACHE_SIZE = 32
+
+# How often the UI thread checks for finished thumbnails (ms)
+THUMBNAIL_POLL_INTERVAL = 15
+
+# Resize in two steps: a fast integer reduce() down to within this factor of the target, then LANCZOS
+REDUCING_GAP = 3.0
+
+def fit_size(image_size : tuple[int, int], box : tuple[int, int], upscale : bool = True) -> tuple[int, int]:
+    """ Calculates the size of an image scaled to fit in a box, keeping its aspect ratio
+
+    Args:
+        image_size (tuple[int, int]): The width and height of the image
+        box (tuple[int, int]): The maximum width and height
+        upscale (bool): Whether images smaller than the box are enlarged
+
+    Returns:
+        tuple[int, int]: The scaled width and height (at least 1x1)
+    """
+    ratio = min(box[0] / image_size[0], box[1] / image_size[1])
+    if not upscale:
+        ratio = min(ratio, 1)
+    return max(1, int(image_size[0] * ratio)), max(1, int(image_size[1] * ratio))
+
+def scale_image(image : Image.Image, size : tuple[int, int]) -> Image.Image:
+    """ Scales an image, letting the decoder skip detail that would be thrown away where the format allows it
+
+    Args:
+        image (PIL.Image): The image to scale (not loaded yet, for reduced decoding to apply)
+        size (tuple[int, int]): The new width and height
+
+    Returns:
+        PIL.Image: The scaled image
+    """
+    if size == image.size:
+        return image.copy()
+
+    # only JPEG decoders can decode at a reduced scale, for other formats this does nothing
+    image.draft(image.mode, size)
+    return image.resize(size, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+class ThumbnailService(metaclass=TSSingleton):
+    """ Produces scaled previews of image files on a worker thread. Results are cached by path, modification
+    time, file size and requested box, so the same image is only decoded once while it is unchanged.
+    """
+    def __init__(self, max_workers : int = 2, cache_size : int = THUMBNAIL_CACHE_SIZE):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='thumbnail')
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+
+    def render(self, path : str, box : tuple[int, int], upscale : bool = True) -> Image.Image:
+        """ Gets the thumbnail of an image file, decoding it if it is not cached (blocks, see request)
+
+        Args:
+            path (str): The path to the image file
+            box (tuple[int, int]): The maximum width and height of the thumbnail
+            upscale (bool): Whether images smaller than the box are enlarged
+
+        Returns:
+            PIL.Image: The thumbnail
+
+        Raises:
+            OSError: If the image could not be read
+        """
+        key = self._key(path, box, upscale)
+        thumbnail = self._lookup(key)
+        if thumbnail is not None:
+            return thumbnail
+
+        with span('ThumbnailService.decode', file=os.path.basename(path)), Image.open(path) as image:
+            thumbnail = scale_image(image, fit_size(image.size, box, upscale))
+
+        with self.lock:
+            self.cache[key] = thumbnail
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return thumbnail
+
+    def request(self, widget, path : str, box : tuple[int, int], on_ready, on_error = None, upscale : bool = True):
+        """ Renders a thumbnail on a worker thread and hands it to the UI thread as a PhotoImage. Returns immediately.
+
+        Args:
+            widget (tk.Widget): Any widget of the UI (its after() is used to deliver the result)
+            path (str): The path to the image file
+            box (tuple[int, int]): The maximum width and height of the thumbnail
+            on_ready (func): Called on the UI thread with the ImageTk.PhotoImage
+            on_error (func): Called on the UI thread with the exception if the image could not be read
+            upscale (bool): Whether images smaller than the box are enlarged
+        """
+        # re-selecting an image that is already cached does not wait for a worker
+        try:
+            thumbnail = self._lookup(self._key(path, box, upscale))
+        except OSError:
+            thumbnail = None
+        if thumbnail is not None:
+            on_ready(ImageTk.PhotoImage(thumbnail))
+            return
+
+        future = self.executor.submit(self.render, path, box, upscale)
+
+        # Tk is not thread-safe, so the UI thread polls for the result instead of being called back
+        def deliver():
+            if not future.done():
+                widget.after(THUMBNAIL_POLL_INTERVAL, deliver)
+                return
+
+            try:
+                thumbnail = future.result()
+            except Exception as e:
+                if on_error is not None:
+                    on_error(e)
+                return
+
+            on_ready(ImageTk.PhotoImage(thumbnail))
+
+        deliver()
+
+    def _key(self, path : str, box : tuple[int, int], upscale : bool) -> tuple:
+        """ The cache key of a thumbnail, a modified file gets a new key
+        """
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, tuple(box), upscale)
+
+    def _lookup(self, key : tuple) -> Image.Image:
+        with self.lock:
+            if key not in self.cache:
+                return None
+            self.cache.move_to_end(key)
+            return self.cache[key]
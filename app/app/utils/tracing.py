@@ -0,0 +1,172 @@
+"""
+StegPass - Password Manager Application
+tracing.py - Timing spans for the hot paths (login, store, retrieval), exported when SP_TRACE is set
+"""
+
+# ? Standard Imports
+import os
+import json
+import time
+import threading
+import functools
+
+#*************************************************************************
+#
+#  SP_TRACE=<path> turns tracing on for the process (and every process it
+#  starts). It must be set before the app starts, when it is not set span()
+#  returns a shared no-op and traced() returns the function unchanged.
+#
+#  <path>.json  Chrome trace event array (chrome://tracing, Perfetto). The
+#               closing bracket is left out, which both viewers accept, so
+#               each event is appended as it ends, by any process.
+#  otherwise    One JSON object per span per line.
+#
+#*************************************************************************
+
+class _NoSpan:
+    """ Returned by span() when tracing is off
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+_NO_SPAN = _NoSpan()
+
+class Tracer:
+    """ Appends finished spans to the trace file, a single write each so processes can share the file
+    """
+    def __init__(self, path : str):
+        self.path = path
+        self.chrome = path.endswith('.json')
+        self.local = threading.local()
+
+        # the first process to create the file opens the event array
+        if self.chrome:
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                os.write(fd, b'[\n')
+                os.close(fd)
+            except FileExistsError:
+                pass
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+
+    def stack(self) -> list:
+        """ The names of the open spans of this thread
+        """
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def emit(self, name : str, start_ns : int, duration_ns : int, args : dict, parent : str = None):
+        """ Writes one finished span
+
+        Args:
+            name (str): The name of the span
+            start_ns (int): When it started (time.time_ns, so processes share a clock)
+            duration_ns (int): How long it took
+            args (dict): Values recorded with the span
+            parent (str): The name of the span it is nested in
+        """
+        pid, tid = os.getpid(), threading.get_ident()
+        if self.chrome:
+            event = {'name': name, 'cat': 'stegpass', 'ph': 'X', 'ts': start_ns / 1000, 'dur': duration_ns / 1000,
+                     'pid': pid, 'tid': tid, 'args': args}
+            line = json.dumps(event, default=str) + ',\n'
+        else:
+            event = {'name': name, 'start': start_ns / 1e9, 'ms': duration_ns / 1e6, 'pid': pid, 'tid': tid,
+                     'parent': parent, **args}
+            line = json.dumps(event, default=str) + '\n'
+
+        try:
+            os.write(self.fd, line.encode('utf-8'))
+        except OSError:
+            pass
+
+class Span:
+    """ A timed region, see span()
+    """
+    def __init__(self, tracer : Tracer, name : str, args : dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = self.tracer.stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.start_ns = time.time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ns = time.perf_counter_ns() - self.start
+        self.tracer.stack().pop()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.emit(self.name, self.start_ns, duration_ns, self.args, self.parent)
+        return False
+
+    def set(self, **args):
+        """ Records values learned inside the span (e.g. an exit code)
+        """
+        self.args.update(args)
+
+_tracer = Tracer(os.environ['SP_TRACE']) if os.environ.get('SP_TRACE') else None
+
+def enabled() -> bool:
+    return _tracer is not None
+
+def span(name : str, **args):
+    """ Times the code in a with block
+
+    Args:
+        name (str): The name of the span
+        args: Values to record with it
+
+    Returns:
+        The span, or a shared no-op if tracing is off
+    """
+    if _tracer is None:
+        return _NO_SPAN
+    return Span(_tracer, name, args)
+
+def traced(name : str = None):
+    """ Decorator that times every call of a function in a span (named after the function by default).
+    The function is returned unchanged if tracing is off.
+    """
+    def decorator(func):
+        if _tracer is None:
+            return func
+
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(_tracer, span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def start_time() -> tuple[int, int]:
+    """ Marks the start of a span that ends on another thread or in a callback, see record
+    """
+    if _tracer is None:
+        return None
+    return time.time_ns(), time.perf_counter_ns()
+
+def record(name : str, start : tuple[int, int], **args):
+    """ Ends a span started with start_time
+
+    Args:
+        name (str): The name of the span
+        start (tuple[int, int]): What start_time returned
+        args: Values to record with it
+    """
+    if _tracer is None or start is None:
+        return
+    _tracer.emit(name, start[0], time.perf_counter_ns() - start[1], args)
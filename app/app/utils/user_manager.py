@@ -1,16 +1,18 @@
 
 # ? Standard Imports
 import os
-import json
 
 # ? Project Imports
-from app.utils.utils import sha256_hash, convert_to_lowercase, fork_to_login
-from app.utils.config import SP_BUILD_TYPE
+from app.utils.utils import convert_to_lowercase
+from app.utils.kdf import make_verifier, check_verifier, needs_upgrade, unlock
+from app.utils.config import SP_BUILD_TYPE, SP_USER_STORE_TYPE
 from app.utils.singleton import Singleton
+from app.utils.session_cache import SessionCache
+from app.utils.key_agent import AgentClient
+from app.utils.user_store import open_user_store
 
-USER_DATA_PATH = "data\\user_data.json"
+USER_DATA_FOLDER_PATH = "data"
 PASSWORD_FOLDER_PATH = "data\\passwords"
-UNIVERSAL_PEPPER = "chizom"
 
 @Singleton
 class UserManager:
@@ -30,30 +32,22 @@ class UserManager:
         if build == SP_BUILD_TYPE.RELEASE:
             root_dir = os.path.abspath(os.path.join(root_dir, '../..'))
             
-        self.path_to_user_data = os.path.join(root_dir, USER_DATA_PATH)
+        self.path_to_user_data = os.path.join(root_dir, USER_DATA_FOLDER_PATH)
         self.path_to_password_folder = os.path.join(root_dir, PASSWORD_FOLDER_PATH)
         
-        # check if user data file exists (create directory and file if it doesn't)
-        if not os.path.exists(self.path_to_user_data):
-            os.makedirs(os.path.dirname(self.path_to_user_data), exist_ok=True)
-            with open(self.path_to_user_data, 'w') as f:
-                json.dump({}, f)
-            self.user_data = {}
-        else:
-            with open(self.path_to_user_data, 'r') as f:
-                self.user_data = json.load(f)
+        # The store is only read when the user data is first needed
+        store_type = os.environ.get("SP_USER_STORE", SP_USER_STORE_TYPE.JSON)
+        if not SP_USER_STORE_TYPE.IsValid(store_type):
+            raise Exception(f"Invalid user store type: {store_type}")
+        self.user_store = open_user_store(store_type, self.path_to_user_data)
                 
         self.add_user_callbacks = {}
         self.add_users_callbacks_to_remove = []
         
         self.set_active_user_callbacks = {}
         self.active_user = None
-                
-    def save_user_data(self):
-        """ Saves the user data to the user data file
-        """
-        with open(self.path_to_user_data, 'w') as f:
-            json.dump(self.user_data, f)
+        
+        self.vault_indexes = {}
                 
     def check_user_exists(self, username) -> bool:
         """ Checks if a user exists in the user data
@@ -64,7 +58,7 @@ class UserManager:
         Returns:
             bool: True if the user exists, False otherwise
         """
-        return username in self.user_data
+        return self.user_store.contains(username)
     
     def add_user(self, username, master_password) -> bool:
         """ Adds a user to the user data
@@ -81,8 +75,7 @@ class UserManager:
         if self.check_user_exists(username):
             return False
         
-        self.user_data[username] = sha256_hash(master_password + UNIVERSAL_PEPPER)
-        self.save_user_data()
+        self.user_store.set(username, make_verifier(master_password))
         
         self.remove_listeners()        
         for callback in self.add_user_callbacks.values():
@@ -105,17 +98,57 @@ class UserManager:
         if not self.check_user_exists(username):
             return False
         
-        del self.user_data[username]
-        self.save_user_data()
+        if not self.user_store.delete(username):
+            return False
+        
+        self.forget_key(username)
         return True
     
+    def change_master_password(self, username, new_master_password, verifier = None) -> bool:
+        """ Replaces the master password of a user. The images must already be re-encrypted (see rekey_user).
+
+        Args:
+            username (str): The username of the user
+            new_master_password (str): The new master password
+            verifier (dict): The verifier of the new master password, the one the images were re-encrypted for.
+                A new one is made by default.
+
+        Returns:
+            bool: True if the master password was changed, False if the user does not exist
+        """
+        username = convert_to_lowercase(username)
+        
+        if not self.check_user_exists(username):
+            return False
+        
+        self.user_store.set(username, verifier if verifier is not None else make_verifier(new_master_password))
+        self.forget_key(username)
+        return True
+    
+    def forget_key(self, username):
+        """ Forgets the key of a user in this process and in the key agent, after the master password changed
+        or the user was deleted (the old key would otherwise still be handed out)
+
+        Args:
+            username (str): The username of the user
+        """
+        username = convert_to_lowercase(username)
+        SessionCache().evict(username)
+        AgentClient().lock(username)
+    
+    def reload(self):
+        """ Makes the next access read the user data again, for processes that outlive changes made by others
+        (see KeyAgent)
+        """
+        self.user_store.refresh()
+    
     def count_users(self) -> int:
         """ Returns the number of users in the user data
 
         Returns:
             int: The number of users in the user data
         """
-        return len(self.user_data)
+        return self.user_store.count()
     
     def get_users(self) -> list:
         """ Gets a list of all the users in the user data
@@ -123,7 +156,7 @@ class UserManager:
         Returns:
             list: A list of all the users in the user data
         """
-        return list(self.user_data.keys())
+        return self.user_store.keys()
     
     def check_password(self, username, master_password) -> bool:
         """ Checks if a password is correct for a given user
@@ -140,7 +173,42 @@ class UserManager:
         if not self.check_user_exists(username):
             return False
         
-        return self.user_data[username] == sha256_hash(master_password + UNIVERSAL_PEPPER)
+        return check_verifier(self.user_store.get(username), master_password)
+    
+    def unlock(self, username, master_password):
+        """ Checks the password of a user and derives the key of the user's images. A legacy (or outdated)
+        verifier is replaced once the password is known to be correct, re-encrypting the images with the key of
+        the new one (see rekey_user).
+
+        Args:
+            username (str): The username of the user
+            master_password (str): The password to check
+
+        Returns:
+            str: The key of the user's images, or None if the password is wrong
+        """
+        username = convert_to_lowercase(username)
+        
+        if not self.check_user_exists(username):
+            return None
+        
+        verifier = self.user_store.get(username)
+        user_hash = unlock(verifier, master_password)
+        if user_hash is None or not needs_upgrade(verifier):
+            return user_hash
+        
+        # imported here, rekeying loads the codecs which checking a password doesn't need
+        from app.utils.rekey import rekey_user
+        try:
+            result = rekey_user(username, master_password, master_password)
+        except ValueError:
+            # a change to another master password is in progress, it must be finished first
+            return user_hash
+        
+        if not result['complete']:
+            # some images could not be re-encrypted, the next login resumes the migration
+            return user_hash
+        return unlock(self.user_store.get(username), master_password)
     
     def get_password_folder_path(self, username):
         """ Gets the path to the folder containing the passwords for a user
@@ -159,6 +227,23 @@ class UserManager:
             
         return path_to_user_folder
     
+    def get_vault_index(self, username) -> 'VaultIndex':
+        """ Gets the index of the images in a user's password folder (call refresh() to bring it up to date)
+
+        Args:
+            username (str): The username of the user
+
+        Returns:
+            VaultIndex: The index of the user's password folder
+        """
+        # imported here, the index loads the codecs (and NumPy) which the password fast path doesn't need
+        from app.utils.vault_index import VaultIndex
+        
+        username = convert_to_lowercase(username)
+        if username not in self.vault_indexes:
+            self.vault_indexes[username] = VaultIndex(self.get_password_folder_path(username))
+        return self.vault_indexes[username]
+    
     def add_listener_on_add_user(self, id, callback):
         """ Adds a callback to be called when a user is added
 
@@ -211,23 +296,26 @@ class UserManager:
         """
         self.set_active_user_callbacks[id] = (listener)
         
-    def get_user_pass_hash(self, username):
-        """ Gets the real password hash for a user, either by the environment or after a forked login.
+    def get_user_pass_hash(self, username, interactive = True):
+        """ Gets the real password hash for a user, from the session cache, the key agent if one is running,
+        or after logging in.
 
         Args:
             username (str): The username of the user
+            interactive (bool): Open the login window if the user is not logged in
 
         Returns:
             str: The password hash for the user, or None if failed.
         """
-        user_env_name = username + '_HASH'
+        user_hash = SessionCache().get(convert_to_lowercase(username))
+        if user_hash is None:
+            user_hash = AgentClient().get_hash(convert_to_lowercase(username))
+            if user_hash is not None:
+                SessionCache().put(convert_to_lowercase(username), user_hash)
         
-        # Check if the user hash is in the environment variables, otherwise prompt the user to log in
-        if user_env_name not in os.environ:
-            user_hash = fork_to_login(username)
-            if user_hash is None:
-                return None
-            os.environ[user_env_name] = user_hash
+        if user_hash is None and interactive:
+            # imported here, the login window depends on the user manager (and loads Tk)
+            from app.login import login
+            user_hash = login(username)
 
-        return os.environ[user_env_name]
-        
+        return user_hash
@@ -0,0 +1,361 @@
+"""
+StegPass - Password Manager Application
+user_store.py - Storage backends for the user data (see UserManager)
+"""
+
+# ? Standard Imports
+import os
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+# ? Project Imports
+from app.utils.config import SP_USER_STORE_TYPE
+from app.utils.tracing import traced
+from app.core.fileio import atomic_replace, file_lock
+
+def atomic_write(path : str, data : bytes, fsync : bool = True):
+    """ Replaces a file with new contents, so that a crash leaves either the old or the new file
+
+    Args:
+        path (str): The path of the file to replace
+        data (bytes): The new contents of the file
+        fsync (bool): Flush the new file to disk before it replaces the old one
+    """
+    with atomic_replace(path, fsync) as f:
+        f.write(data)
+
+class UserStore(ABC):
+    """ A persistent mapping of usernames to JSON values. Stores load lazily, on first access, and are thread-safe.
+    """
+    def __init__(self, path : str, fsync : bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.lock = threading.RLock()
+
+    @abstractmethod
+    def get(self, username : str):
+        """ Gets the value of a user, or None if the user does not exist
+        """
+
+    def set(self, username : str, value):
+        """ Adds or replaces a user
+        """
+        self.set_many([(username, value)])
+
+    @abstractmethod
+    def set_many(self, items : list):
+        """ Adds or replaces many (username, value) pairs in a single write
+        """
+
+    @abstractmethod
+    def delete(self, username : str) -> bool:
+        """ Deletes a user, returns False if the user does not exist
+        """
+
+    def contains(self, username : str) -> bool:
+        return self.get(username) is not None
+
+    @abstractmethod
+    def keys(self) -> list:
+        """ Lists the usernames
+        """
+
+    def count(self) -> int:
+        return len(self.keys())
+
+    def refresh(self):
+        """ Drops what was loaded, so the next access reads the store again (changes made by other processes)
+        """
+        pass
+
+    def close(self):
+        pass
+
+class JsonUserStore(UserStore):
+    """ The whole mapping in a single JSON file (the original user_data.json format), rewritten atomically on every
+    change. Several processes can share the file: changes are made under its lock (see file_lock) to a fresh copy
+    read under that lock, and every access first re-reads the file if another process replaced it since.
+    """
+    def __init__(self, path : str, fsync : bool = True):
+        super().__init__(path, fsync)
+        self.data = None
+        self.identity = None # the file the data was read from (every write replaces it, see atomic_write)
+
+    def _load(self) -> dict:
+        try:
+            stat = os.stat(self.path)
+            identity = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            identity = None
+
+        if self.data is None or identity != self.identity:
+            try:
+                with open(self.path, 'r') as f:
+                    stat = os.fstat(f.fileno())
+                    self.data = json.load(f)
+                self.identity = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                self.data, self.identity = {}, None
+        return self.data
+
+    @traced()
+    def _save(self):
+        atomic_write(self.path, json.dumps(self.data).encode('utf-8'), self.fsync)
+        stat = os.stat(self.path)
+        self.identity = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def get(self, username : str):
+        with self.lock:
+            return self._load().get(username)
+
+    def set_many(self, items : list):
+        with self.lock, file_lock(self.path):
+            self.data = None # always start from the file, the identity could be reused
+            self._load().update(items)
+            self._save()
+
+    def delete(self, username : str) -> bool:
+        with self.lock, file_lock(self.path):
+            self.data = None
+            if username not in self._load():
+                return False
+            del self.data[username]
+            self._save()
+            return True
+
+    def keys(self) -> list:
+        with self.lock:
+            return list(self._load().keys())
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self._load())
+
+    def refresh(self):
+        with self.lock:
+            self.data = None
+            self.identity = None
+
+class LogUserStore(UserStore):
+    """ An append-only log of JSON lines, one per change, compacted (rewritten with only the live users) when it is
+    mostly made of stale records. Several processes can share the log: changes are made under its lock (see
+    file_lock), and every access first replays the records other processes appended since, or the whole log if
+    it was compacted.
+    """
+    # Compact once the log holds this many records more than there are users
+    COMPACT_MIN_STALE = 1024
+
+    def __init__(self, path : str, fsync : bool = True):
+        super().__init__(path, fsync)
+        self.data = None
+        self.records = 0
+
+        # the log file the data was replayed from, and how far
+        self.identity = None
+        self.offset = 0
+
+    def _load(self) -> dict:
+        """ Brings the data up to date with the log
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+
+        if stat is None:
+            if self.data is None or self.identity is not None:
+                self.data, self.records, self.identity, self.offset = {}, 0, None, 0
+            return self.data
+
+        if self.data is not None and (stat.st_dev, stat.st_ino) == self.identity and stat.st_size == self.offset:
+            return self.data
+
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            self.data, self.records, self.identity, self.offset = {}, 0, None, 0
+            return self.data
+
+        with f:
+            # the log may have been replaced since the stat above
+            stat = os.fstat(f.fileno())
+            identity = (stat.st_dev, stat.st_ino)
+            if self.data is None or identity != self.identity or stat.st_size < self.offset:
+                self.data, self.records, self.identity, self.offset = {}, 0, identity, 0
+
+            f.seek(self.offset)
+            for line in f:
+                # the last record may still be being written by another process (see _write)
+                if not line.endswith(b'\n'):
+                    break
+                self.offset += len(line)
+
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    continue # a corrupt record is skipped, the records after it are still valid
+
+        return self.data
+
+    def _apply(self, record : dict):
+        if 'delete' in record:
+            self.data.pop(record['delete'], None)
+        else:
+            self.data[record['set']] = record['value']
+        self.records += 1
+
+    @traced()
+    def _write(self, records : list):
+        """ Appends records to the log (the store and log must be locked)
+        """
+        self._load()
+        data = b''.join(json.dumps(record).encode('utf-8') + b'\n' for record in records)
+        with open(self.path, 'ab') as f:
+            # only a writer that died holding the lock leaves a torn record, it was never acknowledged
+            if f.tell() != self.offset:
+                f.truncate(self.offset)
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            stat = os.fstat(f.fileno())
+
+        self.identity = (stat.st_dev, stat.st_ino)
+        self.offset += len(data)
+        for record in records:
+            self._apply(record)
+
+        if self.records - len(self.data) >= max(self.COMPACT_MIN_STALE, len(self.data)):
+            self._compact()
+
+    @traced()
+    def compact(self):
+        """ Rewrites the log with a single record per user
+        """
+        with self.lock, file_lock(self.path):
+            self._load()
+            self._compact()
+
+    def _compact(self):
+        lines = ''.join(json.dumps({'set': username, 'value': value}) + '\n' for username, value in self.data.items())
+        atomic_write(self.path, lines.encode('utf-8'), self.fsync)
+
+        stat = os.stat(self.path)
+        self.identity = (stat.st_dev, stat.st_ino)
+        self.offset = stat.st_size
+        self.records = len(self.data)
+
+    def get(self, username : str):
+        with self.lock:
+            return self._load().get(username)
+
+    def set_many(self, items : list):
+        with self.lock, file_lock(self.path):
+            self._write([{'set': username, 'value': value} for username, value in items])
+
+    def delete(self, username : str) -> bool:
+        with self.lock, file_lock(self.path):
+            if username not in self._load():
+                return False
+            self._write([{'delete': username}])
+            return True
+
+    def keys(self) -> list:
+        with self.lock:
+            return list(self._load().keys())
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self._load())
+
+    def close(self):
+        with self.lock:
+            self.data = None
+            self.identity = None
+            self.offset = 0
+
+class SqliteUserStore(UserStore):
+    """ A SQLite database with one row per user, nothing is held in memory
+    """
+    def __init__(self, path : str, fsync : bool = True):
+        super().__init__(path, fsync)
+        self.connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'OFF'}")
+            self.connection.execute('CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        return self.connection
+
+    def get(self, username : str):
+        with self.lock:
+            row = self._connect().execute('SELECT value FROM users WHERE username = ?', (username,)).fetchone()
+            return None if row is None else json.loads(row[0])
+
+    @traced()
+    def set_many(self, items : list):
+        with self.lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('BEGIN')
+                connection.executemany('INSERT OR REPLACE INTO users (username, value) VALUES (?, ?)',
+                                       ((username, json.dumps(value)) for username, value in items))
+
+    @traced()
+    def delete(self, username : str) -> bool:
+        with self.lock:
+            return self._connect().execute('DELETE FROM users WHERE username = ?', (username,)).rowcount > 0
+
+    def contains(self, username : str) -> bool:
+        with self.lock:
+            return self._connect().execute('SELECT 1 FROM users WHERE username = ?', (username,)).fetchone() is not None
+
+    def keys(self) -> list:
+        with self.lock:
+            return [row[0] for row in self._connect().execute('SELECT username FROM users ORDER BY rowid')]
+
+    def count(self) -> int:
+        with self.lock:
+            return self._connect().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+# The store class and file name of each store type
+USER_STORES = {
+    SP_USER_STORE_TYPE.JSON: (JsonUserStore, 'user_data.json'),
+    SP_USER_STORE_TYPE.LOG: (LogUserStore, 'user_data.log'),
+    SP_USER_STORE_TYPE.SQLITE: (SqliteUserStore, 'user_data.db'),
+}
+
+def open_user_store(store_type : str, data_dir : str) -> UserStore:
+    """ Opens the user store of the given type, migrating the users from the JSON store the first time
+    another store type is used
+
+    Args:
+        store_type (str): The type of store (see SP_USER_STORE_TYPE)
+        data_dir (str): The directory holding the user data
+
+    Returns:
+        UserStore: The user store
+    """
+    store_class, file_name = USER_STORES[store_type]
+    path = os.path.join(data_dir, file_name)
+    os.makedirs(data_dir, exist_ok=True)
+
+    legacy_path = os.path.join(data_dir, USER_STORES[SP_USER_STORE_TYPE.JSON][1])
+    migrate = store_type != SP_USER_STORE_TYPE.JSON and not os.path.exists(path) and os.path.exists(legacy_path)
+
+    store = store_class(path)
+    if migrate:
+        legacy_store = JsonUserStore(legacy_path)
+        store.set_many([(username, legacy_store.get(username)) for username in legacy_store.keys()])
+
+    return store
@@ -0,0 +1,268 @@
+"""
+StegPass - Password Manager Application
+utility_client.py - Keeps backend utilities alive in --serve mode and reuses them across operations
+"""
+
+# ? Standard Imports
+import os
+import queue
+import atexit
+import subprocess
+import threading
+
+# ? Project Imports
+from app.utils.utils import run_subprocess
+from app.utils.singleton import TSSingleton
+from app.utils.tracing import span
+
+CREATE_NO_WINDOW = 0x08000000
+
+# Seconds a request may take before its worker is considered hung and replaced
+REQUEST_TIMEOUT = 30
+
+class ServeUnsupportedError(Exception):
+    """ The utility was started but does not answer in --serve mode (e.g. a build without it)
+    """
+
+class UtilityWorker:
+    """ A single backend utility process running in --serve mode
+    """
+    def __init__(self, path_to_utility : str, timeout : float = REQUEST_TIMEOUT):
+        creationflags = CREATE_NO_WINDOW if os.name == 'nt' else 0
+        self.process = subprocess.Popen([path_to_utility, '--serve'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, creationflags=creationflags)
+        self.timeout = timeout
+
+        # pipes can't be waited on with a timeout on Windows, the responses are read on a thread of their own
+        self.responses = queue.Queue()
+        self.reader = threading.Thread(target=self._read_responses, daemon=True)
+        self.reader.start()
+
+    def _read_responses(self):
+        """ Reads the framed responses of the worker until it exits, then queues None
+        """
+        try:
+            while True:
+                header = self.process.stdout.readline()
+                if not header:
+                    break
+
+                exit_code, length = (int(value) for value in header.split())
+                output = self.process.stdout.read(length)
+                if len(output) < length:
+                    break
+                self.responses.put((output.decode('utf-8', errors='replace'), exit_code))
+        except (OSError, ValueError):
+            pass
+        self.responses.put(None)
+
+    def request(self, fields : list[str]) -> tuple[str, int]:
+        """ Sends one request to the worker and waits for the framed response
+
+        Args:
+            fields (list[str]): The tab separated fields of the request (see Serve in bmp-steg/src/Main.cpp)
+
+        Returns:
+            tuple[str, int]: The output and exit code, as the utility would have produced them
+
+        Raises:
+            BrokenPipeError: If the worker is not running, does not answer within its timeout, or its response is
+            not framed (it does not support --serve)
+        """
+        try:
+            self.process.stdin.write(('\t'.join(fields) + '\n').encode('utf-8'))
+            self.process.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise BrokenPipeError(str(e))
+
+        try:
+            response = self.responses.get(timeout=self.timeout)
+        except queue.Empty:
+            raise BrokenPipeError(f"Utility worker did not answer within {self.timeout} seconds")
+
+        if response is None:
+            raise BrokenPipeError("Utility worker exited")
+        return response
+
+    def handshake(self):
+        """ Checks that the worker answers in --serve mode
+
+        Raises:
+            ServeUnsupportedError: If it does not answer a ping with a framed response
+        """
+        try:
+            self.request(['-p'])
+        except BrokenPipeError as e:
+            raise ServeUnsupportedError(str(e))
+
+    def close(self):
+        """ Asks the worker to exit and waits for it
+        """
+        try:
+            self.process.stdin.write(b'-q\n')
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+class UtilityClient(metaclass=TSSingleton):
+    """ Runs backend utility actions on a small pool of long-lived worker processes, instead of spawning a
+    new process for every store and retrieval. Falls back to run_subprocess for utilities that do not
+    support --serve.
+    """
+    POOL_SIZE = 2
+    REQUEST_TIMEOUT = REQUEST_TIMEOUT
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.idle_workers = {}      # path to utility -> list of idle workers
+        self.spawned_workers = {}   # path to utility -> number of live workers
+        self.unsupported = set()    # utilities that failed the --serve handshake
+        self.closed = False         # set by close, later requests run on the command line
+        atexit.register(self.close)
+
+    def hide(self, path_to_utility : str, image_path : str, message : str, user_hash : str) -> tuple[str, int]:
+        """ Equivalent of running `<utility> -s <image_path> <message> -h <user_hash>`
+
+        Args:
+            path_to_utility (str): The path to the backend utility
+            image_path (str): The path to the image file
+            message (str): The message to hide
+            user_hash (str): The hash used as the encryption key
+
+        Returns:
+            tuple[str, int]: The output and exit code of the utility
+        """
+        fields = ['-s', image_path.encode('utf-8').hex(), user_hash, message.encode('utf-8').hex()]
+
+        # the command line needs quotes escaped (see PasswordCreator)
+        command = [path_to_utility, '-s', image_path, message.replace('"', '\\"'), '-h', user_hash]
+        return self._request(path_to_utility, fields, command)
+
+    def extract(self, path_to_utility : str, image_path : str, user_hash : str) -> tuple[str, int]:
+        """ Equivalent of running `<utility> -g <image_path> -h <user_hash>`
+
+        Args:
+            path_to_utility (str): The path to the backend utility
+            image_path (str): The path to the image file
+            user_hash (str): The hash used as the encryption key
+
+        Returns:
+            tuple[str, int]: The output and exit code of the utility
+        """
+        fields = ['-g', image_path.encode('utf-8').hex(), user_hash]
+        command = [path_to_utility, '-g', image_path, '-h', user_hash]
+        return self._request(path_to_utility, fields, command)
+
+    def prestart(self, path_to_utility : str):
+        """ Starts a worker ahead of time so the first operation does not pay for the process spawn
+
+        Args:
+            path_to_utility (str): The path to the backend utility
+        """
+        try:
+            self._release(path_to_utility, self._acquire(path_to_utility))
+        except ServeUnsupportedError:
+            with self.condition:
+                self.unsupported.add(path_to_utility)
+        except OSError:
+            pass
+
+    def close(self):
+        """ Stops every idle worker process. Workers still in use are stopped when they are released.
+        """
+        with self.condition:
+            self.closed = True
+            workers = [worker for idle in self.idle_workers.values() for worker in idle]
+            self.idle_workers = {}
+            self.spawned_workers = {}
+            self.condition.notify_all()
+
+        for worker in workers:
+            worker.close()
+
+    def _request(self, path_to_utility : str, fields : list[str], command : list[str]) -> tuple[str, int]:
+        """ Runs a request on a worker, or spawns the utility for this command only if it cannot serve.
+        A worker that breaks mid-request (it crashed or was killed) is replaced and the request retried once.
+        Only a utility that fails the --serve handshake is never served again.
+        """
+        with span('UtilityClient.request', action=fields[0]) as timing:
+            for attempt in range(2):
+                with self.condition:
+                    if self.closed or path_to_utility in self.unsupported:
+                        break
+
+                try:
+                    worker = self._acquire(path_to_utility)
+                except ServeUnsupportedError:
+                    with self.condition:
+                        self.unsupported.add(path_to_utility)
+                    break
+                except OSError:
+                    # could not start the process this time, the command line may still work
+                    break
+
+                try:
+                    result = worker.request(fields)
+                except BrokenPipeError:
+                    self._release(path_to_utility, worker, broken=True)
+                    continue
+
+                self._release(path_to_utility, worker)
+                timing.set(served=True, retried=attempt > 0)
+                return result
+
+            timing.set(served=False)
+            return run_subprocess(command)
+
+    def _acquire(self, path_to_utility : str) -> UtilityWorker:
+        """ Takes an idle worker, spawns one if the pool is not full, or waits for one to be released
+
+        Raises:
+            OSError: If the utility could not be started, or the client was closed
+            ServeUnsupportedError: If a new worker fails the --serve handshake
+        """
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise OSError("The utility client is closed")
+
+                idle = self.idle_workers.setdefault(path_to_utility, [])
+                if idle:
+                    return idle.pop()
+
+                if self.spawned_workers.get(path_to_utility, 0) < self.POOL_SIZE:
+                    self.spawned_workers[path_to_utility] = self.spawned_workers.get(path_to_utility, 0) + 1
+                    break
+
+                self.condition.wait()
+
+        worker = None
+        try:
+            worker = UtilityWorker(path_to_utility, self.REQUEST_TIMEOUT)
+            worker.handshake()
+            return worker
+        except (OSError, ServeUnsupportedError):
+            if worker is not None:
+                worker.close()
+            with self.condition:
+                if not self.closed:
+                    self.spawned_workers[path_to_utility] -= 1
+                    self.condition.notify()
+            raise
+
+    def _release(self, path_to_utility : str, worker : UtilityWorker, broken : bool = False):
+        """ Returns a worker to the pool, or stops it if it is broken or the client was closed while it was in use
+        (the counters were reset by close)
+        """
+        with self.condition:
+            stop = broken or self.closed
+            if not self.closed:
+                if broken:
+                    self.spawned_workers[path_to_utility] -= 1
+                else:
+                    self.idle_workers.setdefault(path_to_utility, []).append(worker)
+                self.condition.notify()
+
+        if stop:
+            worker.close()
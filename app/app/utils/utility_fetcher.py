@@ -1,12 +1,83 @@
 
 # ? Standard Imports
 import os
+import threading
+import importlib
+from collections import OrderedDict
 
 # ? Project Imports
 try:
-    from app.utils.config import SP_BUILD_TYPE 
+    from app.utils.config import SP_BUILD_TYPE, SP_BACKEND_TYPE
 except ImportError:
-    from config import SP_BUILD_TYPE
+    from config import SP_BUILD_TYPE, SP_BACKEND_TYPE
+
+# Sniffed target types kept, by path, size and modification time
+SNIFF_CACHE_SIZE = 1024
+
+class TargetFormat:
+    """ A carrier format registered with TargetType: how to recognize its files, and the backend utility and
+    in-process codec that hide passwords in them
+    """
+    def __init__(self, target_type : int, name : str, extensions : list[str] = (), sniff = None, header_size : int = 0,
+                 utility : str = None, codec : str = None):
+        """
+        Args:
+            target_type (int): The value of the target type
+            name (str): The name of the format, shown in file dialogs
+            extensions (list[str]): The file extensions of the format, lowercase with the dot
+            sniff (func): Called with the first header_size bytes of a file (fewer if the file is shorter),
+                returns True if the file is in this format
+            header_size (int): The bytes sniff needs
+            utility (str): The name of the backend utility (see UtilityFetcher.fetch_path)
+            codec (str): The module of the in-process codec, imported on first use (see get_codec)
+        """
+        self.target_type = target_type
+        self.name = name
+        self.extensions = tuple(extensions)
+        self.sniff = sniff
+        self.header_size = header_size
+        self.utility = utility
+        self.codec = codec
+
+    def get_codec(self):
+        """ Imports the in-process codec, None if the format has none
+        """
+        return importlib.import_module(self.codec) if self.codec else None
+
+    def capacity(self, image_path : str) -> dict:
+        """ Gets the bytes available to hide a password in a file (see run_capacity)
+        """
+        return self.get_codec().run_capacity(image_path)
+
+    def hide(self, src_path : str, dest_path : str, message : str, user_hash : str) -> tuple[str, int]:
+        """ Copies a file with a password hidden in it (see run_hide_copy)
+        """
+        return self.get_codec().run_hide_copy(src_path, dest_path, message, user_hash)
+
+    def extract(self, image_path : str, user_hash : str, use_mmap : bool = True) -> tuple[str, int]:
+        """ Extracts the password hidden in a file (see run_extract)
+        """
+        return self.get_codec().run_extract(image_path, user_hash, use_mmap)
+
+    def extract_record(self, image_path : str, record_key : str, user_hash : str) -> tuple[dict, int]:
+        """ Looks up a record of the container hidden in a file, every record if record_key is None (see run_extract_record)
+        """
+        return self.get_codec().run_extract_record(image_path, record_key, user_hash)
+
+    def rekey(self, image_path : str, old_user_hash : str, new_user_hash : str) -> tuple[str, int]:
+        """ Re-encrypts the password (or container) hidden in a file with a new key (see run_rekey)
+        """
+        return self.get_codec().run_rekey(image_path, old_user_hash, new_user_hash)
+
+    def inspect(self, image_path : str) -> dict:
+        """ Reads the header of the payload hidden in a file, no key is needed (see run_inspect)
+        """
+        return self.get_codec().run_inspect(image_path)
+
+def sniff_bmp(header : bytes) -> bool:
+    """ Checks for the BITMAPFILEHEADER magic and a known DIB header size (core, info and the V2 to V5 headers)
+    """
+    return len(header) >= 18 and header[:2] == b'BM' and int.from_bytes(header[14:18], 'little') in (12, 40, 52, 56, 64, 108, 124)
 
 class TargetType:
     """ Enumerates the types of targets that can be selected
@@ -15,9 +86,58 @@ class TargetType:
     SECURE_COPY = 1 # For secure copies to clipboard
     BMP         = 2 # For .bmp files
     
+    # The registered formats, by target type (see Register)
+    FORMATS = {}
+    
+    _sniff_cache = OrderedDict()
+    _sniff_lock = threading.Lock()
+    
     @staticmethod
-    def GetTargetType(filepath) -> int:
-        """ Determines the type of target
+    def Register(target_format : TargetFormat):
+        """ Registers a format, or replaces the one registered for its target type. Formats with a sniffer are
+        detected by GetTargetType, and their utility and codec are found by UtilityFetcher.
+        
+        Args:
+            target_format (TargetFormat): The format to register
+        """
+        target_type = target_format.target_type
+        TargetType.FORMATS[target_type] = target_format
+        
+        UtilityFetcher.BACKEND_NAMES.pop(target_type, None)
+        UtilityFetcher.CODEC_MODULES.pop(target_type, None)
+        if target_format.utility:
+            UtilityFetcher.BACKEND_NAMES[target_type] = target_format.utility
+        if target_format.codec:
+            UtilityFetcher.CODEC_MODULES[target_type] = target_format.codec
+        
+        with TargetType._sniff_lock:
+            TargetType._sniff_cache.clear()
+    
+    @staticmethod
+    def Get(target_type : int) -> TargetFormat:
+        """ Gets the registered format of a target type, None if there is none
+        """
+        return TargetType.FORMATS.get(target_type)
+    
+    @staticmethod
+    def Carriers() -> list[TargetFormat]:
+        """ Gets the formats passwords can be hidden in (the ones that can be sniffed)
+        """
+        return [target_format for target_format in TargetType.FORMATS.values() if target_format.sniff is not None]
+    
+    @staticmethod
+    def FileTypes() -> list[tuple[str, str]]:
+        """ Gets the file types of the carrier formats for the file dialogs, all of them first if there are several
+        """
+        file_types = [(f"{target_format.name} files", ' '.join('*' + extension for extension in target_format.extensions))
+                      for target_format in TargetType.Carriers()]
+        if len(file_types) > 1:
+            file_types.insert(0, ("Supported images", ' '.join(patterns for _, patterns in file_types)))
+        return file_types
+    
+    @staticmethod
+    def FromExtension(filepath) -> int:
+        """ Determines the type of target from the file extension only, without reading the file
         
         Args:
             filepath (str): The path to the target
@@ -25,24 +145,99 @@ class TargetType:
         Returns:
             int: The type of target
         """
-        extension = os.path.splitext(filepath)[1]
+        extension = os.path.splitext(filepath)[1].lower()
         
-        if extension in ['.bmp']:
-            return TargetType.BMP
+        for target_format in TargetType.Carriers():
+            if extension in target_format.extensions:
+                return target_format.target_type
         return TargetType.NOT_FOUND
     
+    @staticmethod
+    def GetTargetType(filepath) -> int:
+        """ Determines the type of target from the first bytes of the file, so a file with the wrong extension is
+        still recognized (or rejected). Files that don't exist yet, or can't be read, are typed by their extension.
+        The result is cached until the file changes.
+        
+        Args:
+            filepath (str): The path to the target
+        
+        Returns:
+            int: The type of target
+        """
+        try:
+            stat = os.stat(filepath)
+        except (OSError, ValueError):
+            return TargetType.FromExtension(filepath)
+        
+        key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+        with TargetType._sniff_lock:
+            target_type = TargetType._sniff_cache.get(key)
+            if target_type is not None:
+                TargetType._sniff_cache.move_to_end(key)
+                return target_type
+        
+        carriers = TargetType.Carriers()
+        try:
+            with open(filepath, 'rb') as f:
+                header = f.read(max((target_format.header_size for target_format in carriers), default=0))
+        except OSError:
+            return TargetType.FromExtension(filepath)
+        
+        # the format of the extension is tried first, in case several formats match
+        by_extension = TargetType.FromExtension(filepath)
+        carriers.sort(key=lambda target_format: target_format.target_type != by_extension)
+        target_type = next((target_format.target_type for target_format in carriers
+                            if target_format.sniff(header[:target_format.header_size])), TargetType.NOT_FOUND)
+        
+        with TargetType._sniff_lock:
+            TargetType._sniff_cache[key] = target_type
+            if len(TargetType._sniff_cache) > SNIFF_CACHE_SIZE:
+                TargetType._sniff_cache.popitem(last=False)
+        return target_type
+    
 class UtilityFetcher:
     """ Fetches the path to the appropriate backend utility
     """
     
-    BACKEND_NAMES = {
-            TargetType.BMP : 'bmp-steg',
-            TargetType.SECURE_COPY : 'secure-copy'
-        }
+    # The backend utilities and in-process codecs (imported on first use) of the registered formats,
+    # kept up to date by TargetType.Register
+    BACKEND_NAMES = {}
+    CODEC_MODULES = {}
+    
+    @staticmethod
+    def fetch_backend() -> str:
+        """ Gets the steganography backend selected in the config
+
+        Returns:
+            str: The backend type (see SP_BACKEND_TYPE), defaults to the native utilities.
+        """
+        backend = os.environ.get('SP_BACKEND')
+        if not SP_BACKEND_TYPE.IsValid(backend):
+            return SP_BACKEND_TYPE.NATIVE
+        return backend
+    
+    @staticmethod
+    def fetch_codec(target_type : int):
+        """ Gets the in-process codec for a target type, which provides run_hide and run_extract
+        with the same outputs and exit codes as the backend utility (and run_hide_copy, which copies and
+        hides in one pass, and the container functions run_hide_records and run_extract_record, which the
+        utility does not have).
+
+        Args:
+            target_type (int): The type of target
+
+        Returns:
+            module: The codec module, or None if the target type has no in-process codec.
+        """
+        if target_type not in UtilityFetcher.CODEC_MODULES:
+            return None
+        
+        return importlib.import_module(UtilityFetcher.CODEC_MODULES[target_type])
     
     @staticmethod
     def fetch_path(target_type : int) -> str:
-        """ Gets the path to the appropriate backend utility
+        """ Gets the path to the appropriate backend utility. If SP_UTILITY_DIR is set, the utilities are
+        looked up there instead of the build output (e.g. stand-ins for the benchmarks, see tests/bench).
         
         Args:
             target_type (int): The type of target
@@ -50,15 +245,18 @@ class UtilityFetcher:
         Returns:
             str: The path to the backend utility, or None if the utility could not be found.
         """
+        if target_type not in UtilityFetcher.BACKEND_NAMES:
+            return None
+        
+        alias = UtilityFetcher.BACKEND_NAMES[target_type]
+        utility_dir = os.environ.get('SP_UTILITY_DIR')
+        if utility_dir:
+            return os.path.join(utility_dir, alias + ('.exe' if os.name == 'nt' else ''))
         
         root_dir = os.environ.get('ROOT_DIR')
         if not root_dir:
             return None
         
-        if target_type not in UtilityFetcher.BACKEND_NAMES:
-            return None
-        
-        alias = UtilityFetcher.BACKEND_NAMES[target_type]
         if os.environ.get('SP_BUILD') == SP_BUILD_TYPE.DEBUG:
             return os.path.join(root_dir, f'..\\bin\\Release-windows-x86_64\\{alias}\\{alias}.exe')
         elif os.environ.get('SP_BUILD') == SP_BUILD_TYPE.RELEASE:
@@ -99,6 +297,9 @@ class UtilityFetcher:
         
         return paths
 
+TargetType.Register(TargetFormat(TargetType.SECURE_COPY, 'secure-copy', utility='secure-copy'))
+TargetType.Register(TargetFormat(TargetType.BMP, 'BMP', ['.bmp'], sniff_bmp, 18, utility='bmp-steg', codec='app.core.bmp'))
+
 if __name__ == '__main__':
     # Set the root directory path (up one directory from the current file's location)
     root_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
@@ -11,11 +11,12 @@ import os
 import subprocess
 import sys
 import shutil
-from PIL import Image
 
 
 # ? Project Imports
 from app.utils.config import SP_BUILD_TYPE
+from app.utils.tracing import traced, span
+from app.core.fileio import atomic_replace, file_lock
 
 def sha256_hash(password) -> str:
     """ Hashes a password using the SHA-256 algorithm
@@ -74,6 +75,7 @@ def show_error_message(message : str):
     MB_ICONERROR = 0x00000010
     ctypes.windll.user32.MessageBoxW(0, message, "StegPass", MB_OK | MB_ICONERROR)
     
+@traced('fork_to_login')
 def fork_to_login(username = None) -> str:
     """ Launches the login application
 
@@ -107,12 +109,13 @@ def fork_to_login(username = None) -> str:
     
     return output
 
+@traced('copy_file')
 def copy_file(src, dst) -> bool:
-    """ Copies a file from the source to the destination
+    """ Copies a file from the source to the destination, showing an error message if it fails (see replace_file)
 
     Args:
         src (str): The path to the source file
-        dst (str): The path to the destination file
+        dst (str): The path to the destination file, or the folder to copy it into
 
     Returns:
         bool: True if the file was copied successfully, False otherwise
@@ -128,14 +131,35 @@ def copy_file(src, dst) -> bool:
             show_error_message(f"File {src} does not exist.")
             return False
 
-        # Copy the file
-        shutil.copy2(src, dst)
+        replace_file(src, dst)
     except Exception as e:
         show_error_message(f"An error occurred while copying the file: {e}")
         return False
     
     return True
 
+def replace_file(src, dst) -> str:
+    """ Copies a file over the destination. The copy replaces an existing file atomically, under its lock
+    (see app/core/fileio.py)
+
+    Args:
+        src (str): The path to the source file
+        dst (str): The path to the destination file, or the folder to copy it into
+
+    Returns:
+        str: The path of the copy
+
+    Raises:
+        OSError: If the file could not be copied
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
+    with file_lock(dst), open(src, 'rb') as source, atomic_replace(dst) as target:
+        shutil.copyfileobj(source, target)
+    shutil.copystat(src, dst)
+    return dst
+
 def run_subprocess(command : list[str]):
     """ Runs a subprocess and captures the output
 
@@ -150,7 +174,9 @@ def run_subprocess(command : list[str]):
     """
     # Run the subprocess and capture the output
     CREATE_NO_WINDOW = 0x08000000
-    result = subprocess.run(command, capture_output=True, text=True, shell=False, creationflags=CREATE_NO_WINDOW)
+    with span('run_subprocess', utility=os.path.basename(command[0])) as timing:
+        result = subprocess.run(command, capture_output=True, text=True, shell=False, creationflags=CREATE_NO_WINDOW)
+        timing.set(exit_code=result.returncode)
     
     # Get the standard output
     stdout = result.stdout
@@ -194,17 +220,9 @@ def resize_image(image, max_height):
     Returns:
         PIL.Image: The resized image
     """
+    # Scale down to max_height, never up (see thumbnail_service)
+    # PIL is only loaded by the modes that show images
+    from app.utils.thumbnail_service import fit_size, scale_image
     
-    # Get the original dimensions of the image
-    width, height = image.size
-    
-    # Calculate the new width and height while maintaining the aspect ratio
-    if height > max_height:
-        new_height = max_height
-        new_width = int((new_height / height) * width)
-    else:
-        new_width, new_height = width, height
-    
-    # Resize the image
-    resized_image = image.resize((new_width, new_height), Image.LANCZOS)
-    return resized_image
\ No newline at end of file
+    new_size = fit_size(image.size, (image.width, max_height), upscale=False)
+    return scale_image(image, new_size)
\ No newline at end of file
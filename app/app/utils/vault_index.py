@@ -0,0 +1,154 @@
+"""
+StegPass - Password Manager Application
+vault_index.py - On-disk index of the images in a user's password folder
+"""
+
+# ? Standard Imports
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ? Project Imports
+from app.utils.utility_fetcher import TargetType
+from app.utils.user_store import atomic_write
+from app.core.fileio import is_lock_file
+from app.core.message_block import SP_VERSION_HISTORY
+
+# Name of the index file, kept inside the indexed folder
+INDEX_FILE_NAME = '.stegpass_index.json'
+
+# Bumped when the entry format changes (older indexes are rebuilt)
+INDEX_FORMAT = 1
+
+class VaultIndex:
+    """ Remembers, for each supported image in a folder, whether it holds a StegPass payload, the SP version
+    that wrote it and the regions it occupies. Entries are keyed by path and invalidated by size and mtime,
+    so a refresh only opens the files that changed since the last one.
+    """
+    def __init__(self, folder : str, index_path : str = None):
+        """
+        Args:
+            folder (str): The folder to index (searched recursively)
+            index_path (str): Where to keep the index, defaults to INDEX_FILE_NAME inside the folder
+        """
+        self.folder = folder
+        self.index_path = index_path or os.path.join(folder, INDEX_FILE_NAME)
+        self.lock = threading.Lock()
+        self.entries = None
+
+    def _load(self) -> dict:
+        if self.entries is not None:
+            return self.entries
+
+        self.entries = {}
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            if index.get('format') == INDEX_FORMAT:
+                self.entries = index['entries']
+        except (OSError, ValueError, KeyError):
+            pass # missing or corrupt, rebuilt by the next refresh
+
+        return self.entries
+
+    def _save(self):
+        data = json.dumps({'format': INDEX_FORMAT, 'entries': self.entries}).encode('utf-8')
+        atomic_write(self.index_path, data, fsync=False)
+
+    def refresh(self, max_workers : int = None) -> int:
+        """ Brings the index up to date: new and modified files are inspected, deleted files are dropped
+
+        Args:
+            max_workers (int): Threads used to inspect the changed files
+
+        Returns:
+            int: The number of entries that were added, updated or removed
+        """
+        with self.lock:
+            entries = self._load()
+
+            stats = {}
+            for path, stat in self._scan(self.folder):
+                stats[os.path.relpath(path, self.folder)] = stat
+
+            removed = [name for name in entries if name not in stats]
+            for name in removed:
+                del entries[name]
+
+            changed = [name for name, stat in stats.items()
+                       if name not in entries or entries[name]['size'] != stat.st_size or entries[name]['mtime_ns'] != stat.st_mtime_ns]
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for name, entry in zip(changed, executor.map(self._inspect, changed)):
+                    entry['size'] = stats[name].st_size
+                    entry['mtime_ns'] = stats[name].st_mtime_ns
+                    entries[name] = entry
+
+            if changed or removed:
+                self._save()
+
+            return len(changed) + len(removed)
+
+    def get(self, image_path : str) -> dict:
+        """ Gets the entry of an image, as of the last refresh
+
+        Args:
+            image_path (str): The path to the image (absolute, or relative to the folder)
+
+        Returns:
+            dict: The entry ('magic', 'version', 'length', 'regions', 'size', 'mtime_ns', and 'error' if the
+            file could not be read), or None if the image is not indexed
+        """
+        with self.lock:
+            return self._load().get(os.path.relpath(os.path.join(self.folder, image_path), self.folder))
+
+    def list_images(self, valid_only : bool = False) -> list[str]:
+        """ Lists the indexed images, as of the last refresh
+
+        Args:
+            valid_only (bool): Only list the images with a payload of a version that can be read
+
+        Returns:
+            list[str]: The paths of the images, sorted
+        """
+        with self.lock:
+            entries = self._load()
+            return sorted(os.path.join(self.folder, name) for name, entry in entries.items()
+                          if not valid_only or (entry['magic'] and tuple(entry['version']) in SP_VERSION_HISTORY))
+
+    def files(self) -> list[str]:
+        """ Lists the supported images in the folder as they are on disk now (the index is not read or updated)
+
+        Returns:
+            list[str]: The paths of the images, sorted
+        """
+        return sorted(path for path, _ in self._scan(self.folder))
+
+    def _scan(self, folder : str):
+        """ Yields the path and stat of every supported image under a folder
+        """
+        try:
+            with os.scandir(folder) as it:
+                for dir_entry in it:
+                    if is_lock_file(dir_entry.name):
+                        continue
+                    if dir_entry.is_dir(follow_symlinks=False):
+                        yield from self._scan(dir_entry.path)
+                    elif TargetType.FromExtension(dir_entry.name) != TargetType.NOT_FOUND:
+                        yield dir_entry.path, dir_entry.stat()
+        except OSError:
+            pass # folder removed or unreadable
+
+    def _inspect(self, name : str) -> dict:
+        """ Reads the payload header of an image with its codec
+        """
+        path = os.path.join(self.folder, name)
+        target_format = TargetType.Get(TargetType.GetTargetType(path))
+        if target_format is None or target_format.codec is None:
+            return {'magic': False, 'version': None, 'length': None, 'regions': None, 'complete': None,
+                    'error': "Unsupported target type"}
+        try:
+            return target_format.inspect(path)
+        except (OSError, ValueError) as e:
+            return {'magic': False, 'version': None, 'length': None, 'regions': None, 'complete': None, 'error': str(e)}
@@ -0,0 +1,125 @@
+"""
+StegPass - Password Manager Application
+verify.py - Checks that every image in a user's password folder still holds a readable password
+"""
+
+# ? Standard Imports
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# ? Project Imports
+from app.utils.utility_fetcher import TargetType
+from app.utils.user_manager import UserManager
+from app.core.message_block import SP_VERSION_HISTORY
+from app.core.container import SP_CONTAINER_VERSION
+
+# Status of each image
+VERIFY_OK          = 'ok'          # the header is valid and the message decrypts
+VERIFY_EMPTY       = 'empty'       # no payload, and the index never recorded one
+VERIFY_BAD_HEADER  = 'bad_header'  # magic number present, but the version was never written by StegPass
+VERIFY_TRUNCATED   = 'truncated'   # the declared length runs past the end of the image
+VERIFY_BAD_MESSAGE = 'bad_message' # decryption does not give a null-terminated message of the declared length
+VERIFY_CLOBBERED   = 'clobbered'   # the index recorded a valid payload, and the file was rewritten since
+VERIFY_ERROR       = 'error'       # the image could not be read
+
+# Statuses that are not failures
+VERIFY_PASSING = (VERIFY_OK, VERIFY_EMPTY)
+
+# Images sent to a worker process at a time
+VERIFY_CHUNK_SIZE = 16
+
+def verify_image(image_path : str, user_hash : str, indexed : dict = None) -> dict:
+    """ Verifies a single image (runs in a worker process)
+
+    Args:
+        image_path (str): The path to the image
+        user_hash (str): The hex encoded encryption key
+        indexed (dict): The image's entry in the vault index as of its last refresh, None if it was never indexed
+
+    Returns:
+        dict: The image 'path', its 'status' (see VERIFY_*), the 'version', 'length' and 'regions' of its header,
+        and an 'error' message. Clobbered images also have the 'reason' they would otherwise be reported with.
+    """
+    result = {'path': image_path, 'status': VERIFY_OK, 'version': None, 'length': None, 'regions': None, 'error': ""}
+
+    target_format = TargetType.Get(TargetType.GetTargetType(image_path))
+    if target_format is None or target_format.codec is None:
+        result.update(status=VERIFY_ERROR, error="Unsupported target type")
+        return result
+
+    try:
+        payload = target_format.inspect(image_path)
+    except (OSError, ValueError) as e:
+        result.update(status=VERIFY_ERROR, error=str(e))
+        return result
+
+    result.update(version=payload['version'], length=payload['length'], regions=payload['regions'])
+
+    if not payload['magic']:
+        result['status'] = VERIFY_EMPTY
+    elif tuple(payload['version']) not in SP_VERSION_HISTORY:
+        result['status'] = VERIFY_BAD_HEADER
+    elif not payload['complete']:
+        result['status'] = VERIFY_TRUNCATED
+    else:
+        if tuple(payload['version']) == SP_CONTAINER_VERSION:
+            output, exit_code = target_format.extract_record(image_path, None, user_hash)
+        else:
+            output, exit_code = target_format.extract(image_path, user_hash)
+
+        if exit_code == 4:
+            result['status'] = VERIFY_BAD_MESSAGE
+        elif exit_code != 0:
+            result.update(status=VERIFY_ERROR, error=str(output))
+
+    if result['status'] not in (VERIFY_OK, VERIFY_ERROR) and was_clobbered(image_path, payload, indexed):
+        result['reason'] = result['status']
+        result['status'] = VERIFY_CLOBBERED
+
+    return result
+
+def was_clobbered(image_path : str, payload : dict, indexed : dict) -> bool:
+    """ Checks if an image that fails verification held a valid payload when it was indexed, and was rewritten
+    since (an image editor zeroing the padding or dropping Gap2). An unchanged file that fails to decrypt is
+    more likely encrypted with another key, and is not reported as clobbered.
+    """
+    if indexed is None or not indexed.get('magic') or tuple(indexed['version']) not in SP_VERSION_HISTORY:
+        return False
+
+    if (payload['magic'], payload['version'], payload['length']) != (True, indexed['version'], indexed['length']):
+        return True
+
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return False
+    return (stat.st_size, stat.st_mtime_ns) != (indexed['size'], indexed['mtime_ns'])
+
+def verify_user(username : str, max_workers : int = None):
+    """ Verifies every image in a user's password folder on a process pool. Clobbered images are found by
+    comparing against the vault index, which is only read (the next refresh records the current state).
+
+    Args:
+        username (str): The username of the user
+        max_workers (int): Worker processes to use
+
+    Yields:
+        dict: The result of each image (see verify_image), in path order
+
+    Raises:
+        PermissionError: If the user's password hash could not be resolved (login failed or was canceled)
+    """
+    user_manager = UserManager()
+    user_hash = user_manager.get_user_pass_hash(username)
+    if user_hash is None:
+        raise PermissionError("Failed to login.")
+
+    index = user_manager.get_vault_index(username)
+    image_paths = index.files()
+    if len(image_paths) == 0:
+        return
+
+    indexed = [index.get(path) for path in image_paths]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(verify_image, image_paths, [user_hash] * len(image_paths), indexed, chunksize=VERIFY_CHUNK_SIZE)
@@ -18,6 +18,9 @@ RGRAY = '#10121f' # title bar color                       (Hex color)
 class BaseGui:
     """ Universal main window class for all windows in the application.
     """
+    # The root whose main loop is currently running, if any (windows can be opened on top of it)
+    running_root = None
+    
     def __init__(self, **kwargs):
         # Set DPI awareness (makes the window look better on high resolution screens)
         try:
@@ -26,7 +29,12 @@ class BaseGui:
         except:
             pass
         
-        self.root = TkinterDnD.Tk()
+        # Open as a window of an already running application, or as its own application
+        self.master = kwargs.get("master", None)
+        if self.master is not None:
+            self.root = Toplevel(self.master)
+        else:
+            self.root = TkinterDnD.Tk()
         self.root.overrideredirect(True)
         
         self.root.minimized = False # only to know if root is minimized
@@ -118,9 +126,19 @@ class BaseGui:
         return self.content
         
     def run(self):
-        """ Starts the main loop of the application.
+        """ Starts the main loop of the application. If the window has a master, waits for the window
+        to be closed instead (the master's main loop keeps handling events).
         """
-        self.root.mainloop()
+        if self.master is not None:
+            self.root.grab_set()
+            self.root.wait_window()
+            return
+        
+        BaseGui.running_root = self.root
+        try:
+            self.root.mainloop()
+        finally:
+            BaseGui.running_root = None
         
     def set_appwindow(self):
         """ To display the window icon on the taskbar, even when using root.overrideredirect(True).
@@ -364,6 +382,9 @@ class BaseGui:
         self.title_bar_icon.config(image=self.icon_image)
         
     def quit(self):
-        """ Quit the application.
+        """ Quit the application (or close the window, if it has a master).
         """
-        self.root.quit()
\ No newline at end of file
+        if self.master is not None:
+            self.root.destroy()
+        else:
+            self.root.quit()
\ No newline at end of file
@@ -1,7 +1,11 @@
+import os
 import tkinter as tk
 from tkinter import filedialog
 from tkinterdnd2 import DND_FILES, TkinterDnD
-from PIL import Image, ImageTk
+
+from app.utils.thumbnail_service import ThumbnailService
+from app.utils.utility_fetcher import TargetType
+from app.utils.tracing import start_time, record
 
 class DragDropWidget(tk.Frame):
     NO_SELECT_COLOR = "#D3D3D3"
@@ -15,7 +19,8 @@ class DragDropWidget(tk.Frame):
         self.pack_propagate(False)
         
         # Create a label to display the instructions with the master widget's background color
-        self.instruction_label = tk.Label(self, text="Drag BMP file here or click to browse", pady=20, bg=self.NO_SELECT_COLOR)
+        format_names = '/'.join(target_format.name for target_format in TargetType.Carriers())
+        self.instruction_label = tk.Label(self, text=f"Drag {format_names} file here or click to browse", pady=20, bg=self.NO_SELECT_COLOR)
         self.instruction_label.pack(side=tk.TOP)
 
         # Create a label to display the image with the master widget's background color
@@ -33,17 +38,28 @@ class DragDropWidget(tk.Frame):
         
         # Listener for when an image is loaded
         self.on_load_image_listener = None
+        
+        # The image whose preview is being loaded
+        self.loading_path = None
 
     def drop(self, event):
         file_path = event.data.strip('{}')  # Strip curly braces for paths with spaces
-        if file_path.lower().endswith('.bmp'):
-            self.load_image(file_path)
-            if self.on_load_image_listener:
-                self.on_load_image_listener(file_path)
-        else:
-            print("Only BMP files are supported.")
+        self.select_file(file_path)
+    
+    def select_file(self, file_path):
+        """ Loads a dropped or browsed file, if it is in a registered format. The format is sniffed from the
+        file's header, so a file with the wrong extension is rejected here.
+        """
+        if TargetType.GetTargetType(file_path) == TargetType.NOT_FOUND:
+            print("Only " + ', '.join(target_format.name for target_format in TargetType.Carriers()) + " files are supported.")
+            return
+        
+        self.load_image(file_path)
+        if self.on_load_image_listener:
+            self.on_load_image_listener(file_path)
             
     def clear_image(self):
+        self.loading_path = None
         if not self.image_label.image:
             return
         
@@ -60,29 +76,33 @@ class DragDropWidget(tk.Frame):
                 self.on_load_image_listener("")
 
     def load_image(self, file_path):
-        image = Image.open(file_path)
-        
-        # Get the widget's size
-        widget_width = self.winfo_width()
-        widget_height = self.winfo_height()
-        
-        # Calculate the new size maintaining the aspect ratio
-        aspect_ratio = min(widget_width / image.width, widget_height / image.height)
-        new_size = (int(image.width * aspect_ratio), int(image.height * aspect_ratio))
-        
-        # Resize the image
-        resized_image = image.resize(new_size, Image.LANCZOS)
+        """ Shows a preview of an image, decoded in the background (see ThumbnailService)
+        """
+        # only the most recently selected image is shown, if previews finish out of order
+        self.loading_path = file_path
+        started = start_time() # the preview is shown by a callback, so the span ends there
         
-        # Convert the image to a format Tkinter can display
-        photo = ImageTk.PhotoImage(resized_image)
+        def show_image(photo):
+            if self.loading_path != file_path:
+                return
+            
+            # Update the label with the new image
+            self.image_label.config(image=photo)
+            self.image_label.image = photo  # Keep a reference to avoid garbage collection
+            self.instruction_label.pack_forget()  # Remove instruction label when an image is loaded
+            
+            # Change background color to black
+            self.update_background_color(self.SELECTED_BG_COLOR)
+            record('DragDropWidget.load_image', started, file=os.path.basename(file_path))
         
-        # Update the label with the new image
-        self.image_label.config(image=photo)
-        self.image_label.image = photo  # Keep a reference to avoid garbage collection
-        self.instruction_label.pack_forget()  # Remove instruction label when an image is loaded
+        def show_error(e):
+            if self.loading_path == file_path:
+                print(f"Could not load image: {e}")
+            record('DragDropWidget.load_image', started, file=os.path.basename(file_path), error=str(e))
         
-        # Change background color to black
-        self.update_background_color(self.SELECTED_BG_COLOR)
+        # Scale to the widget's size, maintaining the aspect ratio
+        widget_size = (max(self.winfo_width(), 1), max(self.winfo_height(), 1))
+        ThumbnailService().request(self, file_path, widget_size, show_image, show_error)
         
     def update_background_color(self, color):
         self.config(bg=color)
@@ -97,9 +117,6 @@ class DragDropWidget(tk.Frame):
         self.on_load_image_listener = listener
 
     def open_file_dialog(self, event=None):
-        file_path = filedialog.askopenfilename(filetypes=[("BMP files", "*.bmp")])
+        file_path = filedialog.askopenfilename(filetypes=TargetType.FileTypes())
         if file_path:
-            self.load_image(file_path)
-            
-            if self.on_load_image_listener:
-                self.on_load_image_listener(file_path)
\ No newline at end of file
+            self.select_file(file_path)
\ No newline at end of file
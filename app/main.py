@@ -6,42 +6,74 @@ main.py - The main entry point for the application
 # ? Standard Imports
 import os
 import sys
+import json
+import multiprocessing
 
 # ? Project Imports
-from app.gui import GuiApp
-from app.login import LogInApp
-from app.get_password import get_password, notify_user
-
+# Each mode imports what it uses below, so the command line modes don't load Tk, PIL or NumPy
+# (see tests/bench/bench_startup.py)
 from app.utils.config import setup_config
 from app.utils.utils import show_error_message
 
+# Modes run by scripts and services, possibly without a display: they never show a message box, errors go to
+# stderr with the mode's exit code
+HEADLESS_MODES = ('--headless', '--agent', '--agent-unlock', '--agent-lock', '--agent-stop', '--verify', '--rekey', '--ingest')
 
 if __name__ == '__main__':
+    # Worker processes (see rekey_user) re-run this file in the frozen build
+    multiprocessing.freeze_support()
+    
     # Set the root directory path
     root_dir  = os.path.dirname(os.path.abspath(__file__))
     os.environ['ROOT_DIR'] = root_dir
     
+    headless = len(sys.argv) >= 2 and sys.argv[1] in HEADLESS_MODES
+    
     # Set up environment using config
     try:
         setup_config()
     except Exception as e:
-        show_error_message(f"An error occurred while setting up the environment: {e}")
+        if headless:
+            print(f"Error: An error occurred while setting up the environment: {e}", file=sys.stderr)
+        else:
+            show_error_message(f"An error occurred while setting up the environment: {e}")
         sys.exit(1)
         
     # Launch the application according to the provided arguments
     # If no arguments are provided, launch the main application
     # --login [user]: Launch the login application
     # --password [image_path] [optional:username]: Retrieve a password from an image file
+    # --headless [image_path] [username] [optional:key_fd|agent] [optional:output_path]: Retrieve a password without a display,
+    #     reading the master password from a file descriptor (stdin by default) or using the key agent, and writing the password
+    #     to stdout or a named pipe
+    # --agent: Run the key agent (until --agent-stop)
+    # --agent-unlock [username] [optional:key_fd]: Unlock a user in the key agent, reading the master password from a file descriptor
+    # --agent-lock [optional:username]: Make the key agent forget a user's key (every user's by default)
+    # --agent-stop: Stop the key agent
+    # --password-batch [dir|glob] [optional:username]: Verify passwords can be retrieved from many image files
+    # --capacity [dir|glob] [optional:bytes]: Report the bytes each image can hide without growing (only images that fit the payload size)
+    # --verify [username]: Check every image in the user's password folder (JSON lines, exit 1 if any image failed)
+    # --rekey [username] [optional:key_fd]: Change a user's master password, re-encrypting every image in their password folder.
+    #     Reads the old and the new master password, one per line, from a file descriptor (stdin by default). JSON lines
+    #     with the progress, exit 1 if any image failed (run it again to resume)
+    # --ingest [spool|-] [optional:workers]: Store the passwords of the jobs dropped into a spool folder until interrupted,
+    #     or of the jobs read from stdin (JSON lines, see app/utils/ingest.py). The users must be unlocked in the key agent
     if len(sys.argv) == 1:
+        from app.gui import GuiApp
         GuiApp()
         
     elif len(sys.argv) >= 2 and sys.argv[1] == '--login':
         default_user = None
         if len(sys.argv) == 3:
             default_user = sys.argv[2]
+        
+        from app.login import LogInApp
         print(LogInApp(default_user))
         
     elif len(sys.argv) >= 3 and sys.argv[1] == '--password':
+        from app.get_password import get_password, notify_user
+        from app.utils.clipboard_manager import ClipboardManager
+        
         if len(sys.argv) == 3:
             exit_code, output = get_password(sys.argv[2])
         elif len(sys.argv) == 4:
@@ -49,6 +81,7 @@ if __name__ == '__main__':
         
         if exit_code == 0:
             notify_user(output)
+            ClipboardManager().wait() # stay alive to clear the clipboard
         elif exit_code == 4:
             show_error_message("Could not recover password.")
             sys.exit(1)
@@ -56,6 +89,204 @@ if __name__ == '__main__':
             show_error_message(output)
             sys.exit(1)
         
+    elif len(sys.argv) in (4, 5, 6) and sys.argv[1] == '--headless':
+        from app.get_password import get_password_headless
+        
+        # never show a message box, errors go to stderr and the exit code is the same as --password
+        if len(sys.argv) >= 5 and not (sys.argv[4].isdigit() or sys.argv[4] == 'agent'):
+            print("Error: Invalid arguments provided.", file=sys.stderr)
+            sys.exit(2)
+        
+        key_fd = 0
+        if len(sys.argv) >= 5:
+            key_fd = None if sys.argv[4] == 'agent' else int(sys.argv[4])
+        exit_code, output = get_password_headless(sys.argv[2], sys.argv[3], key_fd)
+        if exit_code != 0:
+            print(output.strip() or "Could not recover password.", file=sys.stderr)
+            sys.exit(exit_code)
+        
+        # opening a named pipe blocks until the reader opens it
+        if len(sys.argv) == 6 and sys.argv[5] != '-':
+            with open(sys.argv[5], 'w', encoding='utf-8') as out:
+                out.write(output + '\n')
+        else:
+            sys.stdout.write(output + '\n')
+            sys.stdout.flush()
+        
+    elif len(sys.argv) == 2 and sys.argv[1] == '--agent':
+        from app.utils.key_agent import KeyAgent
+        
+        agent = KeyAgent()
+        print(f"StegPass agent listening on {agent.socket_path}", flush=True)
+        try:
+            agent.serve_forever()
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(7)
+        except KeyboardInterrupt:
+            pass
+        
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == '--agent-unlock':
+        from app.get_password import read_master_password
+        from app.utils.key_agent import AgentClient
+        
+        if len(sys.argv) == 4 and not sys.argv[3].isdigit():
+            print("Error: Invalid arguments provided.", file=sys.stderr)
+            sys.exit(2)
+        
+        try:
+            master_password = read_master_password(int(sys.argv[3]) if len(sys.argv) == 4 else 0)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read the master password: {e}", file=sys.stderr)
+            sys.exit(2)
+        
+        response = AgentClient().unlock(sys.argv[2], master_password)
+        if response is None:
+            print("Error: The key agent is not running.", file=sys.stderr)
+            sys.exit(7)
+        if not response['ok']:
+            print(f"Error: {response['error']}", file=sys.stderr)
+            sys.exit(8)
+        
+    elif len(sys.argv) in (2, 3) and sys.argv[1] in ('--agent-lock', '--agent-stop'):
+        from app.utils.key_agent import AgentClient
+        
+        if sys.argv[1] == '--agent-stop':
+            response = AgentClient().request('stop')
+        else:
+            response = AgentClient().lock(sys.argv[2] if len(sys.argv) == 3 else None)
+        
+        if response is None:
+            print("Error: The key agent is not running.", file=sys.stderr)
+            sys.exit(7)
+        
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == '--password-batch':
+        from app.get_password import get_password_many, collect_image_paths
+        
+        image_paths = collect_image_paths(sys.argv[2])
+        if len(image_paths) == 0:
+            show_error_message(f"No supported image files found for '{sys.argv[2]}'.")
+            sys.exit(1)
+        
+        username = sys.argv[3] if len(sys.argv) == 4 else None
+        
+        # one line per image as it completes (passwords are never printed): exit code, path, error
+        failed = 0
+        for image_path, exit_code, output in get_password_many(image_paths, username):
+            if exit_code == 0:
+                print(f"{exit_code}\t{image_path}", flush=True)
+            else:
+                failed += 1
+                print(f"{exit_code}\t{image_path}\t{output.strip() or 'Could not recover password.'}", flush=True)
+        
+        sys.exit(1 if failed else 0)
+        
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == '--capacity':
+        from app.get_password import collect_image_paths
+        from app.utils.capacity import capacity_many, select_images
+        
+        image_paths = collect_image_paths(sys.argv[2])
+        if len(image_paths) == 0:
+            show_error_message(f"No supported image files found for '{sys.argv[2]}'.")
+            sys.exit(1)
+        
+        # one line per image (only the headers are read): total, padding, gap1, gap2, path
+        if len(sys.argv) == 4:
+            if not sys.argv[3].isdigit():
+                show_error_message("Invalid arguments provided. Exiting...")
+                sys.exit(1)
+            
+            # tightest fit first
+            results = [(image_path, available, "") for image_path, available in select_images(image_paths, int(sys.argv[3]))]
+        else:
+            results = capacity_many(image_paths)
+        
+        found = False
+        for image_path, available, error in results:
+            if available is None:
+                print(f"-\t-\t-\t-\t{image_path}\t{error}", flush=True)
+                continue
+            found = True
+            print(f"{available['total']}\t{available['padding']}\t{available['gap1']}\t{available['gap2']}\t{image_path}", flush=True)
+        
+        sys.exit(0 if found else 1)
+        
+    elif len(sys.argv) == 3 and sys.argv[1] == '--verify':
+        from app.utils.verify import verify_user, VERIFY_PASSING
+        
+        # one JSON object per image, then a summary of the counts per status
+        counts = {}
+        try:
+            for result in verify_user(sys.argv[2]):
+                counts[result['status']] = counts.get(result['status'], 0) + 1
+                print(json.dumps(result), flush=True)
+        except PermissionError as e:
+            print(json.dumps({'summary': counts, 'error': str(e)}), flush=True)
+            sys.exit(8)
+        
+        failed = sum(count for status, count in counts.items() if status not in VERIFY_PASSING)
+        print(json.dumps({'summary': counts, 'failed': failed}), flush=True)
+        sys.exit(1 if failed else 0)
+        
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == '--rekey':
+        from app.get_password import read_master_passwords
+        from app.utils.rekey import rekey_user
+        
+        if len(sys.argv) == 4 and not sys.argv[3].isdigit():
+            print("Error: Invalid arguments provided.", file=sys.stderr)
+            sys.exit(2)
+        
+        try:
+            old_master_password, new_master_password = read_master_passwords(int(sys.argv[3]) if len(sys.argv) == 4 else 0, 2)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read the master passwords: {e}", file=sys.stderr)
+            sys.exit(2)
+        
+        # one JSON object per image as it completes, then the result
+        def report_progress(done, total, image_path, outcome):
+            print(json.dumps({'done': done, 'total': total, 'path': image_path, 'outcome': outcome}), flush=True)
+        
+        try:
+            result = rekey_user(sys.argv[2], old_master_password, new_master_password, progress=report_progress)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(8)
+        
+        print(json.dumps(result), flush=True)
+        sys.exit(0 if result['complete'] else 1)
+        
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == '--ingest':
+        import signal
+        from app.utils.ingest import IngestService, ingest_stream
+        
+        # never show a message box, one JSON object per job on stdout and errors on stderr
+        if len(sys.argv) == 4 and not (sys.argv[3].isdigit() and int(sys.argv[3]) > 0):
+            print("Error: Invalid arguments provided.", file=sys.stderr)
+            sys.exit(2)
+        
+        workers = int(sys.argv[3]) if len(sys.argv) == 4 else None
+        if sys.argv[2] == '-':
+            sys.exit(1 if ingest_stream(sys.stdin, workers) else 0)
+        
+        if not os.path.isdir(sys.argv[2]):
+            print(f"Error: The spool folder does not exist: {sys.argv[2]}", file=sys.stderr)
+            sys.exit(3)
+        
+        service = IngestService(sys.argv[2], workers)
+        signal.signal(signal.SIGTERM, lambda signum, frame: service.stop())
+        print(f"StegPass ingest watching {service.spool}", file=sys.stderr, flush=True)
+        try:
+            service.serve_forever()
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(7)
+        except KeyboardInterrupt:
+            service.stop()
+        
+    elif headless:
+        print("Error: Invalid arguments provided.", file=sys.stderr)
+        sys.exit(2)
+        
     else:
         show_error_message("Invalid arguments provided. Exiting...")
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""
+StegPass - Password Manager Application
+bench_agent.py - Measures the round trip of key agent requests (the cost of a retrieval once a user is unlocked)
+
+Usage: python tests/bench/bench_agent.py [--requests 1000]
+"""
+
+# ? Standard Imports
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '../../app')))
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.core.bmp import run_hide
+from app.utils.key_agent import KeyAgent, AgentClient, agent_supported
+
+BENCH_KEY = "CAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABE"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000, help='requests per measurement')
+    args = parser.parse_args()
+
+    if not agent_supported():
+        print("The key agent needs Unix domain sockets, which this platform does not have.")
+        return
+
+    # the agent decrypts with the in-process codec
+    os.environ['SP_BACKEND'] = 'python'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = os.path.join(tmp, 'stored.bmp')
+        write_bmp(image_path, 65, 64, gap1=2)
+        run_hide(image_path, 'hunter2', BENCH_KEY)
+
+        socket_path = os.path.join(tmp, 'agent.sock')
+        agent = KeyAgent(socket_path, ttl=600)
+        thread = threading.Thread(target=agent.serve_forever, daemon=True)
+        thread.start()
+
+        client = AgentClient(socket_path)
+        while client.request('ping') is None:
+            time.sleep(0.01)
+        client.add('bench', BENCH_KEY)
+
+        for name, func in (('get', lambda: client.get_hash('bench')), ('extract', lambda: client.extract('bench', image_path))):
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                func()
+            print(f"{name:<8} {(time.perf_counter() - start) / args.requests * 1000:8.3f} ms per request")
+
+        client.request('stop')
+        thread.join()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+StegPass - Password Manager Application
+bench_capacity.py - Measures the capacity planner over a directory of candidate images
+
+Usage: python tests/bench/bench_capacity.py [--images 10000] [--size 64]
+"""
+
+# ? Standard Imports
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '../../app')))
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.utils.capacity import capacity, select_images
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=10000, help='candidate images in the folder')
+    parser.add_argument('--size', type=int, default=64, help='payload size in bytes to select images for')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # a mix of padding widths and Gap2 sizes, so only some of the images fit
+        image_paths = []
+        for i in range(args.images):
+            path = os.path.join(tmp, f'{i:05}.bmp')
+            write_bmp(path, 64 + i % 4, 16, gap1=2, gap2=(i * 7) % 96)
+            image_paths.append(path)
+
+        start = time.perf_counter()
+        for path in image_paths:
+            capacity(path)
+        print(f"capacity, sequential: {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+        start = time.perf_counter()
+        selected = select_images(image_paths, args.size)
+        print(f"select_images:        {(time.perf_counter() - start) * 1000:9.1f} ms ({len(selected)} of {args.images} fit {args.size} bytes)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+StegPass - Password Manager Application
+bench_hotpaths.py - Measures the store and retrieve hot paths end to end (PasswordCreator.store_password,
+get_password, UserManager.add_user/check_password and thumbnail loading) on synthetic BMPs, reporting p50/p99
+latency and peak RSS, and writes the results as JSON so runs of two commits can be compared
+
+Every case runs in a new interpreter against a temporary ROOT_DIR, so the peak RSS is its own. The native
+backend runs the bmp-steg stand-in (stub_utility.py) unless SP_UTILITY_DIR points at the built utilities.
+
+Usage: python tests/bench/bench_hotpaths.py [--shapes 64x64x24 1023x768x24] [--backends python native]
+                                            [--iterations 50] [--output results.json] [--compare baseline.json]
+"""
+
+# ? Standard Imports
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.abspath(os.path.join(BENCH_DIR, '../..'))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'app'))
+
+# Image cases run for every shape (store and get also for every backend), user cases once
+IMAGE_CASES = ['store', 'get', 'thumbnail']
+BACKEND_CASES = ['store', 'get']
+USER_CASES = ['add_user', 'check_password']
+
+# width x height x bits per pixel: no padding, 1-3 bytes of padding per row, 16 and 32 bit, a large photo
+DEFAULT_SHAPES = ['64x64x24', '1023x768x24', '1024x768x32', '1023x768x16', '4093x3072x24']
+
+BENCH_USER = 'bench'
+BENCH_MASTER = 'bench master password'
+BENCH_PASSWORD = 'correct-horse-battery-staple!'
+THUMBNAIL_BOX = (300, 300)
+
+def percentile(samples : list[float], q : float) -> float:
+    """ Nearest-rank percentile of the samples
+    """
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1))]
+
+def peak_rss_kb(children : bool = False) -> int:
+    """ Peak resident set size of this process (or its waited-for children) in KB, None where it can't be read
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # bytes on macOS, KB elsewhere
+    return usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+
+def prepare_root(root : str, backend : str, kdf_target_ms : int):
+    """ Points the app at a temporary ROOT_DIR with a logged in bench user
+    """
+    os.environ.update({'ROOT_DIR': root, 'SP_BUILD': '0', 'SP_BACKEND': backend, 'SP_USER_STORE': 'json',
+                       'SP_SESSION_TTL': '900', 'SP_KDF_TARGET_MS': str(kdf_target_ms),
+                       'SP_AGENT_SOCKET': os.path.join(root, 'no-agent.sock')}) # never reach a running agent
+
+    if backend == 'native' and not os.environ.get('SP_UTILITY_DIR'):
+        from stub_utility import write_launcher
+        write_launcher(root)
+        os.environ['SP_UTILITY_DIR'] = root
+
+    from app.utils.user_manager import UserManager
+    from app.utils.session_cache import SessionCache
+
+    UserManager().add_user(BENCH_USER, BENCH_MASTER)
+    SessionCache().put(BENCH_USER, UserManager().unlock(BENCH_USER, BENCH_MASTER))
+
+def time_calls(func, iterations : int, warmup : int = 1) -> list[float]:
+    """ Calls func(i) iterations times after warming up, returning each call's latency in milliseconds
+    """
+    for i in range(warmup):
+        func(-1 - i)
+
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def run_case(spec : dict) -> dict:
+    """ Runs a single case in this (fresh) interpreter, see main for the spec
+    """
+    from synthetic_bmp import write_bmp
+
+    with tempfile.TemporaryDirectory() as root:
+        prepare_root(root, spec['backend'], spec['kdf_target_ms'])
+        from app.utils.user_manager import UserManager
+
+        result = {}
+        case = spec['case']
+        if case in IMAGE_CASES:
+            width, height, bit_count = (int(value) for value in spec['shape'].split('x'))
+            src = os.path.join(root, 'src.bmp')
+            result['file_size'] = write_bmp(src, width, height, bit_count, gap1=2)
+            out_dir = os.path.join(root, 'out')
+            os.makedirs(out_dir)
+            dest = os.path.join(out_dir, 'src.bmp')
+
+        if case == 'store':
+            from app.utils.password_creator import PasswordCreator
+            creator = PasswordCreator()
+
+            def func(_):
+                if not creator.store_password(BENCH_USER, BENCH_PASSWORD, src, out_dir):
+                    raise RuntimeError("store_password failed")
+
+        elif case == 'get':
+            from app.utils.password_creator import PasswordCreator
+            from app.get_password import get_password
+            PasswordCreator().store_password(BENCH_USER, BENCH_PASSWORD, src, out_dir)
+
+            def func(_):
+                exit_code, output = get_password(dest, BENCH_USER)
+                if exit_code != 0 or output != BENCH_PASSWORD:
+                    raise RuntimeError(f"get_password failed: {exit_code} {output}")
+
+        elif case == 'thumbnail':
+            try:
+                from app.utils.thumbnail_service import ThumbnailService
+            except ImportError as e:
+                return {'skipped': str(e)}
+            service = ThumbnailService()
+
+            def func(_):
+                service.cache.clear() # a cold decode every time
+                service.render(src, THUMBNAIL_BOX)
+
+        elif case == 'add_user':
+            user_manager = UserManager()
+
+            def func(i):
+                if not user_manager.add_user(f'user{i + 10}', BENCH_MASTER):
+                    raise RuntimeError("add_user failed")
+
+        elif case == 'check_password':
+            user_manager = UserManager()
+
+            def func(_):
+                if not user_manager.check_password(BENCH_USER, BENCH_MASTER):
+                    raise RuntimeError("check_password failed")
+
+        samples = time_calls(func, spec['iterations'])
+
+        # waits for the utility workers, so their peak is included in the children's
+        from app.utils.utility_client import UtilityClient
+        UtilityClient().close()
+
+    result.update({'n': len(samples), 'p50_ms': percentile(samples, 0.50), 'p99_ms': percentile(samples, 0.99),
+                   'mean_ms': sum(samples) / len(samples), 'max_ms': max(samples), 'peak_rss_kb': peak_rss_kb()})
+    if spec['backend'] == 'native' and case in BACKEND_CASES:
+        result['children_peak_rss_kb'] = peak_rss_kb(children=True)
+    return result
+
+def spawn_case(spec : dict) -> dict:
+    """ Runs a case in a new interpreter and collects its result
+    """
+    child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', json.dumps(spec)],
+                           capture_output=True, text=True)
+    if child.returncode != 0:
+        lines = child.stderr.strip().splitlines()
+        return {**spec, 'error': lines[-1] if lines else f"exit code {child.returncode}"}
+    return {**spec, **json.loads(child.stdout)}
+
+def case_key(result : dict) -> str:
+    return f"{result['case']}/{result['backend']}/{result.get('shape') or '-'}"
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def print_results(results : list[dict], baseline : dict = None, threshold : float = 1.2):
+    """ Prints a table of the results, with the p50 ratio against a baseline run if one is given
+    """
+    print(f"{'case':<40} {'n':>5} {'p50 ms':>10} {'p99 ms':>10} {'RSS MB':>8}" + (f" {'vs base':>8}" if baseline else ""))
+    for result in results:
+        key = case_key(result)
+        if 'error' in result or 'skipped' in result:
+            print(f"{key:<40} {result.get('error') or 'skipped: ' + result['skipped']}")
+            continue
+
+        rss = result['peak_rss_kb']
+        line = f"{key:<40} {result['n']:>5} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} {rss / 1024 if rss else float('nan'):>8.1f}"
+        if baseline:
+            before = baseline.get(key)
+            if before is not None and 'p50_ms' in before:
+                ratio = result['p50_ms'] / before['p50_ms']
+                line += f" {ratio:>7.2f}x" + (" REGRESSION" if ratio > threshold else "")
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapes', nargs='+', default=DEFAULT_SHAPES, help='images as WIDTHxHEIGHTxBITS')
+    parser.add_argument('--backends', nargs='+', default=['python', 'native'], choices=['python', 'native'])
+    parser.add_argument('--cases', nargs='+', default=IMAGE_CASES + USER_CASES, choices=IMAGE_CASES + USER_CASES)
+    parser.add_argument('--iterations', type=int, default=50, help='timed calls per image case')
+    parser.add_argument('--user-iterations', type=int, default=10, help='timed calls per user case (each derives a verifier)')
+    parser.add_argument('--kdf-target-ms', type=int, default=250, help='SP_KDF_TARGET_MS for the user cases')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='a JSON file written by --output to compare the p50 latencies against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='p50 ratio flagged as a regression')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(json.loads(args.child))))
+        return
+
+    if 'native' in args.backends and os.name == 'nt' and not os.environ.get('SP_UTILITY_DIR'):
+        print("The utility stand-in needs a POSIX shell, set SP_UTILITY_DIR to the built utilities to measure the native backend.")
+        args.backends.remove('native')
+
+    specs = []
+    for case in args.cases:
+        if case in USER_CASES:
+            specs.append({'case': case, 'backend': 'python', 'shape': None, 'iterations': args.user_iterations})
+            continue
+        for backend in (args.backends if case in BACKEND_CASES else ['python']):
+            for shape in args.shapes:
+                specs.append({'case': case, 'backend': backend, 'shape': shape, 'iterations': args.iterations})
+
+    results = []
+    for spec in specs:
+        spec['kdf_target_ms'] = args.kdf_target_ms
+        results.append(spawn_case(spec))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {case_key(result): result for result in json.load(f)['results']}
+
+    print_results(results, baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+                       'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
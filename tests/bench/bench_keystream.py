@@ -0,0 +1,64 @@
+"""
+StegPass - Password Manager Application
+bench_keystream.py - Compares the vectorized BBS key stream against a byte-by-byte loop like sp::Obfuscator::BBS
+
+Usage: python tests/bench/bench_keystream.py [--messages 10000] [--keys 10000]
+"""
+
+# ? Standard Imports
+import argparse
+import os
+import struct
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '../../app')))
+
+# ? Project Imports
+from app.core.obfuscator import bbs, bbs_many, crypt, BBS_MODULUS, BBS_LANES
+
+# Pinned by SP_OBFUSCATOR.TestBBSKeyStream in tests/core_unit_tests.cpp
+PINNED_KEY = bytes.fromhex("DEADBEEF" * 8)
+PINNED_KEY_STREAM = bytes.fromhex("73737373151515159b9b9b9ba4a4a4a447474747272727278282828249494949")
+
+def scalar_bbs(seed : bytes, length : int) -> bytes:
+    """ The native algorithm, one byte at a time
+    """
+    state = list(struct.unpack('<4Q', seed))
+    key_stream = bytearray(length)
+    for i in range(length):
+        lane = i % BBS_LANES
+        state[lane] = ((state[lane] * state[lane]) & 0xFFFFFFFFFFFFFFFF) % BBS_MODULUS
+        key_stream[i] = state[lane] & 0xFF
+    return bytes(key_stream)
+
+def scalar_crypt(data : bytes, encryption_key : bytes) -> bytes:
+    return bytes(a ^ b for a, b in zip(data, scalar_bbs(encryption_key, len(data))))
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=10000, help='messages encrypted with the same key')
+    parser.add_argument('--keys', type=int, default=10000, help='distinct keys to generate key streams for')
+    args = parser.parse_args()
+
+    assert bbs(PINNED_KEY, len(PINNED_KEY_STREAM)) == PINNED_KEY_STREAM
+    keys = [os.urandom(32) for _ in range(args.keys)]
+    assert all(bbs(key, 261) == scalar_bbs(key, 261) for key in keys[:100])
+
+    messages = [os.urandom(64) for _ in range(args.messages)]
+    scalar_ms = timed(lambda: [scalar_crypt(message, keys[0]) for message in messages])
+    vector_ms = timed(lambda: [crypt(message, keys[0]) for message in messages])
+    print(f"crypt {args.messages} x 64 bytes, one key:   scalar {scalar_ms:9.1f} ms   vectorized {vector_ms:9.1f} ms")
+
+    scalar_ms = timed(lambda: [scalar_bbs(key, 256) for key in keys])
+    vector_ms = timed(bbs_many, keys, 256)
+    print(f"key streams {args.keys} keys x 256 bytes: scalar {scalar_ms:9.1f} ms   vectorized {vector_ms:9.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+StegPass - Password Manager Application
+bench_mmap_extract.py - Compares memory-mapped extraction against reading the whole BMP file
+
+Usage: python tests/bench/bench_mmap_extract.py [--size-mb 100] [--repeat 5]
+"""
+
+# ? Standard Imports
+import argparse
+import json
+import mmap
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '../../app')))
+
+# ? Project Imports
+from synthetic_bmp import write_bmp, width_for_padding
+from app.core.bmp import BMP, run_hide, run_extract
+from app.core.message_block import SP_HEADER_SIZE
+
+BENCH_KEY = "CAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABE"
+BENCH_PASSWORD = "correct horse battery staple"
+
+def pages_touched(path : str, message_length : int, use_mmap : bool) -> int:
+    """ Counts the distinct pages of the file that an extraction reads
+    """
+    file_size = os.path.getsize(path)
+    if not use_mmap:
+        return -(-file_size // mmap.PAGESIZE)
+
+    with BMP.open_mapped(path) as bmp:
+        ranges = bmp.layout.stream_ranges(SP_HEADER_SIZE + message_length)
+
+    pages = {0} # the headers
+    for offset, size, _ in ranges:
+        pages.update(range(offset // mmap.PAGESIZE, (offset + size - 1) // mmap.PAGESIZE + 1))
+    return len(pages)
+
+def peak_rss_kb() -> int:
+    """ Gets the peak resident set size of this process (ru_maxrss survives exec on Linux, VmHWM does not)
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_mode(path : str, use_mmap : bool, repeat : int) -> dict:
+    """ Runs the extraction in this process and reports its cost (call in a fresh process)
+    """
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output, exit_code = run_extract(path, BENCH_KEY, use_mmap)
+        timings.append(time.perf_counter() - start)
+        assert exit_code == 0 and output == BENCH_PASSWORD, (exit_code, output)
+
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        'mode': 'mmap' if use_mmap else 'full-read',
+        'best_ms': min(timings) * 1000,
+        'mean_ms': sum(timings) / len(timings) * 1000,
+        'page_faults': (usage_after.ru_minflt - usage_before.ru_minflt) + (usage_after.ru_majflt - usage_before.ru_majflt),
+        'pages_touched': pages_touched(path, len(BENCH_PASSWORD) + 1, use_mmap),
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=100, help='approximate size of the generated BMP')
+    parser.add_argument('--repeat', type=int, default=5, help='extractions per mode')
+    parser.add_argument('--child', choices=['mmap', 'full-read'], help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.path, args.child == 'mmap', args.repeat)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # one padding byte per row, so the password spans a few dozen rows
+        width = width_for_padding(1, base_width=4000)
+        row_size = (width * 24 + 31) // 32 * 4
+        height = args.size_mb * (1 << 20) // row_size
+
+        path = os.path.join(tmp, 'large.bmp')
+        file_size = write_bmp(path, width, height)
+        _, exit_code = run_hide(path, BENCH_PASSWORD, BENCH_KEY)
+        assert exit_code == 0
+
+        print(f"{file_size / (1 << 20):.1f} MB BMP ({width}x{height}, 24-bit), page size {mmap.PAGESIZE}")
+        print(f"{'mode':<10} {'best ms':>10} {'mean ms':>10} {'pages touched':>14} {'page faults':>12} {'peak RSS KB':>12}")
+
+        # each mode runs in a fresh interpreter so the faults and peak RSS are not shared
+        for mode in ('mmap', 'full-read'):
+            output = subprocess.check_output([sys.executable, __file__, '--child', mode, '--path', path, '--repeat', str(args.repeat)])
+            result = json.loads(output)
+            print(f"{result['mode']:<10} {result['best_ms']:>10.3f} {result['mean_ms']:>10.3f} {result['pages_touched']:>14} {result['page_faults']:>12} {result['peak_rss_kb']:>12}")
+
+if __name__ == '__main__':
+    main()
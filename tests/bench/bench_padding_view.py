@@ -0,0 +1,89 @@
+"""
+StegPass - Password Manager Application
+bench_padding_view.py - Compares the strided padding view against a byte-by-byte loop like BMP::HideMessage
+
+Usage: python tests/bench/bench_padding_view.py [--height 2048] [--repeat 5]
+"""
+
+# ? Standard Imports
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '../../app')))
+
+# ? Project Imports
+from synthetic_bmp import write_bmp, width_for_padding
+from app.core.bmp import BMP
+
+def scalar_write(bmp : BMP, stream : bytes):
+    """ Writes the stream into the padding the way the native utility does, one byte at a time
+    """
+    layout = bmp.layout
+    data = bmp.data
+    index = 0
+    for row in range(layout.num_rows):
+        position = layout.pixel_offset + row * layout.row_size + layout.row_size - layout.padding_size
+        for _ in range(layout.padding_size):
+            if index == len(stream):
+                return
+            data[position] = stream[index]
+            position += 1
+            index += 1
+
+def scalar_read(bmp : BMP, length : int) -> bytes:
+    """ Reads the stream from the padding the way the native utility does, one byte at a time
+    """
+    layout = bmp.layout
+    data = bmp.data
+    stream = bytearray()
+    for row in range(layout.num_rows):
+        position = layout.pixel_offset + row * layout.row_size + layout.row_size - layout.padding_size
+        for _ in range(layout.padding_size):
+            if len(stream) == length:
+                return bytes(stream)
+            stream.append(data[position])
+            position += 1
+    return bytes(stream)
+
+def best_of(repeat : int, func, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--height', type=int, default=2048, help='rows in each image')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement (best is reported)')
+    args = parser.parse_args()
+
+    print(f"24-bit images, {args.height} rows, the whole padding capacity is written and read back")
+    print(f"{'padding':>7} {'width':>6} {'bytes':>8} {'scalar write ms':>16} {'strided write ms':>17} {'scalar read ms':>15} {'strided read ms':>16}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for padding in (1, 2, 3):
+            width = width_for_padding(padding)
+            path = os.path.join(tmp, f'padding{padding}.bmp')
+            write_bmp(path, width, args.height)
+
+            bmp = BMP.from_file(path)
+            stream = os.urandom(bmp.layout.padding_capacity)
+
+            scalar_write_ms = best_of(args.repeat, scalar_write, bmp, stream)
+            strided_write_ms = best_of(args.repeat, bmp.write_stream, stream)
+            scalar_read_ms = best_of(args.repeat, scalar_read, bmp, len(stream))
+            strided_read_ms = best_of(args.repeat, bmp.read_stream, len(stream))
+            assert scalar_read(bmp, len(stream)) == bmp.read_stream(len(stream)) == stream
+
+            print(f"{padding:>7} {width:>6} {len(stream):>8} {scalar_write_ms:>16.3f} {strided_write_ms:>17.3f} "
+                  f"{scalar_read_ms:>15.3f} {strided_read_ms:>16.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+StegPass - Password Manager Application
+bench_splice_store.py - Compares storing a password in a copy of a BMP by copying then rewriting the copy (the
+utility's path) against streaming the copy once with the message spliced in (crash-safe, renamed over the
+destination), and against patching in place
+
+Usage: python tests/bench/bench_splice_store.py [--sizes-mb 1 32 256] [--repeat 5]
+"""
+
+# ? Standard Imports
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '../../app')))
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.core.bmp import BMP, run_hide_copy
+from app.core.obfuscator import hash_to_key
+
+BENCH_KEY = "CAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABE"
+BENCH_PASSWORD = "correct-horse-battery-staple!"
+
+def copy_then_rewrite(src : str, dest : str):
+    """ The store path before run_hide_copy: copy the file, read the whole copy, write the whole copy
+    """
+    shutil.copy2(src, dest)
+    bmp = BMP.from_file(dest)
+    bmp.hide_message(BENCH_PASSWORD, hash_to_key(BENCH_KEY))
+    bmp.save(dest, atomic=False)
+
+def measure(func, repeat : int) -> float:
+    """ Median milliseconds of func over repeat runs
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(runs)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-mb', type=int, nargs='+', default=[1, 32, 256], help='approximate image sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement (median is reported)')
+    args = parser.parse_args()
+
+    print(f"{'size MB':>8} {'copy+rewrite ms':>16} {'splice ms':>10} {'in place ms':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.sizes_mb:
+            # 3 bytes of padding per row
+            width = 1023
+            height = max(1, size_mb * (1 << 20) // (width * 3 + 3))
+            src = os.path.join(tmp, 'src.bmp')
+            dest = os.path.join(tmp, 'dest.bmp')
+            write_bmp(src, width, height, gap1=2)
+
+            old = measure(lambda: copy_then_rewrite(src, dest), args.repeat)
+            splice = measure(lambda: run_hide_copy(src, dest, BENCH_PASSWORD, BENCH_KEY), args.repeat)
+            in_place = measure(lambda: run_hide_copy(dest, dest, BENCH_PASSWORD, BENCH_KEY, in_place=True), args.repeat)
+            print(f"{os.path.getsize(src) / (1 << 20):>8.0f} {old:>16.2f} {splice:>10.2f} {in_place:>12.3f}")
+
+if __name__ == '__main__':
+    main()
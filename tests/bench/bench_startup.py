@@ -0,0 +1,67 @@
+"""
+StegPass - Password Manager Application
+bench_startup.py - Measures the import time of each main.py mode in a fresh interpreter, and which heavy modules it loads
+
+Usage: python tests/bench/bench_startup.py [--repeat 7]
+"""
+
+# ? Standard Imports
+import argparse
+import json
+import os
+import subprocess
+import statistics
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.abspath(os.path.join(BENCH_DIR, '../../app'))
+
+# The modules each mode of main.py imports (keep in sync with main.py)
+MODE_IMPORTS = {
+    'base':             ['app.utils.config', 'app.utils.utils'],
+    'gui':              ['app.gui'],
+    '--login':          ['app.login'],
+    '--password':       ['app.get_password', 'app.utils.clipboard_manager'],
+    '--password-batch': ['app.get_password'],
+    '--capacity':       ['app.get_password', 'app.utils.capacity'],
+    '--verify':         ['app.utils.verify'],
+}
+
+# Modules that should only be loaded by the modes that need them
+HEAVY_MODULES = ['tkinter', 'tkinterdnd2', 'PIL', 'numpy', 'pyperclip', 'win10toast']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({'ms': elapsed * 1000, 'heavy': [name for name in %r if name in sys.modules]}))
+""" % HEAVY_MODULES
+
+def measure(modules : list[str]) -> dict:
+    """ Imports the modules in a new interpreter (the base imports are included, like main.py)
+    """
+    result = subprocess.run([sys.executable, '-c', PROBE, *MODE_IMPORTS['base'], *modules], cwd=APP_DIR,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=7, help='interpreters started per mode (median is reported)')
+    args = parser.parse_args()
+
+    print(f"{'mode':<18} {'import ms':>10}  heavy modules loaded")
+    for mode, modules in MODE_IMPORTS.items():
+        runs = [measure(modules if mode != 'base' else []) for _ in range(args.repeat)]
+        if 'error' in runs[0]:
+            print(f"{mode:<18} {'-':>10}  unavailable: {runs[0]['error']}")
+            continue
+
+        median = statistics.median(run['ms'] for run in runs)
+        print(f"{mode:<18} {median:>10.1f}  {', '.join(runs[0]['heavy']) or '-'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+StegPass - Password Manager Application
+bench_user_store.py - Measures add/check/delete throughput of the user store backends
+
+Usage: python tests/bench/bench_user_store.py [--users 10000 100000] [--ops 1000] [--no-fsync]
+"""
+
+# ? Standard Imports
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '../../app')))
+
+# ? Project Imports
+from app.utils.user_store import USER_STORES
+
+def user_hash(i : int) -> str:
+    return hashlib.sha256(f'user{i}chizom'.encode()).hexdigest()
+
+def bench_store(store_type : str, users : int, ops : int, fsync : bool) -> dict:
+    """ Fills a fresh store with users, then times ops adds, checks and deletes against it
+    """
+    store_class, file_name = USER_STORES[store_type]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, file_name)
+        store = store_class(path, fsync=fsync)
+        store.set_many([(f'user{i}', user_hash(i)) for i in range(users)])
+        store.close()
+
+        # reopen, so the first operation pays for the (lazy) load
+        store = store_class(path, fsync=fsync)
+        result = {'store': store_type, 'users': users}
+
+        start = time.perf_counter()
+        store.contains('user0')
+        result['open_ms'] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for i in range(users, users + ops):
+            store.set(f'user{i}', user_hash(i))
+        result['add'] = ops / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(0, users + ops, max(1, (users + ops) // ops))[:ops]:
+            assert store.get(f'user{i}') == user_hash(i)
+        result['check'] = ops / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(users, users + ops):
+            assert store.delete(f'user{i}')
+        result['delete'] = ops / (time.perf_counter() - start)
+
+        store.close()
+        result['file_kb'] = os.path.getsize(path) // 1024
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[10000, 100000], help='users in the store before measuring')
+    parser.add_argument('--ops', type=int, default=1000, help='operations of each kind to time')
+    parser.add_argument('--json-ops', type=int, default=100, help='operations for the json store (every change rewrites the file)')
+    parser.add_argument('--stores', nargs='+', default=list(USER_STORES), choices=list(USER_STORES))
+    parser.add_argument('--no-fsync', action='store_true', help='do not flush every change to disk')
+    args = parser.parse_args()
+
+    print(f"fsync {'off' if args.no_fsync else 'on'}, throughput in operations per second")
+    print(f"{'store':<8} {'users':>8} {'open ms':>9} {'add/s':>10} {'check/s':>10} {'delete/s':>10} {'file KB':>9}")
+    for users in args.users:
+        for store_type in args.stores:
+            ops = args.json_ops if store_type == 'json' else args.ops
+            result = bench_store(store_type, users, ops, not args.no_fsync)
+            print(f"{result['store']:<8} {result['users']:>8} {result['open_ms']:>9.1f} {result['add']:>10.0f} "
+                  f"{result['check']:>10.0f} {result['delete']:>10.0f} {result['file_kb']:>9}")
+
+if __name__ == '__main__':
+    main()
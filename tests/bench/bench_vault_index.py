@@ -0,0 +1,67 @@
+"""
+StegPass - Password Manager Application
+bench_vault_index.py - Measures a cold build and an incremental refresh of a password folder index
+
+Usage: python tests/bench/bench_vault_index.py [--images 10000] [--changed 10]
+"""
+
+# ? Standard Imports
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '../../app')))
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.core.bmp import run_hide
+from app.utils.vault_index import VaultIndex
+
+BENCH_KEY = "CAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABECAFEBABE"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=10000, help='images in the folder')
+    parser.add_argument('--changed', type=int, default=10, help='images modified before the incremental refresh')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # every other image holds a password
+        template = os.path.join(tmp, 'template.bmp')
+        write_bmp(template, 65, 64)
+        stored = os.path.join(tmp, 'stored.bmp')
+        shutil.copyfile(template, stored)
+        run_hide(stored, 'hunter2', BENCH_KEY)
+
+        folder = os.path.join(tmp, 'vault')
+        os.makedirs(folder)
+        for i in range(args.images):
+            shutil.copyfile(stored if i % 2 == 0 else template, os.path.join(folder, f'{i:05}.bmp'))
+
+        start = time.perf_counter()
+        updated = VaultIndex(folder).refresh()
+        print(f"cold build:          {(time.perf_counter() - start) * 1000:9.1f} ms ({updated} files inspected)")
+
+        start = time.perf_counter()
+        updated = VaultIndex(folder).refresh()
+        print(f"refresh, no changes: {(time.perf_counter() - start) * 1000:9.1f} ms ({updated} files inspected)")
+
+        for i in range(args.changed):
+            shutil.copyfile(stored, os.path.join(folder, f'{i * 2 + 1:05}.bmp'))
+
+        index = VaultIndex(folder)
+        start = time.perf_counter()
+        updated = index.refresh()
+        print(f"refresh, {args.changed} changed: {(time.perf_counter() - start) * 1000:9.1f} ms ({updated} files inspected)")
+
+        start = time.perf_counter()
+        valid = index.list_images(valid_only=True)
+        print(f"list valid images:   {(time.perf_counter() - start) * 1000:9.1f} ms ({len(valid)} of {args.images})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+StegPass - Password Manager Application
+stub_utility.py - Stand-in for the bmp-steg utility built on the in-process codec, so the native backend path
+(UtilityFetcher.fetch_path, UtilityClient and its --serve workers) can be measured without the Windows binaries
+
+Usage: python tests/bench/stub_utility.py -s <image> <message> -h <hash>
+       python tests/bench/stub_utility.py -g <image> -h <hash>
+       python tests/bench/stub_utility.py --serve
+
+The app finds it through SP_UTILITY_DIR, see write_launcher.
+"""
+
+# ? Standard Imports
+import os
+import sys
+import stat
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '../../app')))
+
+# ? Project Imports
+from app.core.bmp import BMP, REGION_NONE, run_extract
+from app.core.fileio import file_lock
+from app.core.obfuscator import hash_to_key
+from app.utils.utils import is_valid_sha256_hash
+
+def write_launcher(folder : str, alias : str = 'bmp-steg') -> str:
+    """ Writes an executable named like the utility that runs this stub, for SP_UTILITY_DIR (POSIX only)
+
+    Args:
+        folder (str): The folder to write it in
+        alias (str): The name of the utility
+
+    Returns:
+        str: The path of the launcher
+    """
+    path = os.path.join(folder, alias)
+    with open(path, 'w') as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.abspath(__file__)}" "$@"\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+def run_hide(image_path : str, message : str, user_hash : str) -> tuple[str, int]:
+    """ Hides a message the way the utility does, reading the whole file and replacing it under the image's
+    lock (the codec's run_hide streams the copy once)
+    """
+    if not os.path.exists(image_path):
+        return f"BMP file does not exist: {image_path}", 3
+
+    try:
+        with file_lock(image_path):
+            bmp = BMP.from_file(image_path)
+            if bmp.hide_message(message, hash_to_key(user_hash)) == REGION_NONE:
+                return "Could not hide the message", -1
+            bmp.save(image_path)
+    except (OSError, ValueError) as e:
+        return str(e), -1
+
+    return "", 0
+
+def run_action(fields : list[str]) -> tuple[str, int]:
+    """ Runs one --serve request (see Serve in bmp-steg/src/Main.cpp)
+    """
+    is_hide = fields[0] == '-s' and len(fields) == 4
+    is_extract = fields[0] == '-g' and len(fields) == 3
+    if not is_hide and not is_extract:
+        return "Invalid request", 2
+
+    try:
+        image_path = bytes.fromhex(fields[1]).decode('utf-8')
+        message = bytes.fromhex(fields[3]).decode('utf-8') if is_hide else None
+    except ValueError:
+        return "Invalid target file or password", 2
+
+    if not is_valid_sha256_hash(fields[2]):
+        return "Invalid target file or hash", 2
+
+    # the utility reads the whole file, like the codec without mmap
+    return run_hide(image_path, message, fields[2]) if is_hide else run_extract(image_path, fields[2], use_mmap=False)
+
+def serve() -> int:
+    """ Answers framed requests on stdin until -q or end of input, like `bmp-steg --serve`
+    """
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    for line in stdin:
+        fields = line.decode('utf-8').rstrip('\r\n').split('\t')
+        if fields[0] == '-q':
+            break
+
+        output, exit_code = ("", 0) if fields == ['-p'] else run_action(fields)
+        data = output.encode('utf-8')
+        stdout.write(f"{exit_code} {len(data)}\n".encode('ascii') + data)
+        stdout.flush()
+
+    return 0
+
+def main() -> int:
+    args = sys.argv[1:]
+    if args == ['--serve']:
+        return serve()
+
+    if len(args) == 5 and args[0] == '-s' and args[3] == '-h':
+        output, exit_code = run_hide(args[1], args[2].replace('\\"', '"'), args[4])
+    elif len(args) == 4 and args[0] == '-g' and args[2] == '-h':
+        output, exit_code = run_extract(args[1], args[3], use_mmap=False)
+    else:
+        print("Invalid arguments", file=sys.stderr)
+        return 2
+
+    print(output, end='', file=sys.stdout if exit_code == 0 else sys.stderr)
+    return exit_code
+
+if __name__ == '__main__':
+    sys.exit(main())
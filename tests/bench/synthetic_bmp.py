@@ -0,0 +1,67 @@
+"""
+StegPass - Password Manager Application
+synthetic_bmp.py - Generates synthetic BMP files for the benchmarks
+"""
+
+# ? Standard Imports
+import os
+import struct
+
+FILE_HEADER_SIZE = 14
+INFO_HEADER_SIZE = 40
+
+# Pixel data is written in chunks so large images don't need to fit in memory
+WRITE_CHUNK_SIZE = 1 << 20
+
+def write_bmp(path : str, width : int, height : int, bit_count : int = 24, gap1 : int = 0, gap2 : int = 0) -> int:
+    """ Writes an uncompressed BMP file with pseudo-random pixel data
+
+    Args:
+        path (str): The path of the BMP file to create
+        width (int): The width of the image in pixels
+        height (int): The height of the image in pixels
+        bit_count (int): The bits per pixel (8, 16, 24 or 32)
+        gap1 (int): Extra bytes between the headers and the pixel array
+        gap2 (int): Extra bytes after the pixel array
+
+    Returns:
+        int: The size of the file in bytes
+    """
+    row_size = (width * bit_count + 31) // 32 * 4
+    size_image = row_size * height
+    off_bits = FILE_HEADER_SIZE + INFO_HEADER_SIZE + gap1
+    file_size = off_bits + size_image + gap2
+
+    header = struct.pack('<2si2hi', b'BM', file_size, 0, 0, off_bits)
+    header += struct.pack('<3i2h6i', INFO_HEADER_SIZE, width, height, 1, bit_count, 0, size_image, 2835, 2835, 0, 0)
+
+    pattern = os.urandom(WRITE_CHUNK_SIZE)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(bytes(gap1))
+
+        remaining = size_image
+        while remaining > 0:
+            count = min(remaining, WRITE_CHUNK_SIZE)
+            f.write(pattern[:count])
+            remaining -= count
+
+        f.write(bytes(gap2))
+
+    return file_size
+
+def width_for_padding(padding : int, bit_count : int = 24, base_width : int = 1024) -> int:
+    """ Finds the first width (at or above base_width) whose rows have the given number of padding bytes
+
+    Args:
+        padding (int): The number of padding bytes per row
+        bit_count (int): The bits per pixel
+        base_width (int): The width to start searching from
+
+    Returns:
+        int: The width in pixels
+    """
+    width = base_width
+    while (width * bit_count + 31) // 32 * 4 - width * bit_count // 8 != padding:
+        width += 1
+    return width
@@ -20,6 +20,28 @@ namespace {
 		}
 	}
 
+	TEST(SP_UTILS, TestWriteFileAtomic) {
+		const char* filename = "sp_utils_atomic_test.bin";
+		const std::string contents = "replaced contents";
+
+		std::ofstream(filename, std::ios::binary) << "old contents";
+
+		{
+			// the lock is on a sibling lock file, so it is held across the replace
+			sp::FileLock lock(filename);
+			EXPECT_TRUE(lock.IsLocked());
+			EXPECT_TRUE(sp::WriteFileAtomic(filename, reinterpret_cast<const uint8_t*>(contents.data()), contents.size()));
+		}
+
+		std::ifstream file(filename, std::ios::binary);
+		std::string written((std::istreambuf_iterator<char>(file)), std::istreambuf_iterator<char>());
+		file.close();
+		EXPECT_EQ(contents, written);
+
+		std::remove(filename);
+		std::remove(".sp_utils_atomic_test.bin.lock");
+	}
+
 	TEST(CLI_PARSER, TestFileExtensionSupport) {
 
 		const char* supported_types[] = {".BMP", ".JPG", ".PNG"};
@@ -221,4 +243,37 @@ namespace {
 		delete[] data;
 	}
 
+	TEST(SP_OBFUSCATOR, TestBBSKeyStream) {
+
+		// The Python port (app/core/obfuscator.py) must produce the same key stream
+		const char* hexString = "DEADBEEFDEADBEEFDEADBEEFDEADBEEFDEADBEEFDEADBEEFDEADBEEFDEADBEEF";
+		Hash256 encryption_key;
+		sp::StringToHash(encryption_key, hexString);
+
+		const uint8_t expected[] = {
+			0x73, 0x73, 0x73, 0x73, 0x15, 0x15, 0x15, 0x15, 0x9b, 0x9b, 0x9b, 0x9b, 0xa4, 0xa4, 0xa4, 0xa4,
+			0x47, 0x47, 0x47, 0x47, 0x27, 0x27, 0x27, 0x27, 0x82, 0x82, 0x82, 0x82, 0x49, 0x49, 0x49, 0x49
+		};
+		constexpr size_t length = sizeof(expected);
+
+		uint8_t key_stream[length];
+		sp::Obfuscator::BBS(encryption_key, length, key_stream);
+
+		for (size_t i = 0; i < length; i++) {
+			EXPECT_EQ(expected[i], key_stream[i]) << "at byte " << i;
+		}
+	}
+
+	TEST(SP_MESSAGE_BLOCK, TestContainerHeader) {
+
+		// Containers are written by the app (app/core/container.py), the utilities only recognize them
+		const uint8_t container[SP_HEADER_SIZE] = { 0x53, 0x50, SP_CONTAINER_VERSION_MAJOR, SP_CONTAINER_VERSION_MINOR, SP_CONTAINER_VERSION_PATCH, 0x00 };
+		const uint8_t message[SP_HEADER_SIZE] = { 0x53, 0x50, SP_VERSION_MAJOR, SP_VERSION_MINOR, SP_VERSION_PATCH, 0x01 };
+
+		EXPECT_TRUE(sp::MessageBlock::ValidateHeader(container));
+		EXPECT_TRUE(sp::MessageBlock::IsContainer(container));
+		EXPECT_TRUE(sp::MessageBlock::ValidateHeader(message));
+		EXPECT_FALSE(sp::MessageBlock::IsContainer(message));
+	}
+
 }
\ No newline at end of file
@@ -37,6 +37,10 @@
 * Headers
 ***************************************************************/
 #include <gtest/gtest.h>
+#include <cstdio>
+#include <fstream>
+#include <iterator>
 #include <core/CLIParser.hpp>
+#include <core/MessageBlock.hpp>
 #include <core/Obfuscator.hpp>
 #include <core/Utils.hpp>
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+StegPass - Password Manager Application
+conftest.py - Shared setup of the Python tests (the app and the synthetic BMP generator on the path)
+
+Usage: python -m pytest tests/python
+"""
+
+# ? Standard Imports
+import os
+import sys
+import hashlib
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(TESTS_DIR, '../../app')))
+sys.path.insert(0, os.path.abspath(os.path.join(TESTS_DIR, '../bench')))
+
+# The key of the native tests (see SP_OBFUSCATOR.TestBBSKeyStream in tests/core_unit_tests.cpp)
+NATIVE_TEST_HASH = "DEADBEEF" * 8
+
+@pytest.fixture
+def user_hash() -> str:
+    return hashlib.sha256(b'stegpass tests').hexdigest()
+
+@pytest.fixture(scope='session')
+def user_manager(tmp_path_factory):
+    # UserManager is a singleton that reads its environment once, so it is created once for the session
+    root_dir = tmp_path_factory.mktemp('root')
+    os.environ.update({'ROOT_DIR': str(root_dir), 'SP_BUILD': '0', 'SP_USER_STORE': 'json', 'SP_BACKEND': 'python',
+                       'SP_KDF_TARGET_MS': '1', 'SP_AGENT_SOCKET': str(root_dir / 'no-agent.sock')})
+
+    from app.utils.user_manager import UserManager
+    return UserManager()
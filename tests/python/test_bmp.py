@@ -0,0 +1,119 @@
+"""
+StegPass - Password Manager Application
+test_bmp.py - Hiding and extracting with the in-process BMP codec (app/core/bmp.py) across row padding and gap
+layouts
+"""
+
+# ? Standard Imports
+import os
+
+import pytest
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.core.bmp import BMP, BMPLayout, BMP_HEADER_SIZE, REGION_NONE, run_capacity, run_extract, run_hide
+from app.core.message_block import build_message_block, get_block_size
+from app.core.obfuscator import hash_to_key
+
+# Width and bits per pixel of layouts with 0 to 3 bytes of row padding (32 bits per pixel never pads)
+PADDING_LAYOUTS = [(width, bit_count) for bit_count in (16, 24, 32) for width in range(1, 9)]
+
+def longest_message(available : int) -> str:
+    """ The longest message whose block fits in the given number of bytes, None if not even one character fits
+    """
+    length = 0
+    while length < 255 and get_block_size('m' * (length + 1)) <= available:
+        length += 1
+    return 'p' * length if length else None
+
+def changed_offsets(before : bytes, after : bytes) -> set[int]:
+    return {i for i, (a, b) in enumerate(zip(before, after)) if a != b}
+
+def patched_offsets(path : str, message : str, user_hash : str) -> set[int]:
+    """ The offsets the message block may be written to, from the layout of the file
+    """
+    with open(path, 'rb') as f:
+        layout = BMPLayout(f.read(BMP_HEADER_SIZE), os.fstat(f.fileno()).st_size)
+    patches = layout.stream_patches(build_message_block(message, hash_to_key(user_hash)))
+    return {offset + i for offset, data in patches for i in range(len(data))}
+
+@pytest.mark.parametrize('width, bit_count', PADDING_LAYOUTS)
+@pytest.mark.parametrize('gap2', [0, 96])
+def test_round_trip(tmp_path, user_hash, width, bit_count, gap2):
+    image_path = str(tmp_path / 'image.bmp')
+    write_bmp(image_path, width, 7, bit_count, gap1=2, gap2=gap2)
+    original = open(image_path, 'rb').read()
+
+    available = run_capacity(image_path)
+    assert not available['gap1_overlaps_pixels']
+
+    # a short message, and the longest one that fits (spilling from the padding into the gaps)
+    for message in filter(None, ('pw', longest_message(available['total']))):
+        if get_block_size(message) > available['total']:
+            continue
+
+        assert run_hide(image_path, message, user_hash) == ("", 0)
+        assert run_extract(image_path, user_hash, use_mmap=True) == (message, 0)
+        assert run_extract(image_path, user_hash, use_mmap=False) == (message, 0)
+
+        # only the bytes holding the message changed, and the file did not grow
+        hidden = open(image_path, 'rb').read()
+        assert len(hidden) == len(original)
+        assert changed_offsets(original, hidden) <= patched_offsets(image_path, message, user_hash)
+
+def test_wrong_key(tmp_path, user_hash):
+    image_path = str(tmp_path / 'image.bmp')
+    write_bmp(image_path, 5, 16, 24, gap1=2)
+    assert run_hide(image_path, 'secret', user_hash) == ("", 0)
+    assert run_extract(image_path, 'ab' * 32)[1] == 4
+
+@pytest.mark.parametrize('width', [9, 10, 11])
+def test_gap1_overlapping_pixels(tmp_path, user_hash, width):
+    # bfOffBits is 54, below the native Gap1 offset (56), so Gap1 overlaps the pixel array and its padding
+    image_path = str(tmp_path / 'image.bmp')
+    write_bmp(image_path, width, 4, 24, gap1=0)
+
+    available = run_capacity(image_path)
+    assert available['gap1_overlaps_pixels']
+    assert available['gap1'] == 0 and available['gap2'] == 0
+    assert available['total'] == available['padding'] > 0
+
+    # what fits in the padding round trips, a longer message would overwrite its own start (see BMPLayout.capacity)
+    message = longest_message(available['total'])
+    if message is not None:
+        assert run_hide(image_path, message, user_hash) == ("", 0)
+        assert run_extract(image_path, user_hash) == (message, 0)
+
+def test_gap1_overlapping_pixels_without_padding(tmp_path, user_hash):
+    # no padding: the message goes to Gap1 over the first pixels, which can still be read back
+    image_path = str(tmp_path / 'image.bmp')
+    write_bmp(image_path, 12, 4, 24, gap1=0)
+
+    available = run_capacity(image_path)
+    assert available['gap1_overlaps_pixels'] and available['padding'] == 0 and available['gap1'] > 0
+
+    message = longest_message(available['total'])
+    assert run_hide(image_path, message, user_hash) == ("", 0)
+    assert run_extract(image_path, user_hash) == (message, 0)
+
+def test_grows_when_full(tmp_path, user_hash):
+    # no padding and no gaps, the message is appended to Gap2 and the file grows
+    image_path = str(tmp_path / 'image.bmp')
+    write_bmp(image_path, 4, 4, 24, gap1=2)
+    size = os.path.getsize(image_path)
+
+    assert run_hide(image_path, 'a longer password', user_hash) == ("", 0)
+    assert os.path.getsize(image_path) > size
+    assert run_extract(image_path, user_hash) == ('a longer password', 0)
+
+def test_full_rewrite_matches_patch(tmp_path, user_hash):
+    # the full rewrite (the native utility's path) and run_hide give the same file
+    image_path, rewritten_path = str(tmp_path / 'image.bmp'), str(tmp_path / 'rewritten.bmp')
+    for width in range(1, 9):
+        write_bmp(image_path, width, 16, 24, gap1=2, gap2=32)
+        bmp = BMP.from_file(image_path)
+        assert bmp.hide_message('a password', hash_to_key(user_hash)) != REGION_NONE
+        bmp.save(rewritten_path)
+
+        assert run_hide(image_path, 'a password', user_hash) == ("", 0)
+        assert open(image_path, 'rb').read() == open(rewritten_path, 'rb').read()
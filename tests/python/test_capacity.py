@@ -0,0 +1,92 @@
+"""
+StegPass - Password Manager Application
+test_capacity.py - The capacity planner (app/utils/capacity.py) and the store paths that rely on it
+"""
+
+# ? Standard Imports
+import os
+
+import pytest
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.core.bmp import run_capacity, run_extract, run_hide
+from app.core.message_block import get_block_size
+from app.utils.capacity import capacity, capacity_many, check_store, fits, select_images
+
+def test_capacity_matches_hiding(tmp_path, user_hash):
+    # a message of exactly the capacity is hidden without growing the file, one byte more grows it
+    image_path = str(tmp_path / 'image.bmp')
+    for width in (5, 6, 7):
+        write_bmp(image_path, width, 32, 24, gap1=2, gap2=16)
+        available = capacity(image_path)
+        assert available == run_capacity(image_path)
+
+        length = max(length for length in range(1, 256) if get_block_size('p' * length) <= available['total'])
+        assert fits(image_path, 'p' * length) and not fits(image_path, 'p' * (length + 1))
+
+        size = os.path.getsize(image_path)
+        assert run_hide(image_path, 'p' * length, user_hash) == ("", 0)
+        assert os.path.getsize(image_path) == size
+        assert run_extract(image_path, user_hash) == ('p' * length, 0)
+
+def test_unreadable_images(tmp_path):
+    not_an_image = str(tmp_path / 'notes.bmp')
+    with open(not_an_image, 'wb') as f:
+        f.write(b'not a bitmap')
+
+    assert capacity(not_an_image) is None
+    assert not fits(not_an_image, 'pw')
+    assert not fits(str(tmp_path / 'missing.bmp'), 'pw')
+
+def test_select_images(tmp_path):
+    paths = []
+    for i, gap2 in enumerate((0, 64, 16, 200)):
+        paths.append(str(tmp_path / f'image{i}.bmp'))
+        write_bmp(paths[-1], 4, 4, 24, gap1=2, gap2=gap2)
+
+    results = list(capacity_many(paths + [str(tmp_path / 'missing.bmp')], max_workers=2))
+    assert [path for path, _, _ in results] == paths + [str(tmp_path / 'missing.bmp')]
+    assert results[-1][1] is None and results[-1][2]
+
+    # tightest fit first, the images that would have to grow are left out
+    selected = select_images(paths, 40)
+    assert [path for path, _ in selected] == [paths[1], paths[3]]
+
+def test_gap1_overlap(tmp_path):
+    # bfOffBits is 54: a message longer than the padding would overwrite its own start
+    image_path = str(tmp_path / 'image.bmp')
+    write_bmp(image_path, 9, 16, 24, gap1=0)
+
+    assert not fits(image_path, 'x' * 40)
+    assert 'too long' in check_store(image_path, 'x' * 40)
+    assert fits(image_path, 'x') and check_store(image_path, 'x') == ""
+
+    # an image whose Gap1 is separate just grows
+    write_bmp(image_path, 4, 4, 24, gap1=2)
+    assert not fits(image_path, 'x' * 40) and check_store(image_path, 'x' * 40) == ""
+
+@pytest.mark.parametrize('backend', ['python', 'native'])
+def test_store_rejects_overlapping_overflow(tmp_path, monkeypatch, user_hash, backend):
+    # storing must fail instead of reporting success for a password that could not be read back
+    from app.utils.password_creator import PasswordCreator
+
+    monkeypatch.setenv('SP_BACKEND', backend)
+    src = str(tmp_path / 'source.bmp')
+    write_bmp(src, 9, 4, 24, gap1=0)
+    original = open(src, 'rb').read()
+
+    exit_code, output = PasswordCreator().store_password_with_hash('x' * 40, src, str(tmp_path / 'dest.bmp'), user_hash)
+    assert exit_code == 6 and 'too long' in output
+    assert not os.path.exists(tmp_path / 'dest.bmp')
+    assert open(src, 'rb').read() == original
+
+def test_store_grows_when_gap1_is_separate(tmp_path, monkeypatch, user_hash):
+    from app.utils.password_creator import PasswordCreator
+
+    monkeypatch.setenv('SP_BACKEND', 'python')
+    src, dest = str(tmp_path / 'source.bmp'), str(tmp_path / 'dest.bmp')
+    write_bmp(src, 4, 4, 24, gap1=2)
+
+    assert PasswordCreator().store_password_with_hash('x' * 40, src, dest, user_hash) == (0, dest)
+    assert run_extract(dest, user_hash) == ('x' * 40, 0)
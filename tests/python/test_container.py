@@ -0,0 +1,114 @@
+"""
+StegPass - Password Manager Application
+test_container.py - The varint of the container header (app/core/container.py), and containers of records hidden
+in BMP files (run_hide_records, run_extract_record and run_rekey in app/core/bmp.py)
+"""
+
+# ? Standard Imports
+import pytest
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.core.bmp import BMP, run_extract, run_extract_record, run_hide, run_hide_records, run_rekey
+from app.core.container import (VARINT_MAX_SIZE, VARINT_MAX_VALUE, decode_varint, encode_varint, parse_record_table,
+                                read_every_record)
+
+RECORDS = {
+    'github': {'service': 'github.com', 'username': 'alice', 'password': 'hunter2', 'notes': ''},
+    'mail': {'service': 'mail.example.com', 'username': 'alice@example.com', 'password': 'pa"ss\u00e9'},
+    'bank': {'service': 'bank', 'username': '12345678', 'password': 'correct horse battery staple'},
+}
+OTHER_HASH = 'ab' * 32
+
+@pytest.fixture
+def container_path(tmp_path, user_hash) -> str:
+    image_path = str(tmp_path / 'vault.bmp')
+    write_bmp(image_path, 5, 16, 24, gap1=2, gap2=256)
+    assert run_hide_records(image_path, RECORDS, user_hash) == ("", 0)
+    return image_path
+
+def test_varint_round_trip():
+    for value in (0, 1, 127, 128, 300, 16383, 16384, (1 << 28) - 1, 1 << 28, VARINT_MAX_VALUE):
+        encoded = b'\x01' + encode_varint(value) + b'\x02'
+        assert len(encoded) - 2 <= VARINT_MAX_SIZE
+        assert decode_varint(encoded, 1) == (value, len(encoded) - 1)
+
+def test_varint_range():
+    with pytest.raises(ValueError):
+        encode_varint(-1)
+    with pytest.raises(ValueError):
+        encode_varint(VARINT_MAX_VALUE + 1)
+
+    # 5 bytes can encode up to 2^35 - 1, anything above 2^32 - 1 is rejected
+    assert decode_varint(b'\x80\x80\x80\x80\x10', 0) == (None, 0)
+    assert decode_varint(b'\xff\xff\xff\xff\x7f', 0) == (None, 0)
+    assert decode_varint(b'\xff\xff\xff\xff\x0f', 0) == (VARINT_MAX_VALUE, 5)
+
+def test_varint_incomplete_or_too_long():
+    assert decode_varint(b'\x80\x80', 0) == (None, 0)
+    assert decode_varint(b'\x80\x80\x80\x80\x80\x01', 0) == (None, 0)
+
+def test_records_round_trip(container_path, user_hash):
+    assert run_extract_record(container_path, None, user_hash) == (RECORDS, 0)
+    for record_key, fields in RECORDS.items():
+        assert run_extract_record(container_path, record_key, user_hash) == (fields, 0)
+
+    # a container is not a message
+    assert run_extract(container_path, user_hash)[1] != 0
+
+    # hiding again replaces the container
+    assert run_hide_records(container_path, {'github': RECORDS['github']}, user_hash) == ("", 0)
+    assert run_extract_record(container_path, None, user_hash) == ({'github': RECORDS['github']}, 0)
+
+def test_wrong_key_and_missing_record(container_path, user_hash, tmp_path):
+    assert run_extract_record(container_path, 'github', OTHER_HASH) == (None, 4)
+    assert run_extract_record(container_path, None, OTHER_HASH) == (None, 4)
+    assert run_extract_record(container_path, 'gitlab', user_hash) == (None, 4)
+
+    # an image holding a single message has no records
+    image_path = str(tmp_path / 'message.bmp')
+    write_bmp(image_path, 5, 16, 24, gap1=2)
+    assert run_hide(image_path, 'secret', user_hash) == ("", 0)
+    assert run_extract_record(image_path, 'github', user_hash) == (None, 4)
+    assert run_extract_record(str(tmp_path / 'missing.bmp'), 'github', user_hash)[1] == 3
+
+def test_rekey(container_path, user_hash):
+    size = len(open(container_path, 'rb').read())
+    assert run_rekey(container_path, user_hash, OTHER_HASH) == ("", 0)
+
+    assert run_extract_record(container_path, None, OTHER_HASH) == (RECORDS, 0)
+    assert run_extract_record(container_path, 'mail', user_hash) == (None, 4)
+    assert len(open(container_path, 'rb').read()) == size
+
+    # the old key no longer decrypts it, the file is left untouched
+    original = open(container_path, 'rb').read()
+    assert run_rekey(container_path, user_hash, OTHER_HASH) == ("", 4)
+    assert open(container_path, 'rb').read() == original
+
+def test_corrupt_record_table(container_path, user_hash):
+    bmp = BMP.from_file(container_path)
+    container = bytearray(bmp.read_container())
+    table, _ = parse_record_table(bytes(container))
+    assert len(table) == len(RECORDS)
+
+    # the last record ends where the container ends, one byte more is past the end
+    _, position = decode_varint(container, 5)
+    _, position = decode_varint(container, position)
+    for _ in range(len(table) - 1):
+        _, position = decode_varint(container, position + 8)
+        _, position = decode_varint(container, position)
+    _, length_position = decode_varint(container, position + 8)
+    assert decode_varint(container, length_position)[0] == table[-1][2] < 127
+    container[length_position] += 1
+    bmp.write_stream(bytes(container))
+    bmp.save(container_path)
+
+    assert parse_record_table(bytes(container)) == ([], 0)
+    assert read_every_record(bytes(container), bytes(32)) is None
+    assert run_extract_record(container_path, 'github', user_hash) == (None, 4)
+    assert run_extract_record(container_path, None, user_hash) == (None, 4)
+
+    # rewriting it with a new key would lose the records
+    original = open(container_path, 'rb').read()
+    assert run_rekey(container_path, user_hash, OTHER_HASH) == ("", 4)
+    assert open(container_path, 'rb').read() == original
@@ -0,0 +1,32 @@
+"""
+StegPass - Password Manager Application
+test_fileio.py - The lock files of file_lock (app/core/fileio.py), and the folder listings that must skip them
+"""
+
+# ? Standard Imports
+import os
+import shutil
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.core.fileio import file_lock, is_lock_file, lock_path
+from app.get_password import collect_image_paths
+from app.utils.vault_index import VaultIndex
+
+def test_lock_files_are_not_listed(tmp_path):
+    image_path = str(tmp_path / 'site.bmp')
+    write_bmp(image_path, 5, 16, 24, gap1=2)
+    with file_lock(image_path):
+        pass
+    assert is_lock_file(lock_path(image_path)) and os.path.exists(lock_path(image_path))
+    assert not is_lock_file(image_path)
+
+    # even a lock file that happens to hold a bitmap (e.g. written by an older version) is skipped
+    shutil.copyfile(image_path, str(tmp_path / '.other.bmp.lock'))
+
+    assert collect_image_paths(str(tmp_path)) == [image_path]
+    assert collect_image_paths(str(tmp_path / '*')) == [image_path]
+
+    index = VaultIndex(str(tmp_path))
+    index.refresh()
+    assert index.list_images() == [image_path]
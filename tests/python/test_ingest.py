@@ -0,0 +1,136 @@
+"""
+StegPass - Password Manager Application
+test_ingest.py - Ingest jobs (app/utils/ingest.py): validation, storing into the user's password folder, and the
+backpressure of the spool watcher
+"""
+
+# ? Standard Imports
+import io
+import os
+import json
+import time
+import threading
+
+import pytest
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.utils import ingest
+from app.utils.ingest import INGEST_QUEUE_PER_WORKER, IngestError, IngestService, check_job, ingest_stream, run_job
+
+USERNAME = 'grace'
+MASTER_PASSWORD = 'correct horse'
+
+@pytest.fixture
+def user_hash(user_manager):
+    # an unlocked user (see store_password_headless)
+    from app.utils.session_cache import SessionCache
+
+    if not user_manager.check_user_exists(USERNAME):
+        assert user_manager.add_user(USERNAME, MASTER_PASSWORD)
+    user_hash = user_manager.unlock(USERNAME, MASTER_PASSWORD)
+    SessionCache().put(USERNAME, user_hash)
+    yield user_hash
+    SessionCache().evict(USERNAME)
+
+def drop_job(spool, name : str, job : dict) -> str:
+    """ Writes an image and its sidecar into the spool, returns the path of the sidecar
+    """
+    write_bmp(os.path.join(str(spool), name), 5, 16, 24, gap1=2)
+    sidecar = os.path.join(str(spool), name + '.json')
+    with open(sidecar, 'w') as f:
+        json.dump(job, f)
+    return sidecar
+
+def test_check_job():
+    assert check_job({'user': 'grace', 'password': 'pw'}, 'site.bmp') == \
+        {'user': 'grace', 'password': 'pw', 'name': 'site.bmp', 'replace': False}
+    assert check_job({'user': 'grace', 'password': 'pw', 'name': 'other.bmp', 'replace': True}, 'site.bmp')['replace']
+
+    for job in (['grace'], {'password': 'pw'}, {'user': 'grace', 'password': ''}, {'user': 'grace', 'password': 1},
+                {'user': 'grace', 'password': 'pw', 'name': '../site.bmp'}, {'user': 'grace', 'password': 'pw', 'name': '..'}):
+        with pytest.raises(IngestError) as e:
+            check_job(job, 'site.bmp')
+        assert e.value.exit_code == 2
+
+def test_run_job(tmp_path, user_manager, user_hash):
+    from app.core.bmp import run_extract
+
+    folder = user_manager.get_password_folder_path(USERNAME)
+    outcome = run_job(drop_job(tmp_path, 'site.bmp', {'user': 'Grace', 'password': 'hunter2'}))
+    assert outcome['exit_code'] == 0 and outcome['path'] == os.path.join(folder, 'site.bmp')
+    assert run_extract(outcome['path'], user_hash) == ('hunter2', 0)
+    assert 'hunter2' not in json.dumps(outcome)
+
+    # an existing image is only replaced if the job says so
+    sidecar = drop_job(tmp_path, 'site.bmp', {'user': USERNAME, 'password': 'new'})
+    outcome = run_job(sidecar)
+    assert outcome['exit_code'] == 2 and 'already exists' in outcome['error']
+    sidecar = drop_job(tmp_path, 'site.bmp', {'user': USERNAME, 'password': 'new', 'replace': True})
+    assert run_job(sidecar)['exit_code'] == 0
+    assert run_extract(os.path.join(folder, 'site.bmp'), user_hash) == ('new', 0)
+
+def test_failed_jobs(tmp_path, user_manager, user_hash):
+    from app.utils.session_cache import SessionCache
+
+    assert run_job(drop_job(tmp_path, 'a.bmp', {'user': 'nobody', 'password': 'pw'}))['exit_code'] == 2
+    assert run_job(drop_job(tmp_path, 'b.bmp', {'user': USERNAME, 'password': 'pw', 'name': 'b.txt'}))['exit_code'] == 2
+
+    sidecar = drop_job(tmp_path, 'c.bmp', {})
+    with open(sidecar, 'w') as f:
+        f.write('not json')
+    assert run_job(sidecar)['exit_code'] == 2
+
+    # the user is not unlocked
+    SessionCache().evict(USERNAME)
+    assert run_job(drop_job(tmp_path, 'd.bmp', {'user': USERNAME, 'password': 'pw'}))['exit_code'] == 8
+
+def test_ingest_stream(tmp_path, user_manager, user_hash):
+    lines = []
+    for name in ('e.bmp', 'f.bmp'):
+        write_bmp(str(tmp_path / name), 5, 16, 24, gap1=2)
+        lines.append(json.dumps({'image': str(tmp_path / name), 'user': USERNAME, 'password': name}))
+    lines += ['', 'not json', json.dumps({'user': USERNAME, 'password': 'pw'})]
+
+    outcomes = []
+    assert ingest_stream(io.StringIO('\n'.join(lines)), workers=2, report=outcomes.append) == 2
+    assert sorted(outcome['exit_code'] for outcome in outcomes) == [0, 0, 2, 2]
+
+    # the images are left where they are
+    assert os.path.exists(tmp_path / 'e.bmp') and os.path.exists(tmp_path / 'f.bmp')
+
+def test_backpressure(tmp_path, monkeypatch):
+    # jobs block until released, one worker: one running, INGEST_QUEUE_PER_WORKER queued, and the watcher waits
+    # for a slot with the next one, the others stay in the spool
+    release, started = threading.Event(), []
+    def blocking_job(sidecar):
+        started.append(sidecar)
+        release.wait(10)
+        return {'job': os.path.basename(sidecar), 'exit_code': 0, 'error': ""}
+    monkeypatch.setattr(ingest, 'run_job', blocking_job)
+
+    job_count = 6
+    for i in range(job_count):
+        drop_job(tmp_path, f'site{i}.bmp', {'user': USERNAME, 'password': 'pw'})
+
+    outcomes = []
+    service = IngestService(str(tmp_path), workers=1, report=outcomes.append)
+    thread = threading.Thread(target=service.serve_forever, daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 5
+    held = 1 + INGEST_QUEUE_PER_WORKER
+    while len(service.pending) < held + 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)
+    assert len(started) == 1 and len(service.pending) == held + 1 < job_count
+
+    release.set()
+    deadline = time.monotonic() + 10
+    while len(outcomes) < job_count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    service.stop()
+    thread.join(timeout=5)
+
+    assert len(outcomes) == job_count and not thread.is_alive()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,88 @@
+"""
+StegPass - Password Manager Application
+test_kdf.py - The master password verifiers and image keys (app/utils/kdf.py), and the migration of users with
+legacy verifiers on their next login (UserManager.unlock)
+"""
+
+# ? Standard Imports
+import os
+
+import pytest
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.utils.kdf import (KDF_NAME, LEGACY_PEPPER, SCRYPT_MIN_LOG_N, check_verifier, derive_user_hash, make_verifier,
+                           needs_upgrade, scrypt, unlock)
+from app.utils.utils import sha256_hash
+
+MASTER_PASSWORD = 'correct horse'
+
+def legacy_verifier(master_password : str) -> str:
+    return sha256_hash(master_password + LEGACY_PEPPER)
+
+def version_1_verifier(master_password : str) -> dict:
+    salt = os.urandom(16)
+    return {'kdf': KDF_NAME, 'version': 1, 'salt': salt.hex(), 'log_n': SCRYPT_MIN_LOG_N, 'r': 8, 'p': 1,
+            'hash': scrypt(master_password, salt, SCRYPT_MIN_LOG_N).hex()}
+
+def test_verifier():
+    verifier = make_verifier(MASTER_PASSWORD, SCRYPT_MIN_LOG_N)
+    assert check_verifier(verifier, MASTER_PASSWORD) and not check_verifier(verifier, 'wrong')
+    assert not needs_upgrade(verifier)
+
+    # the key is salted, and is not part of the record
+    user_hash = unlock(verifier, MASTER_PASSWORD)
+    assert len(user_hash) == 64 and user_hash != sha256_hash(MASTER_PASSWORD)
+    assert user_hash not in verifier.values()
+    assert unlock(make_verifier(MASTER_PASSWORD, SCRYPT_MIN_LOG_N), MASTER_PASSWORD) != user_hash
+    assert unlock(verifier, 'wrong') is None
+
+    assert derive_user_hash(MASTER_PASSWORD, verifier) == user_hash
+    with pytest.raises(ValueError):
+        derive_user_hash('wrong', verifier)
+
+@pytest.mark.parametrize('make_old_verifier', [legacy_verifier, version_1_verifier])
+def test_old_verifiers(make_old_verifier):
+    # their images are still encrypted with sha256(master), until the user is migrated
+    verifier = make_old_verifier(MASTER_PASSWORD)
+    assert unlock(verifier, MASTER_PASSWORD) == sha256_hash(MASTER_PASSWORD)
+    assert unlock(verifier, 'wrong') is None
+    assert needs_upgrade(verifier)
+
+def test_unknown_verifiers():
+    verifier = make_verifier(MASTER_PASSWORD, SCRYPT_MIN_LOG_N)
+    assert not check_verifier(dict(verifier, version=3), MASTER_PASSWORD)
+    assert not check_verifier(dict(verifier, salt='not hex'), MASTER_PASSWORD)
+    assert not check_verifier(None, MASTER_PASSWORD)
+    assert needs_upgrade(dict(verifier, log_n=SCRYPT_MIN_LOG_N - 1))
+
+@pytest.mark.parametrize('make_old_verifier', [legacy_verifier, version_1_verifier])
+def test_migrated_on_unlock(user_manager, make_old_verifier):
+    from app.core.bmp import run_extract, run_hide
+    from app.utils.rekey import REKEY_JOURNAL_NAME
+
+    username = f'legacy_{make_old_verifier.__name__}'
+    user_manager.user_store.set(username, make_old_verifier(MASTER_PASSWORD))
+    folder = user_manager.get_password_folder_path(username)
+    old_user_hash = sha256_hash(MASTER_PASSWORD)
+
+    image_paths = [os.path.join(folder, f'site{i}.bmp') for i in range(3)]
+    for i, image_path in enumerate(image_paths):
+        write_bmp(image_path, 5 + i, 16, 24, gap1=2)
+        assert run_hide(image_path, f'password {i}', old_user_hash) == ("", 0)
+
+    # a wrong password changes nothing
+    assert user_manager.unlock(username, 'wrong') is None
+    assert needs_upgrade(user_manager.user_store.get(username))
+
+    user_hash = user_manager.unlock(username, MASTER_PASSWORD)
+    verifier = user_manager.user_store.get(username)
+    assert not needs_upgrade(verifier) and user_hash == unlock(verifier, MASTER_PASSWORD) != old_user_hash
+    assert not os.path.exists(os.path.join(folder, REKEY_JOURNAL_NAME))
+    for i, image_path in enumerate(image_paths):
+        assert run_extract(image_path, user_hash) == (f'password {i}', 0)
+        assert run_extract(image_path, old_user_hash)[1] == 4
+
+    # once migrated, the next login only checks the password
+    assert user_manager.unlock(username, MASTER_PASSWORD) == user_hash
+    assert user_manager.user_store.get(username) == verifier
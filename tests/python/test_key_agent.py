@@ -0,0 +1,127 @@
+"""
+StegPass - Password Manager Application
+test_key_agent.py - The key agent protocol (app/utils/key_agent.py), served on a thread over a socket in a
+temporary folder
+"""
+
+# ? Standard Imports
+import os
+import time
+import socket
+import threading
+
+import pytest
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.utils.key_agent import AgentClient, KeyAgent, agent_supported
+from app.utils.session_cache import SessionCache
+from app.utils.singleton import TSSingleton
+
+pytestmark = pytest.mark.skipif(not agent_supported(), reason="the key agent needs Unix domain sockets")
+
+OTHER_HASH = 'ab' * 32
+
+@pytest.fixture
+def client(tmp_path, user_manager):
+    # the agent reads the user store of the tests' UserManager (see conftest.py), and keeps the keys in a
+    # SessionCache of its own rather than the one the other tests filled
+    TSSingleton._instances.pop(SessionCache, None)
+    socket_path = str(tmp_path / 'agent' / 'agent.sock')
+    agent = KeyAgent(socket_path, ttl=60)
+    thread = threading.Thread(target=agent.serve_forever, daemon=True)
+    thread.start()
+
+    client = AgentClient(socket_path)
+    deadline = time.monotonic() + 5
+    while client.request('ping') is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert client.request('ping') == {'ok': True}
+    yield client
+
+    client.request('stop')
+    thread.join(timeout=5)
+    TSSingleton._instances.pop(SessionCache, None)
+    assert not thread.is_alive() and not os.path.exists(socket_path)
+
+def test_add_get_lock(client, user_hash):
+    assert client.get_hash('alice') is None
+    assert client.request('add', user='alice', hash='not a hash')['ok'] is False
+
+    assert client.add('Alice', user_hash) and client.add('bob', OTHER_HASH)
+    assert client.get_hash('alice') == user_hash and client.get_hash('bob') == OTHER_HASH
+    assert sorted(client.request('list')['users']) == ['alice', 'bob']
+
+    assert client.lock('alice')['ok']
+    assert client.get_hash('alice') is None and client.get_hash('bob') == OTHER_HASH
+    assert client.lock()['ok']
+    assert client.request('list')['users'] == {}
+
+def test_ttl(client, user_hash):
+    assert client.add('alice', user_hash, ttl=0.1)
+    assert 0 < client.request('list')['users']['alice'] <= 0.1
+
+    time.sleep(0.2)
+    assert client.get_hash('alice') is None
+
+def test_unlock_and_extract(client, user_manager, tmp_path):
+    from app.core.bmp import run_hide
+
+    assert user_manager.add_user('erin', 'correct horse')
+    user_hash = user_manager.unlock('erin', 'correct horse')
+    image_path = str(tmp_path / 'site.bmp')
+    write_bmp(image_path, 5, 16, 24, gap1=2)
+    assert run_hide(image_path, 'secret', user_hash) == ("", 0)
+
+    # the key never leaves the agent for extract
+    assert client.extract('erin', image_path) is None
+    response = client.unlock('erin', 'wrong')
+    assert response['ok'] is False and 'Incorrect' in response['error']
+    assert client.unlock('erin', 'correct horse')['ok']
+    assert client.extract('erin', image_path) == (0, 'secret')
+    assert client.get_hash('erin') == user_hash
+
+    assert client.extract('erin', str(tmp_path / 'missing.bmp'))[0] != 0
+    assert client.unlock('nobody', 'correct horse')['ok'] is False
+
+def test_bad_requests(client):
+    assert client.request('nope') == {'ok': False, 'error': "Unknown operation: nope"}
+    assert client.request('get')['ok'] is False
+
+    # a line that is not JSON gets an error, and the connection keeps serving
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(5)
+        connection.connect(client.socket_path)
+        connection.sendall(b'not json\n{"op": "ping"}\n')
+        with connection.makefile('rb') as reader:
+            assert b'Bad request' in reader.readline()
+            assert reader.readline() == b'{"ok": true}\n'
+
+def test_single_agent(client):
+    # a live agent is not replaced
+    with pytest.raises(OSError):
+        KeyAgent(client.socket_path).serve_forever()
+    assert client.request('ping') == {'ok': True}
+
+def test_stale_socket(tmp_path, user_manager):
+    # a socket left behind by an agent that crashed is replaced
+    socket_path = str(tmp_path / 'agent.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+
+    thread = threading.Thread(target=KeyAgent(socket_path).serve_forever, daemon=True)
+    thread.start()
+    client = AgentClient(socket_path)
+    deadline = time.monotonic() + 5
+    while client.request('ping') is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert client.request('stop') == {'ok': True}
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+def test_no_agent(tmp_path):
+    client = AgentClient(str(tmp_path / 'missing.sock'))
+    assert client.request('ping') is None and client.get_hash('alice') is None
+    assert client.extract('alice', 'site.bmp') is None
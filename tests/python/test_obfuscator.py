@@ -0,0 +1,55 @@
+"""
+StegPass - Password Manager Application
+test_obfuscator.py - The Python BBS key stream against the native one (see utility/core/src/Obfuscator.cpp)
+"""
+
+# ? Standard Imports
+import os
+
+# ? Project Imports
+from conftest import NATIVE_TEST_HASH
+from app.core.obfuscator import BBS_MODULUS, bbs, bbs_many, crypt, hash_to_key, key_stream
+
+# sp::Obfuscator::BBS of NATIVE_TEST_HASH (the same bytes are checked in SP_OBFUSCATOR.TestBBSKeyStream)
+NATIVE_KEY_STREAM = bytes([
+    0x73, 0x73, 0x73, 0x73, 0x15, 0x15, 0x15, 0x15, 0x9b, 0x9b, 0x9b, 0x9b, 0xa4, 0xa4, 0xa4, 0xa4,
+    0x47, 0x47, 0x47, 0x47, 0x27, 0x27, 0x27, 0x27, 0x82, 0x82, 0x82, 0x82, 0x49, 0x49, 0x49, 0x49,
+])
+
+def reference_bbs(seed : bytes, length : int) -> bytes:
+    """ The native loop, one byte at a time: byte i squares lane i % 4 (uint64, wrapping) modulo BBS_MODULUS
+    """
+    lanes = [int.from_bytes(seed[i:i + 8], 'little') for i in range(0, 32, 8)]
+    stream = bytearray()
+    for i in range(length):
+        lane = i % 4
+        lanes[lane] = (lanes[lane] * lanes[lane] % (1 << 64)) % BBS_MODULUS
+        stream.append(lanes[lane] & 0xFF)
+    return bytes(stream)
+
+def test_key_stream_matches_native():
+    stream = key_stream(hash_to_key(NATIVE_TEST_HASH), len(NATIVE_KEY_STREAM))
+    assert stream.tobytes() == NATIVE_KEY_STREAM
+
+def test_bbs_matches_reference():
+    for length in (1, 3, 4, 5, 255, 256, 1000):
+        seed = os.urandom(32)
+        assert bbs(seed, length) == reference_bbs(seed, length)
+
+def test_bbs_many_matches_bbs():
+    seeds = [os.urandom(32) for _ in range(17)] + [hash_to_key(NATIVE_TEST_HASH)]
+    for length in (1, 7, 64, 301):
+        streams = bbs_many(seeds, length)
+        assert streams.shape == (len(seeds), length)
+        for seed, stream in zip(seeds, streams):
+            assert stream.tobytes() == bbs(seed, length)
+
+def test_crypt_round_trip():
+    encryption_key = os.urandom(32)
+    for length in (0, 1, 255, 256, 257, 1000):
+        data = os.urandom(length)
+        encrypted = crypt(data, encryption_key)
+        assert len(encrypted) == length
+        assert crypt(encrypted, encryption_key) == data
+        if length:
+            assert encrypted == bytes(a ^ b for a, b in zip(data, reference_bbs(encryption_key, length)))
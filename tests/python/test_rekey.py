@@ -0,0 +1,123 @@
+"""
+StegPass - Password Manager Application
+test_rekey.py - Changing a master password with rekey_user (app/utils/rekey.py), and resuming it from its journal
+after an interruption
+"""
+
+# ? Standard Imports
+import os
+
+import pytest
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+
+OLD_MASTER_PASSWORD = 'correct horse'
+NEW_MASTER_PASSWORD = 'battery staple'
+
+class Interrupted(Exception):
+    pass
+
+def store_images(folder : str, user_hash : str, count : int) -> dict:
+    """ Hides a password in each of count new images in the folder, returns the password of each image path
+    """
+    from app.core.bmp import run_hide
+
+    passwords = {}
+    for i in range(count):
+        image_path = os.path.join(folder, f'site{i}.bmp')
+        write_bmp(image_path, 5 + i % 4, 16, 24, gap1=2)
+        assert run_hide(image_path, f'password {i}', user_hash) == ("", 0)
+        passwords[image_path] = f'password {i}'
+    return passwords
+
+def test_resume_after_interruption(user_manager):
+    from app.core.bmp import run_extract
+    from app.utils.rekey import REKEY_JOURNAL_NAME, read_journal, rekey_user
+
+    assert user_manager.add_user('alice', OLD_MASTER_PASSWORD)
+    folder = user_manager.get_password_folder_path('alice')
+    journal_path = os.path.join(folder, REKEY_JOURNAL_NAME)
+    old_user_hash = user_manager.unlock('alice', OLD_MASTER_PASSWORD)
+    passwords = store_images(folder, old_user_hash, 6)
+
+    def interrupt(done, total, image_path, outcome):
+        if done == 2:
+            raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        rekey_user('alice', OLD_MASTER_PASSWORD, NEW_MASTER_PASSWORD, progress=interrupt, max_workers=1)
+
+    # the master password did not change, and the journal records the images already done
+    assert user_manager.check_password('alice', OLD_MASTER_PASSWORD)
+    header, finished, _ = read_journal(journal_path)
+    assert header is not None and len(finished) >= 2
+
+    # a different new password can't take over the change
+    with pytest.raises(ValueError):
+        rekey_user('alice', OLD_MASTER_PASSWORD, 'something else')
+
+    # simulate a crash while writing the next record
+    with open(journal_path, 'a') as journal:
+        journal.write('{"file": "site')
+
+    progress = []
+    result = rekey_user('alice', OLD_MASTER_PASSWORD, NEW_MASTER_PASSWORD,
+                        progress=lambda *args: progress.append(args), max_workers=2)
+
+    assert result['complete'] and not result['failed']
+    assert result['rekeyed'] == len(passwords)
+    assert len(progress) == len(passwords) - len(finished)
+    assert progress[-1][0] == progress[-1][1] == len(passwords)
+    assert not os.path.exists(journal_path)
+
+    assert user_manager.check_password('alice', NEW_MASTER_PASSWORD)
+    assert not user_manager.check_password('alice', OLD_MASTER_PASSWORD)
+    new_user_hash = user_manager.unlock('alice', NEW_MASTER_PASSWORD)
+    for image_path, password in passwords.items():
+        assert run_extract(image_path, new_user_hash) == (password, 0)
+        assert run_extract(image_path, old_user_hash)[1] == 4
+
+def test_wrong_old_password(user_manager):
+    from app.utils.rekey import rekey_user
+
+    assert user_manager.add_user('bob', OLD_MASTER_PASSWORD)
+    with pytest.raises(ValueError):
+        rekey_user('bob', 'not the password', NEW_MASTER_PASSWORD)
+    assert user_manager.check_password('bob', OLD_MASTER_PASSWORD)
+
+def test_stores_wait_for_the_change(user_manager, tmp_path):
+    from app.core.bmp import run_extract, run_hide
+    from app.utils.password_creator import PasswordCreator
+    from app.utils.rekey import rekey_user
+
+    assert user_manager.add_user('carol', OLD_MASTER_PASSWORD)
+    folder = user_manager.get_password_folder_path('carol')
+    old_user_hash = user_manager.unlock('carol', OLD_MASTER_PASSWORD)
+    passwords = store_images(folder, old_user_hash, 3)
+
+    src = str(tmp_path / 'source.bmp')
+    write_bmp(src, 5, 16, 24, gap1=2)
+    late_path = os.path.join(folder, 'late.bmp')
+
+    refused = []
+    def during_change(done, total, image_path, outcome):
+        if done == 1:
+            refused.append(PasswordCreator().store_password_headless('carol', 'new site', src, folder))
+
+            # an image copied into the folder by other means is picked up before the password is switched
+            write_bmp(late_path, 6, 16, 24, gap1=2)
+            assert run_hide(late_path, 'late password', old_user_hash) == ("", 0)
+            passwords[late_path] = 'late password'
+
+    result = rekey_user('carol', OLD_MASTER_PASSWORD, NEW_MASTER_PASSWORD, progress=during_change, max_workers=1)
+
+    assert len(refused) == 1 and refused[0][0] == 9 and 'in progress' in refused[0][1]
+    assert result['complete'] and result['rekeyed'] == len(passwords) == 4
+    new_user_hash = user_manager.unlock('carol', NEW_MASTER_PASSWORD)
+    for image_path, password in passwords.items():
+        assert run_extract(image_path, new_user_hash) == (password, 0)
+
+    # once it is done, stores go through with the new key
+    exit_code, dest = PasswordCreator().store_password_with_hash('new site', src, folder, new_user_hash)
+    assert exit_code == 0 and run_extract(dest, new_user_hash) == ('new site', 0)
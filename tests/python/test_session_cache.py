@@ -0,0 +1,76 @@
+"""
+StegPass - Password Manager Application
+test_session_cache.py - Expiry and zeroization of the cached password hashes (app/utils/session_cache.py)
+"""
+
+# ? Standard Imports
+import time
+
+import pytest
+
+# ? Project Imports
+from app.utils.singleton import TSSingleton
+from app.utils.session_cache import SessionCache
+
+OTHER_HASH = 'ab' * 32
+
+@pytest.fixture
+def cache():
+    TSSingleton._instances.pop(SessionCache, None)
+    cache = SessionCache()
+    yield cache
+
+    cache.clear()
+    TSSingleton._instances.pop(SessionCache, None)
+
+def zeroized(entry) -> bool:
+    return entry.secret == bytearray(len(entry.secret))
+
+def test_put_get_evict(cache, user_hash):
+    assert cache.get('alice') is None
+    cache.put('alice', user_hash, ttl=60)
+    assert cache.get('alice') == user_hash
+
+    # a new login replaces the session, and the old secret is overwritten
+    entry = cache.entries['alice']
+    cache.put('alice', OTHER_HASH, ttl=60)
+    assert zeroized(entry) and cache.get('alice') == OTHER_HASH
+
+    entry = cache.entries['alice']
+    cache.evict('alice')
+    assert zeroized(entry) and cache.get('alice') is None
+    cache.evict('alice')
+
+    # no session at all with a TTL of 0
+    cache.put('bob', user_hash, ttl=0)
+    assert cache.get('bob') is None and cache.timer is None
+
+def test_expiry(cache, user_hash):
+    cache.put('alice', user_hash, ttl=0.2)
+    cache.put('bob', OTHER_HASH, ttl=60)
+    alice = cache.entries['alice']
+    assert 0 < cache.users()['alice'] <= 0.2 and 59 < cache.users()['bob'] <= 60
+
+    # the timer zeroizes the expired session without anyone asking for it
+    deadline = time.monotonic() + 5
+    while 'alice' in cache.entries and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert 'alice' not in cache.entries and zeroized(alice)
+    assert cache.get('alice') is None and list(cache.users()) == ['bob']
+    assert cache.get('bob') == OTHER_HASH and cache.timer is not None
+
+def test_expired_entry_is_not_returned(cache, user_hash):
+    # before the timer runs
+    cache.put('alice', user_hash, ttl=60)
+    entry = cache.entries['alice']
+    entry.expires_at = time.monotonic() - 1
+    assert cache.get('alice') is None and zeroized(entry)
+
+def test_clear(cache, user_hash):
+    cache.put('alice', user_hash, ttl=60)
+    cache.put('bob', OTHER_HASH, ttl=60)
+    entries = list(cache.entries.values())
+
+    cache.clear()
+    assert all(zeroized(entry) for entry in entries)
+    assert not cache.entries and cache.users() == {} and cache.timer is None
@@ -0,0 +1,64 @@
+"""
+StegPass - Password Manager Application
+test_splice_store.py - The write paths of the codec (app/core/bmp.py): the full rewrite, the streamed copy with
+the message spliced in (splice_copy) and the in-place patch (patch_file) give the same file
+"""
+
+# ? Standard Imports
+import os
+import random
+import shutil
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.core.bmp import BMP, BMPLayout, BMP_HEADER_SIZE, REGION_NONE, run_extract, run_hide_copy, patch_file, splice_copy
+from app.core.obfuscator import hash_to_key
+
+def test_patch_file_matches_splice_copy(tmp_path):
+    rng = random.Random(20240615)
+    src_path = str(tmp_path / 'source.bmp')
+    for _ in range(50):
+        size = write_bmp(src_path, rng.randint(1, 64), rng.randint(1, 32), rng.choice((16, 24, 32)),
+                         gap1=rng.randint(2, 64), gap2=rng.randint(0, 128))
+
+        with open(src_path, 'rb') as f:
+            layout = BMPLayout(f.read(BMP_HEADER_SIZE), size)
+        available = layout.capacity()
+        total = available['padding'] + available['gap1'] + available['gap2']
+        patches = layout.stream_patches(os.urandom(rng.randint(1, max(total, 1))))
+        if patches is None:
+            continue
+
+        spliced_path, patched_path = str(tmp_path / 'spliced.bmp'), str(tmp_path / 'patched.bmp')
+        splice_copy(src_path, spliced_path, patches)
+        shutil.copyfile(src_path, patched_path)
+        patch_file(patched_path, patches)
+
+        assert open(spliced_path, 'rb').read() == open(patched_path, 'rb').read()
+
+def test_write_paths_match(tmp_path, user_hash):
+    # the full rewrite (the native utility's path), the streamed copy and the in-place patch give the same file
+    rng = random.Random(8893241)
+    src_path = str(tmp_path / 'source.bmp')
+    for _ in range(30):
+        write_bmp(src_path, rng.randint(1, 64), rng.randint(4, 32), rng.choice((16, 24, 32)),
+                  gap1=rng.randint(2, 32), gap2=rng.randint(0, 64))
+        message = 'p' * rng.randint(1, 40)
+        original = open(src_path, 'rb').read()
+
+        rewritten_path = str(tmp_path / 'rewritten.bmp')
+        bmp = BMP.from_file(src_path)
+        assert bmp.hide_message(message, hash_to_key(user_hash)) != REGION_NONE
+        bmp.save(rewritten_path)
+        expected = open(rewritten_path, 'rb').read()
+
+        copied_path = str(tmp_path / 'copied.bmp')
+        assert run_hide_copy(src_path, copied_path, message, user_hash) == ("", 0)
+        assert open(copied_path, 'rb').read() == expected
+        assert open(src_path, 'rb').read() == original
+
+        in_place_path = str(tmp_path / 'in_place.bmp')
+        shutil.copyfile(src_path, in_place_path)
+        assert run_hide_copy(in_place_path, in_place_path, message, user_hash, in_place=True) == ("", 0)
+        assert open(in_place_path, 'rb').read() == expected
+        assert run_extract(in_place_path, user_hash) == (message, 0)
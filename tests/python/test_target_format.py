@@ -0,0 +1,90 @@
+"""
+StegPass - Password Manager Application
+test_target_format.py - The registered carrier formats (app/utils/utility_fetcher.py): files are typed by their first
+bytes, and stores, retrievals, rekeys, verification and the vault index go through the format's callables
+"""
+
+# ? Standard Imports
+import os
+
+import pytest
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.utils.utility_fetcher import TargetFormat, TargetType, sniff_bmp
+
+class RecordingFormat(TargetFormat):
+    """ The BMP format, recording the calls made through it
+    """
+    def __init__(self):
+        super().__init__(TargetType.BMP, 'BMP', ['.bmp'], sniff_bmp, 18, utility='bmp-steg', codec='app.core.bmp')
+        self.calls = []
+
+    def hide(self, *args):
+        self.calls.append(('hide', args))
+        return super().hide(*args)
+
+    def extract(self, *args):
+        self.calls.append(('extract', args))
+        return super().extract(*args)
+
+    def rekey(self, *args):
+        self.calls.append(('rekey', args))
+        return super().rekey(*args)
+
+    def inspect(self, *args):
+        self.calls.append(('inspect', args))
+        return super().inspect(*args)
+
+@pytest.fixture
+def recording_format(monkeypatch):
+    monkeypatch.setenv('SP_BACKEND', 'python')
+    original = TargetType.Get(TargetType.BMP)
+    target_format = RecordingFormat()
+    TargetType.Register(target_format)
+    yield target_format
+    TargetType.Register(original)
+
+def test_sniffing(tmp_path):
+    image_path = str(tmp_path / 'image.bmp')
+    write_bmp(image_path, 5, 16, 24, gap1=2)
+    assert TargetType.GetTargetType(image_path) == TargetType.BMP
+
+    # typed by the content, the extension only for files that can't be read
+    renamed_path = str(tmp_path / 'image.png')
+    os.rename(image_path, renamed_path)
+    assert TargetType.GetTargetType(renamed_path) == TargetType.BMP
+    with open(image_path, 'wb') as f:
+        f.write(b'not a bitmap')
+    assert TargetType.GetTargetType(image_path) == TargetType.NOT_FOUND
+    assert TargetType.GetTargetType(str(tmp_path / 'missing.bmp')) == TargetType.BMP
+
+def test_call_sites_use_the_format(tmp_path, user_hash, recording_format):
+    from app.get_password import extract_password
+    from app.utils.password_creator import PasswordCreator
+    from app.utils.rekey import REKEY_DONE, rekey_image
+    from app.utils.vault_index import VaultIndex
+    from app.utils.verify import VERIFY_OK, verify_image
+
+    src, dest = str(tmp_path / 'source.bmp'), str(tmp_path / 'site.bmp')
+    write_bmp(src, 5, 16, 24, gap1=2)
+    assert PasswordCreator().store_password_with_hash('secret', src, dest, user_hash) == (0, dest)
+    assert recording_format.calls == [('hide', (src, dest, 'secret', user_hash))]
+
+    # use_mmap is passed on
+    for use_mmap in (True, False):
+        assert extract_password(dest, user_hash, use_mmap) == (0, 'secret')
+        assert recording_format.calls[-1] == ('extract', (dest, user_hash, use_mmap))
+
+    recording_format.calls.clear()
+    assert verify_image(dest, user_hash)['status'] == VERIFY_OK
+    assert [name for name, _ in recording_format.calls] == ['inspect', 'extract']
+
+    recording_format.calls.clear()
+    VaultIndex(str(tmp_path)).refresh(max_workers=1)
+    assert sorted(args[0] for _, args in recording_format.calls) == [dest, src]
+
+    other_hash = 'ab' * 32
+    assert rekey_image(dest, user_hash, other_hash) == (REKEY_DONE, "")
+    assert recording_format.calls[-1] == ('rekey', (dest, user_hash, other_hash))
+    assert extract_password(dest, other_hash) == (0, 'secret')
@@ -0,0 +1,132 @@
+"""
+StegPass - Password Manager Application
+test_user_store.py - The user store backends (app/utils/user_store.py), shared by several processes, and the
+migration from user_data.json
+"""
+
+# ? Standard Imports
+import os
+import multiprocessing
+
+import pytest
+
+# ? Project Imports
+from app.utils.config import SP_USER_STORE_TYPE
+from app.utils.user_store import USER_STORES, JsonUserStore, LogUserStore, UserStore, open_user_store
+
+STORE_TYPES = [SP_USER_STORE_TYPE.JSON, SP_USER_STORE_TYPE.LOG, SP_USER_STORE_TYPE.SQLITE]
+
+def open_store(store_type : str, folder) -> UserStore:
+    store_class, file_name = USER_STORES[store_type]
+    return store_class(os.path.join(str(folder), file_name), fsync=False)
+
+def add_users(store_type : str, folder : str, prefix : str, count : int):
+    """ Adds users one at a time from another process
+    """
+    store = open_store(store_type, folder)
+    for i in range(count):
+        store.set(f'{prefix}{i}', {'n': i})
+    store.close()
+
+@pytest.mark.parametrize('store_type', STORE_TYPES)
+def test_basic(tmp_path, store_type):
+    store = open_store(store_type, tmp_path)
+    assert store.get('alice') is None and store.count() == 0
+
+    store.set('alice', {'hash': 'a'})
+    store.set_many([('bob', 'b'), ('carol', ['c'])])
+    assert store.get('alice') == {'hash': 'a'} and store.contains('bob') and not store.contains('dave')
+    assert sorted(store.keys()) == ['alice', 'bob', 'carol'] and store.count() == 3
+
+    assert store.delete('bob') and not store.delete('bob')
+    store.set('alice', {'hash': 'new'})
+    store.close()
+
+    reopened = open_store(store_type, tmp_path)
+    assert reopened.get('alice') == {'hash': 'new'} and reopened.get('bob') is None
+    assert sorted(reopened.keys()) == ['alice', 'carol']
+
+@pytest.mark.parametrize('store_type', STORE_TYPES)
+def test_changes_of_other_processes(tmp_path, store_type):
+    # two instances of the same store stand for two processes (e.g. the GUI and --rekey)
+    first, second = open_store(store_type, tmp_path), open_store(store_type, tmp_path)
+    first.set('alice', 'old verifier')
+    assert second.get('alice') == 'old verifier'
+
+    first.set('alice', 'new verifier')
+    assert second.get('alice') == 'new verifier'
+
+    # a write from a process that read the store earlier does not bring back what it read
+    second.set('bob', 'b')
+    assert first.get('alice') == 'new verifier' and first.get('bob') == 'b'
+    first.delete('bob')
+    second.set('carol', 'c')
+    assert sorted(first.keys()) == sorted(second.keys()) == ['alice', 'carol']
+
+@pytest.mark.parametrize('store_type', STORE_TYPES)
+def test_concurrent_processes(tmp_path, store_type):
+    context = multiprocessing.get_context('spawn' if os.name == 'nt' else 'fork')
+    processes = [context.Process(target=add_users, args=(store_type, str(tmp_path), f'user{p}_', 25)) for p in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    store = open_store(store_type, tmp_path)
+    assert store.count() == 100
+    assert store.get('user3_24') == {'n': 24}
+
+def test_log_recovers_from_torn_and_corrupt_records(tmp_path):
+    store = open_store(SP_USER_STORE_TYPE.LOG, tmp_path)
+    store.set_many([('alice', 'a'), ('bob', 'b')])
+    with open(store.path, 'ab') as f:
+        f.write(b'{"set": "carol", "val\n')             # corrupt, skipped
+        f.write(b'{"set": "dave", "value": "d"}\n')
+        f.write(b'{"set": "erin", "value"')             # torn: a writer died, never acknowledged
+
+    reopened = open_store(SP_USER_STORE_TYPE.LOG, tmp_path)
+    assert sorted(reopened.keys()) == ['alice', 'bob', 'dave']
+
+    # the next write drops the torn record instead of appending to it
+    reopened.set('frank', 'f')
+    assert sorted(open_store(SP_USER_STORE_TYPE.LOG, tmp_path).keys()) == ['alice', 'bob', 'dave', 'frank']
+
+def test_log_compaction(tmp_path):
+    store = open_store(SP_USER_STORE_TYPE.LOG, tmp_path)
+    other = open_store(SP_USER_STORE_TYPE.LOG, tmp_path)
+    store.COMPACT_MIN_STALE = other.COMPACT_MIN_STALE = 8
+    for i in range(40):
+        store.set('alice', i)
+    store.set('bob', 'b')
+
+    # compacted along the way, with one record per user left at most a few writes later
+    with open(store.path, 'rb') as f:
+        assert len(f.readlines()) < 20
+
+    # another instance that had read the log before it was replaced still sees the latest values
+    assert other.get('alice') == 39 and other.get('bob') == 'b'
+    store.compact()
+    with open(store.path, 'rb') as f:
+        assert len(f.readlines()) == 2
+    other.set('carol', 'c')
+    assert store.get('carol') == 'c' and store.get('alice') == 39
+
+@pytest.mark.parametrize('store_type', [SP_USER_STORE_TYPE.LOG, SP_USER_STORE_TYPE.SQLITE])
+def test_migration_from_json(tmp_path, store_type):
+    legacy = JsonUserStore(os.path.join(str(tmp_path), 'user_data.json'))
+    legacy.set_many([('alice', 'a'), ('bob', {'kdf': 'scrypt'})])
+
+    store = open_user_store(store_type, str(tmp_path))
+    assert sorted(store.keys()) == ['alice', 'bob'] and store.get('bob') == {'kdf': 'scrypt'}
+
+    # only the first time: the migrated store is not overwritten with user_data.json again
+    store.delete('alice')
+    store.close()
+    legacy.set('carol', 'c')
+    assert sorted(open_user_store(store_type, str(tmp_path)).keys()) == ['bob']
+
+def test_abstract_store():
+    with pytest.raises(TypeError):
+        UserStore('path')
+    assert issubclass(LogUserStore, UserStore)
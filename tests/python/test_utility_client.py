@@ -0,0 +1,112 @@
+"""
+StegPass - Password Manager Application
+test_utility_client.py - UtilityClient (app/utils/utility_client.py) against the stand-in utility of the benchmarks
+(tests/bench/stub_utility.py): workers that die or hang are replaced, only a failed --serve handshake disables serving
+"""
+
+# ? Standard Imports
+import os
+import stat
+
+import pytest
+
+# ? Project Imports
+from stub_utility import write_launcher
+from synthetic_bmp import write_bmp
+from app.utils import utility_client
+from app.utils.singleton import TSSingleton
+from app.utils.utility_client import UtilityClient
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason="the stand-in utility is launched by a shell script")
+
+@pytest.fixture
+def client(monkeypatch):
+    # a fresh client for every test, and a record of the requests that fell back to the command line
+    TSSingleton._instances.pop(UtilityClient, None)
+    fallbacks = []
+    monkeypatch.setattr(utility_client, 'run_subprocess', lambda command: fallbacks.append(command) or ("", 0))
+
+    client = UtilityClient()
+    client.fallbacks = fallbacks
+    yield client
+
+    client.close()
+    TSSingleton._instances.pop(UtilityClient, None)
+
+def test_served(tmp_path, client, user_hash):
+    utility = write_launcher(str(tmp_path))
+    image_path = str(tmp_path / 'image.bmp')
+    write_bmp(image_path, 5, 16, 24, gap1=2)
+
+    assert client.hide(utility, image_path, 'pass"word', user_hash) == ("", 0)
+    assert client.extract(utility, image_path, user_hash) == ('pass"word', 0)
+    assert not client.fallbacks and not client.unsupported
+
+def test_dead_worker_is_replaced(tmp_path, client, user_hash):
+    utility = write_launcher(str(tmp_path))
+    image_path = str(tmp_path / 'image.bmp')
+    write_bmp(image_path, 5, 16, 24, gap1=2)
+    assert client.hide(utility, image_path, 'secret', user_hash) == ("", 0)
+
+    # the idle worker is killed between two requests
+    worker = client.idle_workers[utility][-1]
+    worker.process.kill()
+    worker.process.wait()
+
+    assert client.extract(utility, image_path, user_hash) == ('secret', 0)
+    assert not client.fallbacks and not client.unsupported
+    assert client.spawned_workers[utility] == 1
+
+def test_handshake_failure(tmp_path, client, user_hash):
+    # a utility built without --serve prints its usage and exits
+    utility = str(tmp_path / 'bmp-steg')
+    with open(utility, 'w') as f:
+        f.write('#!/bin/sh\necho "Usage: bmp-steg -s <file> <password> -h <hash>"\nexit 1\n')
+    os.chmod(utility, os.stat(utility).st_mode | stat.S_IXUSR)
+
+    image_path = str(tmp_path / 'image.bmp')
+    assert client.extract(utility, image_path, user_hash) == ("", 0)
+    assert client.extract(utility, image_path, user_hash) == ("", 0)
+
+    assert client.unsupported == {utility}
+    assert client.fallbacks == [[utility, '-g', image_path, '-h', user_hash]] * 2
+    assert client.spawned_workers[utility] == 0
+
+def test_missing_utility_is_not_disabled(tmp_path, client, user_hash):
+    # the process could not be started at all, that is not a handshake failure
+    utility = str(tmp_path / 'missing')
+    assert client.extract(utility, str(tmp_path / 'image.bmp'), user_hash) == ("", 0)
+    assert not client.unsupported and len(client.fallbacks) == 1
+
+def test_hung_worker_is_replaced(tmp_path, client, user_hash):
+    # answers the handshake, then never answers a request
+    utility = str(tmp_path / 'bmp-steg')
+    with open(utility, 'w') as f:
+        f.write('#!/bin/sh\nread line\nprintf "0 0\\n"\nread line\nexec sleep 60\n')
+    os.chmod(utility, os.stat(utility).st_mode | stat.S_IXUSR)
+    client.REQUEST_TIMEOUT = 0.5
+
+    image_path = str(tmp_path / 'image.bmp')
+    assert client.extract(utility, image_path, user_hash) == ("", 0)
+
+    # both attempts timed out, the request fell back to the command line and the utility is still served
+    assert client.fallbacks == [[utility, '-g', image_path, '-h', user_hash]]
+    assert not client.unsupported and client.spawned_workers[utility] == 0
+
+def test_close_with_workers_in_use(tmp_path, client, user_hash):
+    utility = write_launcher(str(tmp_path))
+    image_path = str(tmp_path / 'image.bmp')
+    write_bmp(image_path, 5, 16, 24, gap1=2)
+
+    # two workers checked out by other threads when the client is closed
+    healthy, broken = client._acquire(utility), client._acquire(utility)
+    client.close()
+
+    client._release(utility, broken, broken=True)
+    client._release(utility, healthy)
+    assert healthy.process.wait(timeout=5) is not None and broken.process.wait(timeout=5) is not None
+    assert not client.idle_workers and not client.spawned_workers
+
+    # later requests are not served
+    assert client.extract(utility, image_path, user_hash) == ("", 0)
+    assert len(client.fallbacks) == 1
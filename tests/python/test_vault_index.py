@@ -0,0 +1,89 @@
+"""
+StegPass - Password Manager Application
+test_vault_index.py - The index of a password folder (app/utils/vault_index.py): only files whose size or mtime
+changed are inspected again, deleted files are dropped, and the index is kept on disk
+"""
+
+# ? Standard Imports
+import os
+import json
+
+import pytest
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.core.bmp import run_hide
+from app.core.fileio import lock_path
+from app.utils.vault_index import INDEX_FILE_NAME, VaultIndex
+
+@pytest.fixture
+def folder(tmp_path, user_hash) -> str:
+    # two passwords (one in a subfolder), an image without one, and files that are not indexed
+    os.makedirs(tmp_path / 'work')
+    for name in ('github.bmp', os.path.join('work', 'mail.bmp')):
+        write_bmp(str(tmp_path / name), 5, 16, 24, gap1=2)
+        assert run_hide(str(tmp_path / name), 'secret', user_hash) == ("", 0)
+    write_bmp(str(tmp_path / 'plain.bmp'), 5, 16, 24, gap1=2)
+
+    (tmp_path / 'notes.txt').write_text('not an image')
+    open(lock_path(str(tmp_path / 'github.bmp')), 'w').close()
+    return str(tmp_path)
+
+def spy(index : VaultIndex) -> list:
+    """ Records the files the index inspects
+    """
+    inspected, inspect = [], index._inspect
+    index._inspect = lambda name: inspected.append(name) or inspect(name)
+    return inspected
+
+def test_refresh(folder):
+    index = VaultIndex(folder)
+    inspected = spy(index)
+
+    assert index.refresh() == 3
+    assert sorted(inspected) == sorted(['github.bmp', os.path.join('work', 'mail.bmp'), 'plain.bmp'])
+    assert index.list_images(valid_only=True) == [os.path.join(folder, 'github.bmp'), os.path.join(folder, 'work', 'mail.bmp')]
+    assert index.get('github.bmp')['magic'] and not index.get(os.path.join(folder, 'plain.bmp'))['magic']
+    assert index.get('notes.txt') is None
+
+    # nothing changed, nothing is opened
+    inspected.clear()
+    assert index.refresh() == 0 and not inspected
+
+def test_invalidation(folder, user_hash):
+    index = VaultIndex(folder)
+    index.refresh()
+    inspected = spy(index)
+
+    # hidden in place: the size is the same, the mtime is not
+    plain_path = os.path.join(folder, 'plain.bmp')
+    stat = os.stat(plain_path)
+    assert run_hide(plain_path, 'new', user_hash) == ("", 0)
+    os.utime(plain_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    os.remove(os.path.join(folder, 'work', 'mail.bmp'))
+
+    assert index.refresh() == 2
+    assert inspected == ['plain.bmp']
+    assert index.get('plain.bmp')['magic'] and index.get(os.path.join('work', 'mail.bmp')) is None
+    assert index.list_images(valid_only=True) == [os.path.join(folder, 'github.bmp'), plain_path]
+
+def test_kept_on_disk(folder):
+    VaultIndex(folder).refresh()
+
+    # another process (or the next run) starts from the saved index
+    index = VaultIndex(folder)
+    inspected = spy(index)
+    assert index.refresh() == 0 and not inspected
+    assert len(index.list_images()) == 3
+
+@pytest.mark.parametrize('content', ['{"format": 0, "entries": {}}', 'not json'])
+def test_rebuilt_when_outdated_or_corrupt(folder, content):
+    VaultIndex(folder).refresh()
+    with open(os.path.join(folder, INDEX_FILE_NAME), 'w') as f:
+        f.write(content)
+
+    index = VaultIndex(folder)
+    assert index.list_images() == []
+    assert index.refresh() == 3
+    with open(os.path.join(folder, INDEX_FILE_NAME)) as f:
+        assert len(json.load(f)['entries']) == 3
@@ -0,0 +1,110 @@
+"""
+StegPass - Password Manager Application
+test_verify.py - The status verify_image (app/utils/verify.py) reports for each kind of image, and clobbered images
+found against the vault index
+"""
+
+# ? Standard Imports
+import os
+
+import pytest
+
+# ? Project Imports
+from synthetic_bmp import write_bmp
+from app.core.bmp import BMP, run_hide, run_hide_records
+from app.core.message_block import SP_MESSAGE_LENGTH_INDEX, get_block_size
+from app.utils.vault_index import VaultIndex
+from app.utils.verify import (VERIFY_BAD_HEADER, VERIFY_BAD_MESSAGE, VERIFY_CLOBBERED, VERIFY_EMPTY, VERIFY_ERROR,
+                              VERIFY_OK, VERIFY_TRUNCATED, verify_image)
+
+MESSAGE = 'secret'
+OTHER_HASH = 'ab' * 32
+
+@pytest.fixture
+def image_path(tmp_path, user_hash) -> str:
+    image_path = str(tmp_path / 'image.bmp')
+    write_bmp(image_path, 5, 16, 24, gap1=2)
+    assert run_hide(image_path, MESSAGE, user_hash) == ("", 0)
+    return image_path
+
+def edit_stream(image_path : str, edit):
+    """ Rewrites the hidden message block after edit(block) changed it in place
+    """
+    bmp = BMP.from_file(image_path)
+    block = bytearray(bmp.read_stream(get_block_size(MESSAGE)))
+    edit(block)
+    bmp.write_stream(bytes(block))
+    bmp.save(image_path)
+
+def test_ok(image_path, user_hash, tmp_path):
+    result = verify_image(image_path, user_hash)
+    assert result['status'] == VERIFY_OK and result['version'] == [0, 0, 2]
+    assert result['length'] == len(MESSAGE) + 1 and result['regions'] and not result['error']
+
+    container_path = str(tmp_path / 'vault.bmp')
+    write_bmp(container_path, 5, 16, 24, gap1=2, gap2=256)
+    assert run_hide_records(container_path, {'github': {'password': MESSAGE}}, user_hash) == ("", 0)
+    assert verify_image(container_path, user_hash)['status'] == VERIFY_OK
+
+def test_empty(tmp_path, user_hash):
+    image_path = str(tmp_path / 'plain.bmp')
+    write_bmp(image_path, 5, 16, 24, gap1=2)
+    assert verify_image(image_path, user_hash)['status'] == VERIFY_EMPTY
+
+def test_bad_header(image_path, user_hash):
+    edit_stream(image_path, lambda block: block.__setitem__(slice(2, 5), b'\x09\x09\x09'))
+    result = verify_image(image_path, user_hash)
+    assert result['status'] == VERIFY_BAD_HEADER and result['version'] == [9, 9, 9]
+
+def test_truncated(image_path, user_hash):
+    # the image has room for far fewer than 255 bytes
+    edit_stream(image_path, lambda block: block.__setitem__(SP_MESSAGE_LENGTH_INDEX, 0xFF))
+    result = verify_image(image_path, user_hash)
+    assert result['status'] == VERIFY_TRUNCATED and result['length'] == 0xFF
+
+def test_bad_message(image_path):
+    assert verify_image(image_path, OTHER_HASH)['status'] == VERIFY_BAD_MESSAGE
+
+def test_error(tmp_path, user_hash):
+    assert verify_image(str(tmp_path / 'notes.txt'), user_hash)['status'] == VERIFY_ERROR
+
+    # a BMP header, but not a valid BMP file
+    image_path = str(tmp_path / 'broken.bmp')
+    with open(image_path, 'wb') as f:
+        f.write(b'BM' + bytes(12) + (40).to_bytes(4, 'little'))
+    result = verify_image(image_path, user_hash)
+    assert result['status'] == VERIFY_ERROR and result['error']
+
+def test_clobbered(image_path, user_hash):
+    folder = os.path.dirname(image_path)
+    index = VaultIndex(folder)
+    index.refresh()
+    indexed = index.get(image_path)
+
+    # an unchanged image that does not decrypt is more likely encrypted with another key
+    assert verify_image(image_path, OTHER_HASH, indexed)['status'] == VERIFY_BAD_MESSAGE
+
+    # an image editor zeroed the padding after the password was stored
+    edit_stream(image_path, lambda block: block.__setitem__(slice(0, len(block)), bytes(len(block))))
+    result = verify_image(image_path, user_hash, indexed)
+    assert result['status'] == VERIFY_CLOBBERED and result['reason'] == VERIFY_EMPTY
+
+    # without the index it is only empty
+    assert verify_image(image_path, user_hash)['status'] == VERIFY_EMPTY
+
+def test_verify_user(user_manager):
+    from app.utils.session_cache import SessionCache
+    from app.utils.verify import verify_user
+
+    assert user_manager.add_user('dana', 'correct horse')
+    user_hash = user_manager.unlock('dana', 'correct horse')
+    SessionCache().put('dana', user_hash)
+
+    folder = user_manager.get_password_folder_path('dana')
+    for name in ('b.bmp', 'a.bmp'):
+        write_bmp(os.path.join(folder, name), 5, 16, 24, gap1=2)
+        assert run_hide(os.path.join(folder, name), MESSAGE, user_hash) == ("", 0)
+
+    results = list(verify_user('dana', max_workers=1))
+    assert [result['path'] for result in results] == [os.path.join(folder, 'a.bmp'), os.path.join(folder, 'b.bmp')]
+    assert all(result['status'] == VERIFY_OK for result in results)
@@ -69,7 +69,8 @@ public:
     int HideMessage(const std::string& message);
 
     /// <summary>
-    /// Saves the BMP file to a new file, with the hidden message.
+    /// Saves the BMP file to a new file, with the hidden message. The file is replaced atomically
+    /// (see sp::WriteFileAtomic).
     /// </summary>
     /// <param name="filename">The path to the new BMP file.</param>
     /// <returns>True if the file was saved successfully.</returns>
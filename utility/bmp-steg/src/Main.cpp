@@ -1,8 +1,165 @@
 #include <iostream>
 #include <string>
+#include <vector>
+#include <fstream>
+#include <cstring>
+#include <optional>
 #include "BMP.hpp"
 
 #include <core/CLIParser.hpp>
+#include <core/Utils.hpp>
+
+#if defined(_WIN32)
+#include <io.h>
+#include <fcntl.h>
+#endif
+
+/// <summary>
+/// Hides or extracts a message in a BMP file.
+/// </summary>
+/// <param name="action">SP_CLI_ACTION_HIDE or SP_CLI_ACTION_EXTRACT</param>
+/// <param name="target_file">The path to the BMP file.</param>
+/// <param name="password">The message to hide (ignored when extracting).</param>
+/// <param name="encryption_key">The encryption key.</param>
+/// <param name="output">The extracted message on success, otherwise an error message (may be empty).</param>
+/// <returns>The exit code of the action (see main).</returns>
+int RunAction(int action, const std::string& target_file, const std::string& password, const Hash256 encryption_key, std::string& output)
+{
+    output.clear();
+
+    if (!std::ifstream(target_file).good()) {
+        output = "BMP file does not exist: " + target_file;
+        return 3;
+    }
+
+    try {
+        // other writers of the file (other utilities or the app) wait until the new file is in place
+        std::optional<sp::FileLock> lock;
+        if (action == SP_CLI_ACTION_HIDE) {
+            lock.emplace(target_file.c_str());
+        }
+
+        BMP bmp(target_file);
+        bmp.SetEncryptionKey(encryption_key);
+
+        if (action == SP_CLI_ACTION_HIDE) {
+            if (!bmp.HideMessage(password)) {
+                return -1;
+            }
+
+            if (!bmp.Save(target_file)) {
+                output = "Could not save BMP file: " + target_file;
+                return -1;
+            }
+        }
+
+        else if (action == SP_CLI_ACTION_EXTRACT) {
+            output = bmp.ExtractMessage();
+            if (output.empty()) {
+                return 4;
+            }
+        }
+    }
+    catch (const std::exception& e) {
+        output = e.what();
+        return -1;
+    }
+
+    return 0;
+}
+
+/// <summary>
+/// Decodes a hex string into raw bytes.
+/// </summary>
+/// <param name="hex">The hex string.</param>
+/// <param name="out">The decoded bytes.</param>
+/// <returns>True if the string was valid hex.</returns>
+bool HexDecode(const std::string& hex, std::string& out)
+{
+    if (hex.size() % 2 != 0) {
+        return false;
+    }
+
+    out.clear();
+    for (size_t i = 0; i < hex.size(); i += 2) {
+        if (!sp::IsHexDigit(hex[i]) || !sp::IsHexDigit(hex[i + 1])) {
+            return false;
+        }
+        out += static_cast<char>(std::stoul(hex.substr(i, 2), nullptr, 16));
+    }
+
+    return true;
+}
+
+/// <summary>
+/// Runs the utility as a long-lived worker, reading one request per line from stdin and writing one
+/// framed response per request to stdout, until stdin is closed or a quit request is received.
+///
+///  REQUEST:  -s <TAB> hex(target_file) <TAB> hash <TAB> hex(password) <LF>
+///            -g <TAB> hex(target_file) <TAB> hash <LF>
+///            -p <LF>   (ping, answered with exit code 0 and no output, clients use it to check --serve works)
+///            -q <LF>
+///  RESPONSE: exit_code <SPACE> n <LF> followed by n bytes of output
+/// </summary>
+/// <returns>The exit code of the worker process.</returns>
+int Serve()
+{
+#if defined(_WIN32)
+    // the framing counts bytes, so no newline translation
+    _setmode(_fileno(stdin), _O_BINARY);
+    _setmode(_fileno(stdout), _O_BINARY);
+#endif
+
+    std::string line;
+    while (std::getline(std::cin, line)) {
+        if (!line.empty() && line.back() == '\r') {
+            line.pop_back();
+        }
+
+        std::vector<std::string> fields;
+        size_t start = 0;
+        for (size_t end = line.find('\t'); end != std::string::npos; end = line.find('\t', start)) {
+            fields.push_back(line.substr(start, end - start));
+            start = end + 1;
+        }
+        fields.push_back(line.substr(start));
+
+        if (fields[0] == "-q") {
+            break;
+        }
+
+        int exit_code = 2;
+        std::string output;
+        std::string target_file;
+        std::string password;
+        Hash256 encryption_key;
+
+        bool is_hide = fields[0] == "-s" && fields.size() == 4;
+        bool is_extract = fields[0] == "-g" && fields.size() == 3;
+
+        if (fields[0] == "-p" && fields.size() == 1) {
+            exit_code = 0;
+        }
+        else if (!is_hide && !is_extract) {
+            output = "Invalid request";
+        }
+        else if (!HexDecode(fields[1], target_file) || !sp::StringToHash(encryption_key, fields[2].c_str())) {
+            output = "Invalid target file or hash";
+        }
+        else if (is_hide && !HexDecode(fields[3], password)) {
+            output = "Invalid password";
+        }
+        else {
+            exit_code = RunAction(is_hide ? SP_CLI_ACTION_HIDE : SP_CLI_ACTION_EXTRACT, target_file, password, encryption_key, output);
+        }
+
+        std::cout << exit_code << ' ' << output.size() << '\n';
+        std::cout.write(output.data(), output.size());
+        std::cout.flush();
+    }
+
+    return 0;
+}
 
 int main(int argc, char* argv[]) {
     /*
@@ -15,6 +172,10 @@ int main(int argc, char* argv[]) {
     * -1: Unknown/Unexpected error
     */
 
+    if (argc == 2 && strcmp(argv[1], "--serve") == 0) {
+        return Serve();
+    }
+
     const char* supported_types[] = { ".BMP" };
     sp::CLIParser parser(1, supported_types);
 
@@ -40,44 +201,19 @@ int main(int argc, char* argv[]) {
     // Get the arguments from the parser
     int action = parser.Action();
     std::string target_file = parser.GetTargetFile();
-    
+
     Hash256 encryption_key;
     (void)parser.GetHash(encryption_key);
 
-    // NOTE: Should not raise an exception
-    BMP bmp(target_file);
-    bmp.SetEncryptionKey(encryption_key);
-
-    if (action == SP_CLI_ACTION_HIDE) {
-        try {
-            if (!bmp.HideMessage(parser.GetPassword())) {
-				return -1;
-			}
+    std::string output;
+    int exit_code = RunAction(action, target_file, parser.GetPassword(), encryption_key, output);
 
-            if (!bmp.Save(target_file)) {
-                std::cerr << "Could not save BMP file: " << target_file << std::endl;
-                return -1;
-            }
-		}
-        catch (const std::exception& e) {
-			std::cerr << e.what() << std::endl;
-			return -1;
-        }
+    if (exit_code == 0) {
+        std::cout << output;
+    }
+    else if (!output.empty()) {
+        std::cerr << output << std::endl;
     }
 
-    else if (action == SP_CLI_ACTION_EXTRACT) {
-        try {
-            std::string message = bmp.ExtractMessage();
-            if (message.empty()) {
-                return 4;
-            }
-            std::cout << message;
-        }
-        catch (const std::exception& e) {
-            std::cerr << e.what() << std::endl;
-            return -1;
-        }
-	}
-
-    return 0;
-}
\ No newline at end of file
+    return exit_code;
+}
@@ -48,6 +48,11 @@
 // The index of the message length in the byte stream
 #define SP_MESSAGE_LENGTH_INDEX 5
 
+// The version of the multi-record container format (see app/core/container.py)
+#define SP_CONTAINER_VERSION_MAJOR 0
+#define SP_CONTAINER_VERSION_MINOR 1
+#define SP_CONTAINER_VERSION_PATCH 0
+
 /*************************************************************************
 *
 *  The message byte stream should always match this format:
@@ -76,6 +81,11 @@
 *     the number of bytes specified.
 *  4. Use DecryptMessage to decrypt the message.
 *
+*  Byte streams with the container version hold many records instead of
+*  a single message, with a varint body length in place of the message
+*  length. They pass ValidateHeader but are only read by the app; see
+*  IsContainer.
+*
 **************************************************************************/
 
 namespace sp {
@@ -121,6 +131,13 @@ public:
     /// <returns>True if the header is valid, false otherwise.</returns>
     static bool ValidateHeader(const uint8_t* bytes);
 
+    /// <summary>
+    /// Checks if the byte stream starts with a multi-record container header, which DecryptMessage can't read.
+    /// </summary>
+    /// <param name="bytes">The byte stream to check (at least SP_HEADER_SIZE bytes).</param>
+    /// <returns>True if the magic number and container version match, false otherwise.</returns>
+    static bool IsContainer(const uint8_t* bytes);
+
     /// <summary>
     /// Gets the SP-major version that the message block was created with.
     /// </summary>
@@ -81,4 +81,35 @@ namespace sp {
 	/// <param name="filename">The file to check </param>
 	/// <returns>True if the file is open by another process, false otherwise </returns>
 	CORE_API bool IsFileOpenByAnotherProcess(const char* filename);
+
+	/// <summary>
+	/// Replaces a file with new contents atomically: they are written to a temporary file next to it,
+	/// flushed to disk, and renamed over it, so a crash leaves either the old or the new file.
+	/// </summary>
+	/// <param name="filename">The file to replace (or create) </param>
+	/// <param name="data">The new contents </param>
+	/// <param name="size">The size of the new contents in bytes </param>
+	/// <returns>True if the file was replaced, false otherwise (the old file is left untouched) </returns>
+	CORE_API bool WriteFileAtomic(const char* filename, const uint8_t* data, size_t size);
+
+	/// <summary>
+	/// Holds an exclusive advisory lock on a file while in scope. The lock is taken on a lock file next to
+	/// it (.name.lock, shared with the app), so it outlives the file being replaced by WriteFileAtomic.
+	/// Waits for the current holder to release it instead of polling.
+	/// </summary>
+	class CORE_API FileLock {
+	public:
+		/// <param name="filename">The file to lock </param>
+		explicit FileLock(const char* filename);
+		~FileLock();
+
+		FileLock(const FileLock&) = delete;
+		FileLock& operator=(const FileLock&) = delete;
+
+		/// <returns>True if the lock is held, false if the lock file could not be opened </returns>
+		bool IsLocked() const;
+
+	private:
+		void* m_handle;
+	};
 }
\ No newline at end of file
@@ -18,8 +18,9 @@ private:
 	std::array<T, N> elements_;
 };
 
-constexpr std::array<std::tuple<int, int, int>, 1> sp_version_history = {
+constexpr std::array<std::tuple<int, int, int>, 2> sp_version_history = {
 	std::make_tuple(SP_VERSION_MAJOR, SP_VERSION_MINOR, SP_VERSION_PATCH),
+	std::make_tuple(SP_CONTAINER_VERSION_MAJOR, SP_CONTAINER_VERSION_MINOR, SP_CONTAINER_VERSION_PATCH),
 };
 constexpr ConstexprSet<std::tuple<int, int, int>, sp_version_history.size()> sp_version_set(sp_version_history);
 
@@ -115,6 +116,16 @@ bool sp::MessageBlock::ValidateHeader(const uint8_t* bytes)
 	return true;
 }
 
+bool sp::MessageBlock::IsContainer(const uint8_t* bytes)
+{
+	if (bytes[0] != ((SP_MAGIC_NUMBER >> 8) & 0xFF) || bytes[1] != (SP_MAGIC_NUMBER & 0xFF))
+	{
+		return false;
+	}
+
+	return bytes[2] == SP_CONTAINER_VERSION_MAJOR && bytes[3] == SP_CONTAINER_VERSION_MINOR && bytes[4] == SP_CONTAINER_VERSION_PATCH;
+}
+
 uint8_t sp::MessageBlock::GetVersionMajor() const
 {
 	return m_impl->byte_stream[2];
@@ -153,6 +164,11 @@ char* sp::MessageBlock::DecryptMessage(uint8_t* message_byte_stream)
 	
 	// we don't check header, assume it is valid...
 
+	// containers hold records, not a single message
+	if (IsContainer(message_byte_stream)) {
+		return nullptr;
+	}
+
 	// Get the message length from the metadata
 	uint8_t messageLength = message_byte_stream[SP_MESSAGE_LENGTH_INDEX];
 
@@ -53,4 +53,82 @@ bool sp::IsFileOpenByAnotherProcess(const char* filename)
 	  CloseHandle(hFile);
 	}
 	return false;
+}
+
+/// <summary>
+/// Gets the path of a hidden file next to the given one (.name + suffix)
+/// </summary>
+static std::string GetSiblingPath(const char* filename, const std::string& suffix)
+{
+	std::string path(filename);
+	size_t nameStart = path.find_last_of("\\/");
+	nameStart = (nameStart == std::string::npos) ? 0 : nameStart + 1;
+
+	return path.substr(0, nameStart) + "." + path.substr(nameStart) + suffix;
+}
+
+bool sp::WriteFileAtomic(const char* filename, const uint8_t* data, size_t size)
+{
+	std::string tempPath = GetSiblingPath(filename, "." + std::to_string(GetCurrentProcessId()) + ".tmp");
+
+	HANDLE hFile = CreateFileA(tempPath.c_str(), GENERIC_WRITE, 0, NULL, CREATE_ALWAYS, FILE_ATTRIBUTE_NORMAL, NULL);
+	if (hFile == INVALID_HANDLE_VALUE) {
+		return false;
+	}
+
+	bool written = true;
+	while (size > 0 && written) {
+		DWORD chunk = static_cast<DWORD>(std::min<size_t>(size, 1 << 30));
+		DWORD count = 0;
+		written = WriteFile(hFile, data, chunk, &count, NULL) && count == chunk;
+		data += count;
+		size -= count;
+	}
+
+	// the contents must be on disk before the rename makes them the file
+	written = written && FlushFileBuffers(hFile);
+	CloseHandle(hFile);
+
+	if (!written || !MoveFileExA(tempPath.c_str(), filename, MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH)) {
+		DeleteFileA(tempPath.c_str());
+		return false;
+	}
+
+	return true;
+}
+
+sp::FileLock::FileLock(const char* filename)
+	: m_handle(INVALID_HANDLE_VALUE)
+{
+	HANDLE hFile = CreateFileA(GetSiblingPath(filename, ".lock").c_str(), GENERIC_READ | GENERIC_WRITE,
+		FILE_SHARE_READ | FILE_SHARE_WRITE | FILE_SHARE_DELETE, NULL, OPEN_ALWAYS, FILE_ATTRIBUTE_HIDDEN, NULL);
+
+	if (hFile == INVALID_HANDLE_VALUE) {
+		return;
+	}
+
+	// blocks until the current holder unlocks (or exits)
+	OVERLAPPED overlapped = {};
+	if (!LockFileEx(hFile, LOCKFILE_EXCLUSIVE_LOCK, 0, 1, 0, &overlapped)) {
+		CloseHandle(hFile);
+		return;
+	}
+
+	m_handle = hFile;
+}
+
+sp::FileLock::~FileLock()
+{
+	if (m_handle == INVALID_HANDLE_VALUE) {
+		return;
+	}
+
+	OVERLAPPED overlapped = {};
+	UnlockFileEx(m_handle, 0, 1, 0, &overlapped);
+	CloseHandle(m_handle);
+}
+
+bool sp::FileLock::IsLocked() const
+{
+	return m_handle != INVALID_HANDLE_VALUE;
 }
\ No newline at end of file